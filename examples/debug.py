@@ -72,53 +72,7 @@ def debug_output(info_type, num: Optional[int],
 
 def dump(num: Optional[int], text: str,
          data: ct.POINTER(ct.c_ubyte), size: int, no_hex: bool, stream):
-
-    CR = 0x0D
-    LF = 0x0A
-
-    # without the hex output, we can fit more on screen
-    width = 0x40 if no_hex else 0x10
-
-    if num is None:
-        print("%s, %d bytes (0x%x)" % (text, size, size), file=stream)
-    else:
-        print("%d %s, %d bytes (0x%x)" % (num, text, size, size), file=stream)
-
-    for i in range(0, size, width):
-
-        print("%04x: " % i, end="", file=stream)
-
-        if not no_hex:
-            # hex not disabled, show it
-            for c in range(width):
-                idx = i + c
-                if idx < size:
-                    print("%02x " % data[idx], end="", file=stream)
-                else:
-                    print("   ", end="", file=stream)
-
-        for c in range(width):
-            idx = i + c
-            if idx >= size:
-                break
-            # check for CR/LF; if found, skip past and start a new line of output
-            if (no_hex and (idx + 1) < size and
-                data[idx] == CR and data[idx + 1] == LF):
-                i += c + 2 - width
-                break
-            idx = i + c
-            print("%c" % (data[idx] if 0x20 <= data[idx] < 0x80 else "."),
-                  end="", file=stream)
-            # check again for CR/LF, to avoid an extra \n if it's at width
-            idx += 1
-            if (no_hex and (idx + 1) < size and
-                data[idx] == CR and data[idx + 1] == LF):
-                i += c + 3 - width
-                break
-
-        print(file=stream)  # newline
-
-    stream.flush()
+    lcurl.debug_dump(stream, text, data, size, no_hex, num)
 
 
 def main(argv=sys.argv[1:]):
@@ -8,3 +8,23 @@ from . import __config__ ; del __config__
 from .__config__ import set_config as config
 
 from ._curl import * ; del _curl
+
+def __getattr__(name):
+    # Names of the lazily imported areas (see _curl.__getattr__()).
+    # __all__ (read by 'from libcurl import *') lists them too and thus
+    # imports them all.
+    import sys
+    _curl = sys.modules[__name__ + "._curl"]
+    if name == "__all__":
+        value = [name for name in __dir__() if not name.startswith("_")]
+    elif _curl._lazy_module(name) is not None:
+        value = getattr(_curl, name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+def __dir__():
+    import sys
+    names = dir(sys.modules[__name__ + "._curl"])
+    return sorted(set(globals()) | {name for name in names if not name.startswith("_")})
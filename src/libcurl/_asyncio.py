@@ -0,0 +1,171 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+# asyncio event-loop driver for the libcurl multi_socket_action() API.
+
+import asyncio
+import ctypes as ct
+
+from ._curl  import CURL
+from ._multi import (multi_init, multi_cleanup, multi_setopt,
+                     multi_add_handle, multi_remove_handle,
+                     multi_socket_action, multi_strerror,
+                     CURLM_OK, CURLMOPT_SOCKETFUNCTION,
+                     CURLMOPT_TIMERFUNCTION, CURL_POLL_IN, CURL_POLL_OUT,
+                     CURL_POLL_REMOVE, CURL_CSELECT_IN, CURL_CSELECT_OUT,
+                     CURL_SOCKET_TIMEOUT, socket_callback, multi_timer_callback)
+from ._completion import multi_completed
+
+__all__ = ('AsyncMulti',)
+
+
+class AsyncMulti:
+    """Drive a libcurl multi handle from an asyncio event loop.
+
+    Sockets announced by libcurl through CURLMOPT_SOCKETFUNCTION are watched
+    with loop.add_reader()/loop.add_writer() and the CURLMOPT_TIMERFUNCTION
+    timeout is scheduled with loop.call_later(), so every wakeup results in
+    a single multi_socket_action() call for the socket that became ready.
+    Completed transfers are collected with multi_completed() and resolve the
+    future returned by add_handle() with the transfer's CURLcode.
+
+    The event loop must support add_reader()/add_writer() (on Windows this
+    means the SelectorEventLoop, not the default ProactorEventLoop).
+
+        async with AsyncMulti() as amulti:
+            res = await amulti.perform(curl)
+    """
+
+    def __init__(self, loop=None):
+        self._loop    = loop if loop is not None else asyncio.get_running_loop()
+        self._running = ct.c_int(0)
+        self._futures = {}  # easy handle address -> (easy handle, future)
+        self._sockets = {}  # socket -> current CURL_POLL_* action
+        self._timer   = None
+        self._socket_cb = socket_callback(self._socket_function)
+        self._timer_cb  = multi_timer_callback(self._timer_function)
+        self._multi = multi_init()
+        if not self._multi:
+            raise RuntimeError("libcurl.multi_init() failed")
+        multi_setopt(self._multi, CURLMOPT_SOCKETFUNCTION, self._socket_cb)
+        multi_setopt(self._multi, CURLMOPT_TIMERFUNCTION,  self._timer_cb)
+
+    @property
+    def multi(self):
+        """The underlying CURLM handle."""
+        return self._multi
+
+    @property
+    def running(self):
+        """Number of transfers libcurl reported as still running."""
+        return self._running.value
+
+    def __len__(self):
+        return len(self._futures)
+
+    def add_handle(self, curl: ct.POINTER(CURL)) -> asyncio.Future:
+        """Start a transfer; the returned future resolves to its CURLcode."""
+        future = self._loop.create_future()
+        rc = multi_add_handle(self._multi, curl)
+        if rc != CURLM_OK:
+            raise RuntimeError("libcurl.multi_add_handle() failed (code %d): %s" %
+                               (rc, multi_strerror(rc).decode("utf-8")))
+        key = ct.cast(curl, ct.c_void_p).value
+        self._futures[key] = (curl, future)
+        future.add_done_callback(lambda fut, key=key: self._forget(key, fut))
+        return future
+
+    def remove_handle(self, curl: ct.POINTER(CURL)):
+        """Abort a transfer that was started with add_handle()."""
+        key = ct.cast(curl, ct.c_void_p).value
+        curl, future = self._futures.pop(key, (curl, None))
+        multi_remove_handle(self._multi, curl)
+        if future is not None and not future.done():
+            future.cancel()
+
+    async def perform(self, curl: ct.POINTER(CURL)) -> int:
+        """Run a single transfer to completion and return its CURLcode."""
+        return await self.add_handle(curl)
+
+    def close(self):
+        """Abort all pending transfers and release the multi handle."""
+        if self._multi is None:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for sock in self._sockets:
+            self._loop.remove_reader(sock)
+            self._loop.remove_writer(sock)
+        self._sockets.clear()
+        for curl, future in list(self._futures.values()):
+            multi_remove_handle(self._multi, curl)
+            if not future.done():
+                future.cancel()
+        self._futures.clear()
+        multi_cleanup(self._multi)
+        self._multi = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, exc_tb):
+        self.close()
+
+    # Internals
+
+    def _forget(self, key, future):
+        # A cancelled awaiter must not leave its handle inside the multi stack.
+        if future.cancelled() and key in self._futures and self._multi is not None:
+            curl, _ = self._futures.pop(key)
+            multi_remove_handle(self._multi, curl)
+
+    def _socket_function(self, easy, sock, what, userp, socketp):
+        loop = self._loop
+        if what == CURL_POLL_REMOVE:
+            if self._sockets.pop(sock, 0):
+                loop.remove_reader(sock)
+                loop.remove_writer(sock)
+            return 0
+        prev = self._sockets.get(sock, 0)
+        if what & CURL_POLL_IN:
+            if not prev & CURL_POLL_IN:
+                loop.add_reader(sock, self._socket_action, sock, CURL_CSELECT_IN)
+        elif prev & CURL_POLL_IN:
+            loop.remove_reader(sock)
+        if what & CURL_POLL_OUT:
+            if not prev & CURL_POLL_OUT:
+                loop.add_writer(sock, self._socket_action, sock, CURL_CSELECT_OUT)
+        elif prev & CURL_POLL_OUT:
+            loop.remove_writer(sock)
+        self._sockets[sock] = what
+        return 0
+
+    def _timer_function(self, multi, timeout_ms, userp):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if timeout_ms >= 0:
+            # Never call multi_socket_action() from within a libcurl callback.
+            self._timer = self._loop.call_later(timeout_ms / 1000, self._on_timeout)
+        return 0
+
+    def _on_timeout(self):
+        self._timer = None
+        self._socket_action(CURL_SOCKET_TIMEOUT, 0)
+
+    def _socket_action(self, sock, ev_bitmask):
+        if self._multi is None:
+            return
+        multi_socket_action(self._multi, sock, ev_bitmask, ct.byref(self._running))
+        self._check_multi_info()
+
+    def _check_multi_info(self):
+        for done in multi_completed(self._multi, remove=False, private=False):
+            key = ct.cast(done.curl, ct.c_void_p).value
+            curl, future = self._futures.pop(key, (done.curl, None))
+            multi_remove_handle(self._multi, curl)
+            if future is not None and not future.done():
+                future.set_result(done.result)
+
+# eof
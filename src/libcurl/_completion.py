@@ -0,0 +1,132 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+# Completed transfers of a multi handle.
+#
+# multi_completed() drains all the messages queued by multi_info_read() at
+# once into Completion records and removes the finished easy handles from
+# the multi handle, so that a driving loop does not have to decode CURLMsg
+# structures itself. multi_as_completed() is a complete perform/poll loop
+# yielding the records as transfers finish. Completion hooks (e.g. metrics
+# collectors) see every batch read by multi_completed().
+
+import sys
+import traceback
+import ctypes as ct
+
+from ._curl  import CURL, CURLE_OK, CURLINFO_PRIVATE, easy_strerror
+from ._easy  import easy_getinfo
+from ._multi import (CURLM, CURLM_OK, CURLMSG_DONE, multi_info_read,
+                     multi_remove_handle, multi_perform, multi_poll, multi_strerror)
+
+__all__ = ('Completion', 'multi_completed', 'multi_as_completed',
+           'add_completion_hook', 'remove_completion_hook')
+
+_completion_hooks = ()
+
+
+class Completion:
+    """A finished transfer: its easy handle, CURLcode and CURLOPT_PRIVATE
+    pointer (None if not requested or not set)."""
+
+    __slots__ = ('curl', 'result', 'private')
+
+    def __init__(self, curl: ct.POINTER(CURL), result: int, private=None):
+        self.curl    = curl
+        self.result  = result
+        self.private = private
+
+    @property
+    def ok(self):
+        return self.result == CURLE_OK
+
+    @property
+    def error(self):
+        """The libcurl error message of a failed transfer or None."""
+        return None if self.result == CURLE_OK else easy_strerror(self.result).decode("utf-8")
+
+    def __repr__(self):
+        return f"<Completion curl=0x{self.curl or 0:x} result={self.result}>"
+
+
+def multi_completed(multi: ct.POINTER(CURLM), remove=True, private=True) -> list:
+    """Read all the pending CURLMSG_DONE messages of multi.
+
+    Returns a list of Completion records. With remove true the finished
+    easy handles are removed from multi; with private true the records
+    carry the handles' CURLINFO_PRIVATE pointers.
+    """
+    done = []
+    msgs_left = ct.c_int(0)
+    while True:
+        msgp = multi_info_read(multi, ct.byref(msgs_left))
+        if not msgp: break
+        msg = msgp.contents
+        if msg.msg != CURLMSG_DONE: continue
+        done.append(Completion(msg.easy_handle, msg.data.result))
+    if private:
+        pointer = ct.c_void_p()
+        for completion in done:
+            pointer.value = None
+            easy_getinfo(completion.curl, CURLINFO_PRIVATE, ct.byref(pointer))
+            completion.private = pointer.value
+    if remove:
+        for completion in done:
+            res = multi_remove_handle(multi, completion.curl)
+            if res != CURLM_OK:
+                raise RuntimeError("libcurl.multi_remove_handle() failed (code %d): %s" %
+                                   (res, multi_strerror(res).decode("utf-8")))
+    if done and _completion_hooks:
+        for hook in _completion_hooks:
+            # The handles are already removed, so an error of a hook must
+            # not lose the completions: it is reported and ignored.
+            try:
+                hook(done)
+            except Exception:
+                print(f"Exception ignored in completion hook {hook!r}:", file=sys.stderr)
+                traceback.print_exc()
+    return done
+
+
+def multi_as_completed(multi: ct.POINTER(CURLM), timeout_ms=1000, remove=True, private=True):
+    """Drive the transfers of multi, yielding a Completion for each one as it
+    finishes, until none is running.
+
+    Handles added to multi while iterating are driven as well. timeout_ms is
+    the longest single multi_poll() wait.
+    """
+    running = ct.c_int(1)
+    while True:
+        res = multi_perform(multi, ct.byref(running))
+        if res != CURLM_OK:
+            raise RuntimeError("libcurl.multi_perform() failed (code %d): %s" %
+                               (res, multi_strerror(res).decode("utf-8")))
+        done = multi_completed(multi, remove, private)
+        yield from done
+        if not running.value:
+            if not done: break
+            continue  # handles may have been added meanwhile
+        res = multi_poll(multi, None, 0, timeout_ms, None)
+        if res != CURLM_OK:
+            raise RuntimeError("libcurl.multi_poll() failed (code %d): %s" %
+                               (res, multi_strerror(res).decode("utf-8")))
+
+
+def add_completion_hook(hook):
+    """Register hook(completions) to be called with every non-empty list of
+    Completion records read by multi_completed() (from any thread).
+
+    The easy handles are still intact when the hook is called. A hook must
+    be fast; an exception it raises is printed to stderr and ignored.
+    """
+    global _completion_hooks
+    _completion_hooks += (hook,)
+
+
+def remove_completion_hook(hook):
+    global _completion_hooks
+    hooks = list(_completion_hooks)
+    hooks.remove(hook)
+    _completion_hooks = tuple(hooks)
+
+# eof
@@ -31,7 +31,7 @@
 #   https://curl.se/libcurl/
 
 import os
-import io
+import mmap
 import ctypes as ct
 
 from ._platform import CFUNC, defined, from_oid
@@ -3486,6 +3486,11 @@ except: pass  # pragma: no cover
 
 # Addons & utils
 
+def _c_buffer(buffer, size):
+    # A writable memoryview over libcurl's buffer memory (no copy is made).
+    # It must not be used after the callback has returned.
+    return memoryview((ct.c_char * size).from_address(ct.addressof(buffer.contents))).cast("B")
+
 @write_callback
 def write_skipped(buffer, size, nitems, stream):
     # we are not interested in the downloaded data itself,
@@ -3497,7 +3502,7 @@ def write_to_file(buffer, size, nitems, stream):
     file = from_oid(stream)
     buffer_size = nitems * size
     if buffer_size == 0: return 0
-    bwritten = bytes(buffer[:buffer_size])
+    bwritten = ct.string_at(buffer, buffer_size)
     nwritten = file.write(bwritten)
     return nwritten
 
@@ -3505,6 +3510,11 @@ def write_to_file(buffer, size, nitems, stream):
 def read_from_file(buffer, size, nitems, stream):
     file = from_oid(stream)
     buffer_size = nitems * size
+    readinto = getattr(file, "readinto", None)
+    if readinto is not None:
+        # read straight into libcurl's buffer
+        nread = readinto(_c_buffer(buffer, buffer_size))
+        return nread or 0
     bread = file.read(buffer_size)
     if not bread: return 0
     nread = len(bread)
@@ -3516,41 +3526,203 @@ def write_to_fd(buffer, size, nitems, stream):
     fd = int(stream)
     buffer_size = nitems * size
     if buffer_size == 0: return 0
-    bwritten = bytes(buffer[:buffer_size])
-    nwritten = io.write(fd, bwritten)
+    bwritten = ct.string_at(buffer, buffer_size)
+    nwritten = os.write(fd, bwritten)
     return nwritten
 
-@read_callback
-def read_from_fd(buffer, size, nitems, stream):
-    fd = int(stream)
-    buffer_size = nitems * size
-    bread = os.read(fd, buffer_size)
-    if not bread: return 0
-    nread = len(bread)
-    ct.memmove(buffer, bread, nread)
-    return nread
+if hasattr(os, "readv"):
+    @read_callback
+    def read_from_fd(buffer, size, nitems, stream):
+        fd = int(stream)
+        buffer_size = nitems * size
+        # read straight into libcurl's buffer
+        nread = os.readv(fd, [_c_buffer(buffer, buffer_size)])
+        return nread
+else:  # pragma: no cover
+    @read_callback
+    def read_from_fd(buffer, size, nitems, stream):
+        fd = int(stream)
+        buffer_size = nitems * size
+        bread = os.read(fd, buffer_size)
+        if not bread: return 0
+        nread = len(bread)
+        ct.memmove(buffer, bread, nread)
+        return nread
 
 @write_callback
 def write_to_socket(buffer, size, nitems, stream):
     sock = from_oid(stream)
     buffer_size = nitems * size
     if buffer_size == 0: return 0
-    bwritten = bytes(buffer[:buffer_size])
+    bwritten = ct.string_at(buffer, buffer_size)
     nwritten = len(bwritten)
     sock.sendall(bwritten)
     return nwritten
 
+# Zero-copy sinks: the destination gets a memoryview over libcurl's own buffer
+# instead of a bytes copy of it, so it must not keep a reference to the data
+# after its write()/send() has returned (the standard io and socket objects
+# never do).
+
+@write_callback
+def write_view_to_file(buffer, size, nitems, stream):
+    file = from_oid(stream)
+    buffer_size = nitems * size
+    if buffer_size == 0: return 0
+    nwritten = file.write(_c_buffer(buffer, buffer_size))
+    return nwritten
+
+@write_callback
+def write_view_to_fd(buffer, size, nitems, stream):
+    fd = int(stream)
+    buffer_size = nitems * size
+    if buffer_size == 0: return 0
+    view = _c_buffer(buffer, buffer_size)
+    nwritten = os.write(fd, view)
+    while nwritten < buffer_size:  # short write (pipes, sockets, ...)
+        nwritten += os.write(fd, view[nwritten:])
+    return nwritten
+
+@write_callback
+def write_view_to_socket(buffer, size, nitems, stream):
+    sock = from_oid(stream)
+    buffer_size = nitems * size
+    if buffer_size == 0: return 0
+    sock.sendall(_c_buffer(buffer, buffer_size))
+    return buffer_size
+
+class MappedFileReader:
+    """A read-only memory map of a file, to be used as the stream of
+    read_from_file(): upload data is copied straight from the mapping
+    into libcurl's buffer.
+
+    file is a path, an open file object or a file descriptor (the latter
+    two remain owned by the caller).
+    """
+
+    def __init__(self, file):
+        self._file = None
+        if isinstance(file, int):
+            fileno = file
+        elif hasattr(file, "fileno"):
+            fileno = file.fileno()
+        else:
+            self._file = open(file, "rb")
+            fileno = self._file.fileno()
+        self._size = os.fstat(fileno).st_size
+        # an empty file cannot be mapped
+        self._mmap = (mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+                      if self._size else None)
+        self._view = memoryview(self._mmap if self._mmap is not None else b"")
+        self._pos  = 0
+
+    def __len__(self):
+        return self._size
+
+    def readinto(self, buffer):
+        chunk = self._view[self._pos:self._pos + len(buffer)]
+        nread = len(chunk)
+        memoryview(buffer).cast("B")[:nread] = chunk
+        self._pos += nread
+        return nread
+
+    def read(self, size=-1):
+        end = self._size if size is None or size < 0 else self._pos + size
+        data = self._view[self._pos:end].tobytes()
+        self._pos += len(data)
+        return data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        base = (0 if whence == os.SEEK_SET else
+                self._pos if whence == os.SEEK_CUR else self._size)
+        self._pos = min(max(base + offset, 0), self._size)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def close(self):
+        self._view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, exc_tb):
+        self.close()
+
 # unfortunately, the easy.h and multi.h include files need options and info
 # stuff before they can be included!
 from ._curlver    import *  # noqa # libcurl version defines
 from ._easy       import *  # noqa # nothing in curl is fun without the easy stuff
 from ._multi      import *  # noqa
-from ._urlapi     import *  # noqa
 from ._options    import *  # noqa
-from ._header     import *  # noqa
-from ._websockets import *  # noqa
 from ._system     import *  # noqa
-from ._typecheck  import *  # noqa
 #from ._mprintf   import *  # noqa
 
+# Rarely used areas and the addons are imported on first access of one of
+# their names (see __getattr__() below):
+#
+#   module: (name prefixes, names)
+#
+_lazy_modules = {
+    "._urlapi":     (("CURLU_", "CURLUE_", "CURLUPART_", "url_"),
+                     ("CURLU", "CURLUPart", "CURLUcode", "Curl_URL", "url")),
+    "._header":     (("CURLH_", "CURLHE_"),
+                     ("CURLHcode", "header", "easy_header", "easy_nextheader")),
+    "._websockets": (("CURLWS_", "ws_"), ()),
+    "._typecheck":  (("check_",), ()),
+    # addons
+    "._asyncio":    ((), ("AsyncMulti",)),
+    "._native":     ((), ("FILE", "fopen", "fdopen", "fclose", "fflush",
+                          "write_to_native_file", "read_from_native_file",
+                          "NativeFile")),
+    "._dispatch":   (("callback_", "dispatch_"), ()),
+    "._template":   ((), ("OptionTemplate",)),
+    "._pool":       ((), ("EasyPool",)),
+    "._session":    ((), ("Session", "Response")),
+    "._sharelock":  ((), ("ShareLock",)),
+    "._executor":   ((), ("CurlExecutor",)),
+    "._engine":     ((), ("MultiEngine",)),
+    "._submission": ((), ("SubmissionQueue",)),
+    "._completion": ((), ("Completion", "multi_completed", "multi_as_completed",
+                          "add_completion_hook", "remove_completion_hook")),
+    "._scheduler":  ((), ("AIMDController", "Scheduler")),
+    "._metrics":    ((), ("Metrics", "get_metrics", "MetricsStore")),
+    "._histogram":  ((), ("LatencyHistogram", "LatencyRecorder", "serve_openmetrics")),
+    "._trace":      ((), ("Tracer", "TraceEvent", "decode_trace", "format_trace")),
+    "._hexdump":    ((), ("hexdump", "debug_dump")),
+}
+
+def _lazy_module(name):
+    for module, (prefixes, names) in _lazy_modules.items():
+        if name in names or name.startswith(prefixes):
+            return module
+    return None
+
+def __getattr__(name):
+    module = _lazy_module(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    value = getattr(importlib.import_module(module, __package__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    import importlib
+    for module in _lazy_modules:
+        mod = importlib.import_module(module, __package__)
+        names = getattr(mod, "__all__", None)
+        if names is None:
+            names = (name for name in vars(mod) if _lazy_module(name) == module)
+        for name in names:
+            globals().setdefault(name, getattr(mod, name))
+    return sorted(globals())
+
 # eof
@@ -0,0 +1,198 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+# Shared callback trampolines.
+#
+# Every libcurl callback type has exactly one long-lived native thunk here.
+# The per-transfer Python handler is looked up in a registry keyed by the
+# callback's user data pointer, which is the integer key returned by
+# callback_register(). Thus no CFUNC thunk has to be created per easy handle
+# and no py_object has to be decoded on every invocation.
+#
+# Handlers receive the callback's arguments without the user data pointer,
+# e.g. a CURLOPT_WRITEFUNCTION handler is called as handler(buffer, size,
+# nitems) and a CURLOPT_XFERINFOFUNCTION one as handler(dltotal, dlnow,
+# ultotal, ulnow).
+
+import itertools
+import ctypes as ct
+
+from ._curl import (CURL, CURLE_OK,
+                    write_callback, read_callback, xferinfo_callback,
+                    progress_callback, debug_callback, seek_callback,
+                    sockopt_callback, opensocket_callback, closesocket_callback,
+                    prereq_callback, trailer_callback, ssl_ctx_callback,
+                    resolver_start_callback, fnmatch_callback,
+                    hstsread_callback, hstswrite_callback,
+                    CURLOPT_WRITEFUNCTION, CURLOPT_WRITEDATA,
+                    CURLOPT_HEADERFUNCTION, CURLOPT_HEADERDATA,
+                    CURLOPT_INTERLEAVEFUNCTION, CURLOPT_INTERLEAVEDATA,
+                    CURLOPT_READFUNCTION, CURLOPT_READDATA,
+                    CURLOPT_XFERINFOFUNCTION, CURLOPT_XFERINFODATA,
+                    CURLOPT_PROGRESSFUNCTION, CURLOPT_PROGRESSDATA,
+                    CURLOPT_DEBUGFUNCTION, CURLOPT_DEBUGDATA,
+                    CURLOPT_SEEKFUNCTION, CURLOPT_SEEKDATA,
+                    CURLOPT_SOCKOPTFUNCTION, CURLOPT_SOCKOPTDATA,
+                    CURLOPT_OPENSOCKETFUNCTION, CURLOPT_OPENSOCKETDATA,
+                    CURLOPT_CLOSESOCKETFUNCTION, CURLOPT_CLOSESOCKETDATA,
+                    CURLOPT_PREREQFUNCTION, CURLOPT_PREREQDATA,
+                    CURLOPT_TRAILERFUNCTION, CURLOPT_TRAILERDATA,
+                    CURLOPT_SSL_CTX_FUNCTION, CURLOPT_SSL_CTX_DATA,
+                    CURLOPT_RESOLVER_START_FUNCTION, CURLOPT_RESOLVER_START_DATA,
+                    CURLOPT_FNMATCH_FUNCTION, CURLOPT_FNMATCH_DATA,
+                    CURLOPT_HSTSREADFUNCTION, CURLOPT_HSTSREADDATA,
+                    CURLOPT_HSTSWRITEFUNCTION, CURLOPT_HSTSWRITEDATA,
+                    easy_strerror)
+from ._easy import easy_setopt
+
+__all__ = ('callback_register', 'callback_unregister', 'callback_handler',
+           'callback_setopt', 'callback_release',
+           'dispatch_write', 'dispatch_read', 'dispatch_xferinfo',
+           'dispatch_progress', 'dispatch_debug', 'dispatch_seek',
+           'dispatch_sockopt', 'dispatch_opensocket', 'dispatch_closesocket',
+           'dispatch_prereq', 'dispatch_trailer', 'dispatch_ssl_ctx',
+           'dispatch_resolver_start', 'dispatch_fnmatch',
+           'dispatch_hstsread', 'dispatch_hstswrite')
+
+_handlers = {}                    # key -> handler
+_handle_keys = {}                 # easy handle address -> [key, ...]
+_next_key = itertools.count(1)    # 0 would reach the trampolines as None
+
+
+def callback_register(handler) -> int:
+    """Register a handler and return the key to pass as its user data."""
+    key = next(_next_key)
+    _handlers[key] = handler
+    return key
+
+
+def callback_unregister(key: int):
+    _handlers.pop(key, None)
+
+
+def callback_handler(key: int):
+    return _handlers.get(key)
+
+
+def callback_setopt(curl: ct.POINTER(CURL), option: int, handler) -> int:
+    """Install handler for the callback option (e.g. CURLOPT_WRITEFUNCTION).
+
+    The shared trampoline of the callback's type is set as the function
+    and a freshly registered key as its data option. Returns the key;
+    it is released by callback_unregister() or callback_release(curl).
+    """
+    try:
+        trampoline, data_option = _trampolines[option]
+    except KeyError:
+        raise ValueError(f"Unsupported callback option: {option}") from None
+    key = callback_register(handler)
+    res = easy_setopt(curl, option, trampoline)
+    if res == CURLE_OK:
+        res = easy_setopt(curl, data_option, key)
+    if res != CURLE_OK:
+        callback_unregister(key)
+        raise RuntimeError("libcurl.easy_setopt() failed (code %d): %s" %
+                           (res, easy_strerror(res).decode("utf-8")))
+    _handle_keys.setdefault(ct.cast(curl, ct.c_void_p).value, []).append(key)
+    return key
+
+
+def callback_release(curl: ct.POINTER(CURL)):
+    """Unregister all handlers installed by callback_setopt() for curl."""
+    for key in _handle_keys.pop(ct.cast(curl, ct.c_void_p).value, ()):
+        _handlers.pop(key, None)
+
+# The trampolines
+
+@write_callback
+def dispatch_write(buffer, size, nitems, userdata):
+    return _handlers[userdata](buffer, size, nitems)
+
+@read_callback
+def dispatch_read(buffer, size, nitems, userdata):
+    return _handlers[userdata](buffer, size, nitems)
+
+@xferinfo_callback
+def dispatch_xferinfo(clientp, dltotal, dlnow, ultotal, ulnow):
+    return _handlers[clientp](dltotal, dlnow, ultotal, ulnow)
+
+@progress_callback
+def dispatch_progress(clientp, dltotal, dlnow, ultotal, ulnow):
+    return _handlers[clientp](dltotal, dlnow, ultotal, ulnow)
+
+@debug_callback
+def dispatch_debug(handle, info_type, data, size, userptr):
+    return _handlers[userptr](handle, info_type, data, size)
+
+@seek_callback
+def dispatch_seek(instream, offset, origin):
+    return _handlers[instream](offset, origin)
+
+@sockopt_callback
+def dispatch_sockopt(clientp, curlfd, purpose):
+    return _handlers[clientp](curlfd, purpose)
+
+@opensocket_callback
+def dispatch_opensocket(clientp, purpose, address):
+    return _handlers[clientp](purpose, address)
+
+@closesocket_callback
+def dispatch_closesocket(clientp, item):
+    return _handlers[clientp](item)
+
+@prereq_callback
+def dispatch_prereq(clientp, conn_primary_ip, conn_local_ip,
+                    conn_primary_port, conn_local_port):
+    return _handlers[clientp](conn_primary_ip, conn_local_ip,
+                              conn_primary_port, conn_local_port)
+
+@trailer_callback
+def dispatch_trailer(headers, userdata):
+    return _handlers[userdata](headers)
+
+@ssl_ctx_callback
+def dispatch_ssl_ctx(curl, ssl_ctx, userptr):
+    return _handlers[userptr](curl, ssl_ctx)
+
+@resolver_start_callback
+def dispatch_resolver_start(resolver_state, reserved, userdata):
+    return _handlers[userdata](resolver_state, reserved)
+
+@fnmatch_callback
+def dispatch_fnmatch(ptr, pattern, string):
+    return _handlers[ptr](pattern, string)
+
+@hstsread_callback
+def dispatch_hstsread(easy, entry, userp):
+    return _handlers[userp](easy, entry)
+
+@hstswrite_callback
+def dispatch_hstswrite(easy, entry, index, userp):
+    return _handlers[userp](easy, entry, index)
+
+
+# callback option -> (trampoline, its data option)
+# (CURLOPT_PROGRESSDATA is an alias of CURLOPT_XFERINFODATA, so only one of
+# the progress and xferinfo callbacks can be dispatched for a handle)
+_trampolines = {
+    CURLOPT_WRITEFUNCTION:          (dispatch_write,          CURLOPT_WRITEDATA),
+    CURLOPT_HEADERFUNCTION:         (dispatch_write,          CURLOPT_HEADERDATA),
+    CURLOPT_INTERLEAVEFUNCTION:     (dispatch_write,          CURLOPT_INTERLEAVEDATA),
+    CURLOPT_READFUNCTION:           (dispatch_read,           CURLOPT_READDATA),
+    CURLOPT_XFERINFOFUNCTION:       (dispatch_xferinfo,       CURLOPT_XFERINFODATA),
+    CURLOPT_PROGRESSFUNCTION:       (dispatch_progress,       CURLOPT_PROGRESSDATA),
+    CURLOPT_DEBUGFUNCTION:          (dispatch_debug,          CURLOPT_DEBUGDATA),
+    CURLOPT_SEEKFUNCTION:           (dispatch_seek,           CURLOPT_SEEKDATA),
+    CURLOPT_SOCKOPTFUNCTION:        (dispatch_sockopt,        CURLOPT_SOCKOPTDATA),
+    CURLOPT_OPENSOCKETFUNCTION:     (dispatch_opensocket,     CURLOPT_OPENSOCKETDATA),
+    CURLOPT_CLOSESOCKETFUNCTION:    (dispatch_closesocket,    CURLOPT_CLOSESOCKETDATA),
+    CURLOPT_PREREQFUNCTION:         (dispatch_prereq,         CURLOPT_PREREQDATA),
+    CURLOPT_TRAILERFUNCTION:        (dispatch_trailer,        CURLOPT_TRAILERDATA),
+    CURLOPT_SSL_CTX_FUNCTION:       (dispatch_ssl_ctx,        CURLOPT_SSL_CTX_DATA),
+    CURLOPT_RESOLVER_START_FUNCTION: (dispatch_resolver_start, CURLOPT_RESOLVER_START_DATA),
+    CURLOPT_FNMATCH_FUNCTION:       (dispatch_fnmatch,        CURLOPT_FNMATCH_DATA),
+    CURLOPT_HSTSREADFUNCTION:       (dispatch_hstsread,       CURLOPT_HSTSREADDATA),
+    CURLOPT_HSTSWRITEFUNCTION:      (dispatch_hstswrite,      CURLOPT_HSTSWRITEDATA),
+}
+
+# eof
@@ -31,7 +31,9 @@ import ctypes as ct
 
 from ._platform import CFUNC
 from ._dll      import dll
-from ._curl     import CURL, CURLcode, CURLoption, CURLINFO
+from ._curl     import CURL, CURLcode, CURLoption, CURLINFO, off_t
+from ._curl     import (CURLOPTTYPE_OBJECTPOINT, CURLOPTTYPE_FUNCTIONPOINT,
+                        CURLOPTTYPE_OFF_T, CURLOPTTYPE_BLOB)
 
 # Flag bits in the curl_blob struct:
 CURL_BLOB_COPY   = 1  # tell libcurl to copy the data
@@ -48,7 +50,43 @@ class blob(ct.Structure):
 easy_init = CFUNC(ct.POINTER(CURL))(
     ("curl_easy_init", dll),)
 
-easy_setopt = CFUNC(CURLcode,
+# Typed curl_easy_setopt() prototypes, one per kind of option argument.
+
+setopt_long = CFUNC(CURLcode,
+    ct.POINTER(CURL),
+    CURLoption,
+    ct.c_long)(
+    ("curl_easy_setopt", dll), (
+    (1, "curl"),
+    (1, "option"),
+    (1, "value"),))
+
+setopt_off_t = CFUNC(CURLcode,
+    ct.POINTER(CURL),
+    CURLoption,
+    off_t)(
+    ("curl_easy_setopt", dll), (
+    (1, "curl"),
+    (1, "option"),
+    (1, "value"),))
+
+class _c_string(ct.c_char_p):
+    # char * also taking str (encoded to UTF-8).
+    @classmethod
+    def from_param(cls, value):
+        if isinstance(value, str): value = value.encode("utf-8")
+        return ct.c_char_p.from_param(value)
+
+setopt_str = CFUNC(CURLcode,
+    ct.POINTER(CURL),
+    CURLoption,
+    _c_string)(
+    ("curl_easy_setopt", dll), (
+    (1, "curl"),
+    (1, "option"),
+    (1, "value"),))
+
+setopt_ptr = CFUNC(CURLcode,
     ct.POINTER(CURL),
     CURLoption,
     ct.c_void_p)(
@@ -57,6 +95,71 @@ easy_setopt = CFUNC(CURLcode,
     (1, "option"),
     (1, "value"),))
 
+setopt_func = CFUNC(CURLcode,
+    ct.POINTER(CURL),
+    CURLoption,
+    ct.c_void_p)(  # any callback function object
+    ("curl_easy_setopt", dll), (
+    (1, "curl"),
+    (1, "option"),
+    (1, "value"),))
+
+setopt_blob = CFUNC(CURLcode,
+    ct.POINTER(CURL),
+    CURLoption,
+    ct.POINTER(blob))(
+    ("curl_easy_setopt", dll), (
+    (1, "curl"),
+    (1, "option"),
+    (1, "value"),))
+
+# The prototype matching an option is picked by the option's CURLOPTTYPE_*
+# band (string options are told apart from other object pointers by their
+# CURLOT_STRING type in libcurl's option table) and cached per option.
+
+_setopt_table = {}  # option -> setopt_* prototype
+
+def setopt_prototype(option):
+    """The typed setopt_* prototype for option, by its CURLOPTTYPE_* band."""
+    try:
+        return _setopt_table[option]
+    except KeyError:
+        pass
+    if option < CURLOPTTYPE_OBJECTPOINT:
+        setopt = setopt_long
+    elif option < CURLOPTTYPE_FUNCTIONPOINT:
+        from ._options import easy_option_by_id, CURLOT_STRING
+        info = easy_option_by_id(option)
+        setopt = setopt_str if info and info.contents.type == CURLOT_STRING else setopt_ptr
+    elif option < CURLOPTTYPE_OFF_T:
+        setopt = setopt_func
+    elif option < CURLOPTTYPE_BLOB:
+        setopt = setopt_off_t
+    else:
+        setopt = setopt_blob
+    _setopt_table[option] = setopt
+    return setopt
+
+# NAME curl_easy_setopt()
+#
+# DESCRIPTION
+#
+# Sets a particular option for the curl session handle through the typed
+# setopt_* prototype matching the option. Values the prototype does not take
+# (e.g. None for a long option or a c_void_p for a string one) are passed as
+# a pointer, as by an untyped curl_easy_setopt().
+#
+def easy_setopt(curl, option, value):
+    try:
+        setopt = _setopt_table[option]
+    except KeyError:
+        setopt = setopt_prototype(option)
+    try:
+        return setopt(curl, option, value)
+    except ct.ArgumentError:
+        if setopt is setopt_ptr: raise
+        return setopt_ptr(curl, option, value)
+
 easy_perform = CFUNC(CURLcode,
     ct.POINTER(CURL))(
     ("curl_easy_perform", dll), (
@@ -0,0 +1,227 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+# Sharded multi engine.
+#
+# A multi handle must only be used by one thread, so a single event loop
+# tops out at one core of TLS and callback work. MultiEngine runs N multi
+# handles on N threads (shards). Submitted transfers are sharded by host,
+# so that transfers to one host share the connection cache of one multi
+# handle, and a host is moved to the least loaded shard when its shard has
+# too many more transfers in flight. Transfers are handed over to a shard
+# through its SubmissionQueue, which wakes the shard up from multi_poll().
+
+import os
+import threading
+import collections
+import ctypes as ct
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+
+from ._multi    import (CURLM_OK, CURLMOPT_MAX_HOST_CONNECTIONS,
+                        CURLMOPT_MAX_TOTAL_CONNECTIONS, multi_setopt, multi_strerror,
+                        multi_init, multi_cleanup,
+                        multi_add_handle, multi_remove_handle, multi_perform,
+                        multi_poll)
+from ._template import OptionTemplate
+from ._pool     import EasyPool
+from ._submission import SubmissionQueue
+from ._completion import multi_completed
+from ._session  import Response, _prepare_request, _finish_request, _check_multi
+
+__all__ = ('MultiEngine',)
+
+
+class _Transfer:
+
+    __slots__ = ('future', 'method', 'url', 'data', 'headers', 'options',
+                 'curl', 'response', 'body', 'tmpl')
+
+    def __init__(self, future, method, url, data, headers, options):
+        self.future   = future
+        self.method   = method
+        self.url      = url
+        self.data     = data
+        self.headers  = headers
+        self.options  = options
+        self.curl     = None
+        self.response = Response()
+        self.body     = []
+        self.tmpl     = None
+
+
+class _Shard(threading.Thread):
+
+    def __init__(self, engine, index, template, multi_options):
+        super().__init__(name=f"MultiEngine-{index}", daemon=True)
+        self.engine    = engine
+        self.inflight  = 0  # submitted and not yet finished (engine._lock)
+        self.pool      = EasyPool(template=template)
+        self.transfers = {}  # easy handle address -> _Transfer
+        self.multi = multi_init()
+        if not self.multi:
+            raise RuntimeError("libcurl.multi_init() failed")
+        for option, value in multi_options.items():
+            res = multi_setopt(self.multi, option, value)
+            if res != CURLM_OK:
+                multi_cleanup(self.multi)
+                raise RuntimeError("libcurl.multi_setopt() failed (code %d): %s" %
+                                   (res, multi_strerror(res).decode("utf-8")))
+        self.queue = SubmissionQueue(self.multi)
+
+    def run(self):
+        running = ct.c_int(0)
+        try:
+            while True:
+                self._start_pending()
+                _check_multi(multi_perform(self.multi, ct.byref(running)), "multi_perform")
+                self._collect_done()
+                if self.queue.closed and not self.transfers and not self.queue:
+                    break
+                _check_multi(multi_poll(self.multi, None, 0, 1000, None), "multi_poll")
+        except BaseException as exc:
+            self.queue.close()
+            for transfer in list(self.transfers.values()) + self.queue.drain():
+                self._finish(transfer, exc=exc)
+            raise
+        finally:
+            self.pool.close()
+            self.queue.detach()  # no wakeup reaches the multi handle from now on
+            multi_cleanup(self.multi)
+
+    def _start_pending(self):
+        for transfer in self.queue.drain():
+            if not transfer.future.set_running_or_notify_cancel():
+                self._finish(transfer)
+                continue
+            try:
+                curl = transfer.curl = self.pool.acquire()
+                transfer.tmpl = _prepare_request(curl, transfer.method, transfer.url,
+                                                 transfer.data, transfer.headers,
+                                                 transfer.options, transfer.response,
+                                                 transfer.body)
+                _check_multi(multi_add_handle(self.multi, curl), "multi_add_handle")
+            except BaseException as exc:
+                self._finish(transfer, exc=exc)
+                continue
+            self.transfers[ct.cast(curl, ct.c_void_p).value] = transfer
+
+    def _collect_done(self):
+        for done in multi_completed(self.multi, private=False):
+            transfer = self.transfers.pop(ct.cast(done.curl, ct.c_void_p).value)
+            _finish_request(transfer.curl, transfer.response, done.result)
+            transfer.response.content = b"".join(transfer.body)
+            self._finish(transfer, result=transfer.response)
+
+    def _finish(self, transfer, result=None, exc=None):
+        if transfer.tmpl is not None:
+            transfer.tmpl.close()
+        if transfer.curl is not None:
+            if ct.cast(transfer.curl, ct.c_void_p).value in self.transfers:
+                multi_remove_handle(self.multi, transfer.curl)
+            self.pool.release(transfer.curl)
+        with self.engine._lock:
+            self.inflight -= 1
+        if exc is not None:
+            transfer.future.set_exception(exc)
+        elif result is not None:
+            transfer.future.set_result(result)
+
+
+class MultiEngine:
+    """Run transfers on several multi handles, each driven by its own thread.
+
+    submit() takes the arguments of Session.request() and returns a
+    concurrent.futures.Future of its Response:
+
+        with MultiEngine(threads=4, options={"FOLLOWLOCATION": 1}) as engine:
+            futures = [engine.submit(url) for url in urls]
+            for future in as_completed(futures):
+                resp = future.result()
+
+    A host stays on its shard unless that shard has more than rebalance
+    transfers in flight beyond the least loaded one. Up to max_hosts
+    host-to-shard assignments are remembered. max_host_connections and
+    max_total_connections limit the connections of each shard (see
+    CURLMOPT_MAX_HOST_CONNECTIONS and CURLMOPT_MAX_TOTAL_CONNECTIONS);
+    transfers beyond the limits are queued by libcurl.
+    """
+
+    def __init__(self, threads=None, options=None, rebalance=16, max_hosts=65536,
+                 max_host_connections=None, max_total_connections=None):
+        if threads is None:
+            threads = os.cpu_count() or 1
+        if threads <= 0:
+            raise ValueError("threads must be greater than 0")
+        self.rebalance = rebalance
+        self.max_hosts = max_hosts
+        self._lock     = threading.Lock()
+        self._hosts    = collections.OrderedDict()  # (host, port) -> _Shard
+        self._closed   = False
+        self._template = OptionTemplate(options) if options else None
+        multi_options = {}
+        if max_host_connections is not None:
+            multi_options[CURLMOPT_MAX_HOST_CONNECTIONS] = max_host_connections
+        if max_total_connections is not None:
+            multi_options[CURLMOPT_MAX_TOTAL_CONNECTIONS] = max_total_connections
+        self._shards = [_Shard(self, index, self._template, multi_options)
+                        for index in range(threads)]
+        for shard in self._shards:
+            shard.start()
+
+    def __len__(self):
+        """Number of transfers in flight."""
+        return sum(shard.inflight for shard in self._shards)
+
+    @property
+    def loads(self):
+        """Number of transfers in flight per shard."""
+        return [shard.inflight for shard in self._shards]
+
+    def submit(self, url, /, method="GET", data=None, headers=None, **options) -> Future:
+        """Schedule a transfer; returns a Future of its Response."""
+        future = Future()
+        parts = urlsplit(url)
+        host = (parts.hostname, parts.port)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MultiEngine is closed")
+            shard = self._select(host)
+            shard.queue.put(_Transfer(future, method, url, data, headers, options))
+            shard.inflight += 1
+        return future
+
+    def close(self, wait=True):
+        """Stop the shards once their transfers are done."""
+        with self._lock:
+            closed, self._closed = self._closed, True
+        if not closed:
+            for shard in self._shards:
+                shard.queue.close()
+        if wait:
+            for shard in self._shards:
+                shard.join()
+            if self._template is not None:
+                self._template.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, exc_tb):
+        self.close()
+
+    # Internals
+
+    def _select(self, host):
+        # Called with the lock held.
+        hosts = self._hosts
+        least = min(self._shards, key=lambda shard: shard.inflight)
+        shard = hosts.get(host)
+        if shard is None or shard.inflight > least.inflight + self.rebalance:
+            shard = hosts[host] = least
+            if len(hosts) > self.max_hosts:
+                hosts.popitem(last=False)
+        hosts.move_to_end(host)
+        return shard
+
+# eof
@@ -0,0 +1,73 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+# Thread-pool transfer executor.
+#
+# ctypes releases the GIL for the duration of curl_easy_perform(), so
+# blocking transfers run on a pool of threads proceed in parallel, TLS
+# handshakes and decompression included. CurlExecutor is a
+# concurrent.futures.Executor running transfers on a fixed number of worker
+# threads, which share one Session: a share handle (protected by a
+# ShareLock) and a pool of recycled easy handles, one per worker.
+
+import os
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+
+from ._session import Session
+
+__all__ = ('CurlExecutor',)
+
+
+class CurlExecutor(Executor):
+    """Executor running libcurl transfers on worker threads.
+
+    submit() takes the arguments of Session.request() and returns a Future
+    of its Response:
+
+        with CurlExecutor(max_workers=8) as executor:
+            futures = [executor.submit(url, timeout=10) for url in urls]
+            for future in as_completed(futures):
+                resp = future.result()
+
+    If no session is given, the executor creates one with the given default
+    options and closes it on shutdown(wait=True).
+    """
+
+    def __init__(self, max_workers=None, options=None, session=None):
+        if max_workers is None:
+            max_workers = min(32, (os.cpu_count() or 1) + 4)
+        if max_workers <= 0:
+            raise ValueError("max_workers must be greater than 0")
+        self.max_workers = max_workers
+        self._own_session = session is None
+        self._session = (Session(options, maxsize=max_workers)
+                         if session is None else session)
+        self._executor = ThreadPoolExecutor(max_workers,
+                                            thread_name_prefix="CurlExecutor")
+        self._shutdown_lock = threading.Lock()
+        self._closed = False
+
+    @property
+    def session(self):
+        return self._session
+
+    def submit(self, url, /, method="GET", data=None, headers=None, **options):
+        """Schedule a transfer; returns a Future of its Response."""
+        return self._executor.submit(self._session.request,
+                                     method, url, data, headers, **options)
+
+    def map(self, urls, *, timeout=None, **options):
+        """Transfer all urls; yields the Responses in the order of urls."""
+        return self._executor.map(lambda url: self._session.request("GET", url, **options),
+                                  urls, timeout=timeout)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        self._executor.shutdown(wait=wait, cancel_futures=cancel_futures)
+        if wait and self._own_session:
+            with self._shutdown_lock:
+                if not self._closed:
+                    self._closed = True
+                    self._session.close()
+
+# eof
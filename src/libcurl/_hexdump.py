@@ -0,0 +1,121 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+# Hex dump of debug callback data.
+#
+# The classic curl debug dump (offset, 16 hex bytes, ASCII column; or 64
+# character ASCII rows broken at CRLF without the hex column) formatted a
+# block at a time: the rows of a block have a fixed width, so a block is a
+# copy of a precomputed template (offsets, separators, newlines) whose hex
+# and ASCII columns are filled in with one strided slice assignment per
+# column, each translated from the matching byte column of the data.
+
+import ctypes as ct
+
+__all__ = ('hexdump', 'debug_dump')
+
+_ascii = bytes(byte if 0x20 <= byte < 0x80 else 0x2E for byte in range(256))  # '.'
+_hex_hi = bytes(b"0123456789abcdef"[byte >> 4]  for byte in range(256))
+_hex_lo = bytes(b"0123456789abcdef"[byte & 0xF] for byte in range(256))
+_block = 0x10000  # bytes formatted at once
+_templates = {}   # offset prefix length -> rows of a whole block
+
+
+def hexdump(data, size=None, no_hex=False) -> str:
+    """The data dumped as rows of offset, hex bytes and ASCII characters
+    (or, with no_hex true, of up to 64 ASCII characters broken at CRLF).
+
+    data is a bytes-like object, or the data pointer (or address) of a
+    CURLOPT_DEBUGFUNCTION callback together with its size.
+    """
+    return "".join(_dump(_view(data, size), no_hex))
+
+
+def debug_dump(stream, text: str, data, size=None, no_hex=False, num=None):
+    """Write the dump of data to stream, preceded by a
+    "[num] text, size bytes (0xsize)" line, as a debug callback does."""
+    view = _view(data, size)
+    size = len(view)
+    if num is None:
+        stream.write("%s, %d bytes (0x%x)\n" % (text, size, size))
+    else:
+        stream.write("%d %s, %d bytes (0x%x)\n" % (num, text, size, size))
+    for chunk in _dump(view, no_hex):
+        stream.write(chunk)
+    stream.flush()
+
+
+def _view(data, size):
+    if isinstance(data, (int, ct._Pointer, ct.c_void_p)):
+        if size is None:
+            raise ValueError("size is required for a data pointer")
+        address = data if isinstance(data, int) else ct.cast(data, ct.c_void_p).value
+        if not size: return memoryview(b"")
+        return memoryview((ct.c_ubyte * size).from_address(address))
+    view = memoryview(data)
+    return view if size is None else view[:size]
+
+
+def _dump(view, no_hex):
+    # Yields the rows, a block at a time.
+    if no_hex:
+        yield from _dump_text(view)
+        return
+    size = len(view)
+    for start in range(0, size, _block):
+        block = bytes(view[start:start + _block])
+        rows  = len(block) // 0x10
+        # Offsets of a block are its start's digits above the low 16 bits
+        # followed by the "%04x" offset of the row within the block.
+        prefix = b"%x" % (start >> 16) if start else b""
+        hexcol = len(prefix) + 6
+        ascol  = hexcol + 48
+        width  = ascol + 17
+        text = bytearray(_template(len(prefix)))
+        del text[rows * width:]
+        for col in range(len(prefix)):
+            text[col::width] = prefix[col:col + 1] * rows
+        for col in range(0x10):
+            column = block[col:rows * 0x10:0x10]
+            text[hexcol + col * 3::width]     = column.translate(_hex_hi)
+            text[hexcol + col * 3 + 1::width] = column.translate(_hex_lo)
+            text[ascol + col::width]          = column.translate(_ascii)
+        tail = block[rows * 0x10:]
+        if tail:
+            text += b"%04x: %s%s\n" % (start + rows * 0x10,
+                                       tail.hex(" ").ljust(48).encode("ascii"),
+                                       tail.translate(_ascii))
+        yield text.decode("ascii")
+
+
+def _template(prefix_len):
+    # The rows of a whole block with blank prefix, hex and ASCII columns.
+    try:
+        return _templates[prefix_len]
+    except KeyError:
+        pass
+    row = b" " * prefix_len + b"%04x: " + b" " * (48 + 0x10) + b"\n"
+    template = _templates[prefix_len] = b"".join(row % pos for pos in range(0, _block, 0x10))
+    return template
+
+
+def _dump_text(view):
+    # Rows of up to 64 characters; CRLF ends a row and is not shown.
+    data  = bytes(view)
+    ascii = data.translate(_ascii).decode("ascii")
+    lines = data.split(b"\r\n")
+    if not lines[-1]: del lines[-1]
+    rows = []
+    start = 0
+    for line in lines:
+        end = start + len(line)
+        rows.extend("%04x: %s\n" % (pos, ascii[pos:min(pos + 0x40, end)])
+                    for pos in range(start, end, 0x40))
+        if start == end: rows.append("%04x: \n" % start)
+        start = end + 2
+        if len(rows) >= 0x400:
+            yield "".join(rows)
+            rows.clear()
+    yield "".join(rows)
+
+# eof
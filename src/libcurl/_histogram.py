@@ -0,0 +1,345 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+# Streaming latency histograms.
+#
+# LatencyHistogram counts values (microseconds) in log-linear buckets in the
+# manner of HdrHistogram: 2**precision linear buckets and from there on
+# 2**(precision-1) buckets per power of two, so that the relative error is
+# bounded by 2**-(precision-1) and the memory by the magnitude of the
+# largest value (a few KB for an hour in microseconds). Histograms of the
+# same precision are merged by adding their counts, also after a round trip
+# through to_bytes()/from_bytes() between processes.
+#
+# LatencyRecorder is a completion hook which feeds the phase durations of
+# every transfer completed on a multi handle into one histogram per host,
+# protocol and phase, and renders them in the OpenMetrics text format, which
+# serve_openmetrics() serves from a local HTTP endpoint.
+
+import sys
+import threading
+import array
+import struct
+import ctypes as ct
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit
+
+from ._curl       import CURL, CURLINFO_EFFECTIVE_URL
+from ._easy       import easy_getinfo
+from ._metrics    import Metrics, MetricsStore, _read_metrics
+from ._completion import add_completion_hook, remove_completion_hook
+
+__all__ = ('LatencyHistogram', 'LatencyRecorder', 'serve_openmetrics')
+
+
+class LatencyHistogram:
+    """Log-linear histogram of non-negative integer values (microseconds).
+
+    precision is the number of significant bits kept per value; values are
+    counted with a relative error below 2**-(precision-1).
+    """
+
+    _header = struct.Struct("<BQQQQ")  # precision, count, sum, min, max
+
+    def __init__(self, precision=5):
+        if not 2 <= precision <= 16:
+            raise ValueError("precision must be between 2 and 16")
+        self.precision = precision
+        self.counts = array.array("Q")
+        self.count = 0
+        self.sum   = 0
+        self.min   = None
+        self.max   = None
+        self._linear = 1 << precision
+        self._half   = 1 << (precision - 1)
+
+    def __len__(self):
+        return self.count
+
+    def record(self, value: int, count: int = 1):
+        """Count value (clamped to 0 if negative) count times."""
+        if value < 0: value = 0
+        index = self._index(value)
+        counts = self.counts
+        if index >= len(counts):
+            counts.extend([0] * (index + 1 - len(counts)))
+        counts[index] += count
+        self.count += count
+        self.sum += value * count
+        if self.min is None or value < self.min: self.min = value
+        if self.max is None or value > self.max: self.max = value
+
+    def merge(self, other: "LatencyHistogram"):
+        """Add the counts of other (of the same precision) to this one."""
+        if other.precision != self.precision:
+            raise ValueError("histograms of different precision cannot be merged")
+        if not other.count: return
+        counts = self.counts
+        if len(other.counts) > len(counts):
+            counts.extend([0] * (len(other.counts) - len(counts)))
+        for index, count in enumerate(other.counts):
+            if count: counts[index] += count
+        self.count += other.count
+        self.sum += other.sum
+        if self.min is None or other.min < self.min: self.min = other.min
+        if self.max is None or other.max > self.max: self.max = other.max
+
+    def percentile(self, percent: float):
+        """The value below which percent of the values lie (the highest value
+        of its bucket, at most max), or None if empty."""
+        if not self.count: return None
+        rank = max(1, -(-self.count * percent // 100))  # ceil
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self._bucket_bounds(index)[1], self.max)
+        return self.max
+
+    def buckets(self):
+        """Iterate over the (lowest value, highest value, count) of the
+        non-empty buckets."""
+        for index, count in enumerate(self.counts):
+            if count:
+                low, high = self._bucket_bounds(index)
+                yield low, high, count
+
+    def cumulative(self, bounds):
+        """Number of values <= each of the ascending bounds (exact for bounds
+        which are powers of two minus one, or below 2**precision)."""
+        result = []
+        seen = 0
+        index = 0
+        counts = self.counts
+        for bound in bounds:
+            last = min(self._index(bound), len(counts) - 1)
+            while index <= last:
+                seen += counts[index]
+                index += 1
+            result.append(seen)
+        return result
+
+    def to_bytes(self) -> bytes:
+        header = self._header.pack(self.precision, self.count, self.sum,
+                                   self.min or 0, self.max or 0)
+        counts = self.counts
+        if sys.byteorder != "little":
+            counts = array.array("Q", counts)
+            counts.byteswap()
+        return header + counts.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "LatencyHistogram":
+        precision, count, total, vmin, vmax = cls._header.unpack_from(data)
+        self = cls(precision)
+        counts = array.array("Q")
+        counts.frombytes(data[cls._header.size:])
+        if sys.byteorder != "little":
+            counts.byteswap()
+        self.counts = counts
+        self.count  = count
+        self.sum    = total
+        self.min    = vmin if count else None
+        self.max    = vmax if count else None
+        return self
+
+    def __repr__(self):
+        return (f"<LatencyHistogram count={self.count} min={self.min} "
+                f"p50={self.percentile(50)} p99={self.percentile(99)} max={self.max}>")
+
+    # Internals
+
+    def _index(self, value):
+        if value < self._linear:
+            return value
+        shift = value.bit_length() - self.precision
+        return self._linear + (shift - 1) * self._half + (value >> shift) - self._half
+
+    def _bucket_bounds(self, index):
+        if index < self._linear:
+            return index, index
+        shift, offset = divmod(index - self._linear, self._half)
+        shift += 1
+        low = (offset + self._half) << shift
+        return low, low + (1 << shift) - 1
+
+
+class LatencyRecorder:
+    """Per host, protocol and transfer phase latency histograms.
+
+        recorder = LatencyRecorder()
+        recorder.attach()   # record every transfer completed on a multi handle
+        server = serve_openmetrics(recorder, port=9464)
+        ...
+        print(recorder.histogram("example.com", "https", "total"))
+
+    The phases are those of MetricsStore (queue, namelookup, connect, tls,
+    wait, transfer and total). The recorder is thread-safe; recorders (e.g.
+    of other processes, via to_bytes()/from_bytes()) can be merged.
+    """
+
+    def __init__(self, precision=5, phases=None):
+        self.precision = precision
+        self.phases = tuple(MetricsStore.phases if phases is None else phases)
+        field = {name: index for index, name in enumerate(Metrics._fields)}
+        self._phase_fields = tuple(
+            (phase, field[MetricsStore.phases[phase][0]],
+             tuple(field[name] for name in MetricsStore.phases[phase][1]))
+            for phase in self.phases)
+        self._histograms = {}  # (host, protocol, phase) -> LatencyHistogram
+        self._lock = threading.Lock()
+        self._attached = False
+
+    def attach(self):
+        """Record every transfer completed by multi_completed()."""
+        if not self._attached:
+            add_completion_hook(self.observe)
+            self._attached = True
+
+    def detach(self):
+        if self._attached:
+            remove_completion_hook(self.observe)
+            self._attached = False
+
+    def observe(self, completions):
+        """Record the transfers of a list of Completion records."""
+        for completion in completions:
+            self.record(completion.curl)
+
+    def record(self, curl: ct.POINTER(CURL), host=None, protocol=None):
+        """Record the phases of the (last) transfer of the easy handle.
+
+        host and protocol default to those of its effective URL.
+        """
+        values = _read_metrics(curl)
+        if host is None or protocol is None:
+            url = ct.c_char_p()
+            easy_getinfo(curl, CURLINFO_EFFECTIVE_URL, ct.byref(url))
+            parts = urlsplit(url.value.decode("utf-8") if url.value else "")
+            if host is None: host = parts.hostname or ""
+            if protocol is None: protocol = parts.scheme
+        durations = []
+        for phase, end, starts in self._phase_fields:
+            end = values[end]
+            if end and starts:
+                end -= max(values[start] for start in starts)
+            durations.append((phase, end))
+        histograms = self._histograms
+        with self._lock:
+            for phase, duration in durations:
+                key = (host, protocol, phase)
+                histogram = histograms.get(key)
+                if histogram is None:
+                    histogram = histograms[key] = LatencyHistogram(self.precision)
+                histogram.record(duration)
+
+    def histogram(self, host, protocol, phase):
+        """The histogram of host, protocol and phase (or None)."""
+        return self._histograms.get((host, protocol, phase))
+
+    def histograms(self) -> dict:
+        """{(host, protocol, phase): LatencyHistogram} snapshot."""
+        with self._lock:
+            return {key: LatencyHistogram.from_bytes(histogram.to_bytes())
+                    for key, histogram in self._histograms.items()}
+
+    def merge(self, other: "LatencyRecorder"):
+        """Add the histograms of other to this recorder's."""
+        other = other.histograms()
+        with self._lock:
+            for key, histogram in other.items():
+                mine = self._histograms.get(key)
+                if mine is None:
+                    mine = self._histograms[key] = LatencyHistogram(histogram.precision)
+                mine.merge(histogram)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def to_bytes(self) -> bytes:
+        """Serialized histograms, for from_bytes() (e.g. in another process)."""
+        chunks = []
+        for (host, protocol, phase), histogram in self.histograms().items():
+            for item in (host, protocol, phase):
+                item = item.encode("utf-8")
+                chunks.append(struct.pack("<H", len(item)) + item)
+            data = histogram.to_bytes()
+            chunks.append(struct.pack("<I", len(data)) + data)
+        return b"".join(chunks)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "LatencyRecorder":
+        """The recorder serialized by to_bytes(), with the precision of its
+        histograms."""
+        self = cls()
+        view = memoryview(data)
+        pos = 0
+        while pos < len(view):
+            key = []
+            for _ in range(3):
+                size, = struct.unpack_from("<H", view, pos)
+                pos += 2
+                key.append(bytes(view[pos:pos + size]).decode("utf-8"))
+                pos += size
+            size, = struct.unpack_from("<I", view, pos)
+            pos += 4
+            histogram = LatencyHistogram.from_bytes(view[pos:pos + size])
+            self._histograms[tuple(key)] = histogram
+            self.precision = histogram.precision
+            pos += size
+        return self
+
+    def openmetrics(self, name="libcurl_transfer_phase_seconds") -> str:
+        """The histograms in the OpenMetrics text format (bucket bounds at
+        powers of two microseconds)."""
+        lines = [f"# TYPE {name} histogram",
+                 f"# UNIT {name} seconds",
+                 f"# HELP {name} Duration of libcurl transfer phases."]
+        for (host, protocol, phase), histogram in sorted(self.histograms().items()):
+            labels = (f'host="{_escape(host)}",protocol="{_escape(protocol)}",'
+                      f'phase="{_escape(phase)}"')
+            top = (histogram.max or 0).bit_length()
+            bounds = [(1 << bits) - 1 for bits in range(top + 1)]
+            for bound, count in zip(bounds, histogram.cumulative(bounds)):
+                lines.append(f'{name}_bucket{{{labels},le="{bound / 1e6!r}"}} {count}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+            lines.append(f"{name}_sum{{{labels}}} {histogram.sum / 1e6!r}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", r"\\").replace('"', r'\"').replace("\n", r"\n")
+
+
+def serve_openmetrics(recorder: LatencyRecorder, host="127.0.0.1", port=0,
+                      path="/metrics") -> ThreadingHTTPServer:
+    """Serve recorder.openmetrics() at http://host:port/path from a daemon
+    thread; returns the server (server.server_address, server.shutdown())."""
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split("?")[0] != path:
+                self.send_error(404)
+                return
+            body = recorder.openmetrics().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/openmetrics-text; "
+                                             "version=1.0.0; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="openmetrics",
+                     daemon=True).start()
+    return server
+
+# eof
@@ -0,0 +1,327 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+# Per-transfer metrics.
+#
+# get_metrics() reads the standard set of transfer timings, sizes and
+# connection details of an easy handle in one go. The values are read into
+# preallocated per-thread arrays at addresses computed once, instead of into
+# a new c_long/off_t passed by byref() per value, and returned as a compact
+# Metrics record.
+#
+# MetricsStore keeps the metrics of many transfers column-wise in typed
+# arrays (8 bytes per value instead of an object per transfer) and computes
+# percentiles of the transfer phases, with NumPy if it is installed.
+
+import threading
+import array
+import ctypes as ct
+
+from ._platform import CFUNC
+from ._dll      import dll
+from ._curl import (CURL, CURLcode, CURLINFO, CURLE_OK, off_t,
+                    CURLINFO_QUEUE_TIME_T, CURLINFO_NAMELOOKUP_TIME_T,
+                    CURLINFO_CONNECT_TIME_T, CURLINFO_APPCONNECT_TIME_T,
+                    CURLINFO_PRETRANSFER_TIME_T, CURLINFO_POSTTRANSFER_TIME_T,
+                    CURLINFO_STARTTRANSFER_TIME_T, CURLINFO_TOTAL_TIME_T,
+                    CURLINFO_REDIRECT_TIME_T, CURLINFO_SIZE_UPLOAD_T,
+                    CURLINFO_SIZE_DOWNLOAD_T, CURLINFO_SPEED_UPLOAD_T,
+                    CURLINFO_SPEED_DOWNLOAD_T, CURLINFO_CONN_ID,
+                    CURLINFO_RESPONSE_CODE, CURLINFO_HEADER_SIZE,
+                    CURLINFO_REQUEST_SIZE, CURLINFO_NUM_CONNECTS,
+                    CURLINFO_REDIRECT_COUNT)
+
+__all__ = ('Metrics', 'get_metrics', 'MetricsStore')
+
+_off_t_infos = (
+    ("queue_time",         CURLINFO_QUEUE_TIME_T),
+    ("namelookup_time",    CURLINFO_NAMELOOKUP_TIME_T),
+    ("connect_time",       CURLINFO_CONNECT_TIME_T),
+    ("appconnect_time",    CURLINFO_APPCONNECT_TIME_T),
+    ("pretransfer_time",   CURLINFO_PRETRANSFER_TIME_T),
+    ("posttransfer_time",  CURLINFO_POSTTRANSFER_TIME_T),
+    ("starttransfer_time", CURLINFO_STARTTRANSFER_TIME_T),
+    ("total_time",         CURLINFO_TOTAL_TIME_T),
+    ("redirect_time",      CURLINFO_REDIRECT_TIME_T),
+    ("size_upload",        CURLINFO_SIZE_UPLOAD_T),
+    ("size_download",      CURLINFO_SIZE_DOWNLOAD_T),
+    ("speed_upload",       CURLINFO_SPEED_UPLOAD_T),
+    ("speed_download",     CURLINFO_SPEED_DOWNLOAD_T),
+    ("conn_id",            CURLINFO_CONN_ID),
+)
+_long_infos = (
+    ("response_code",      CURLINFO_RESPONSE_CODE),
+    ("header_size",        CURLINFO_HEADER_SIZE),
+    ("request_size",       CURLINFO_REQUEST_SIZE),
+    ("num_connects",       CURLINFO_NUM_CONNECTS),
+    ("redirect_count",     CURLINFO_REDIRECT_COUNT),
+)
+
+
+class Metrics:
+    """Metrics of a transfer, as returned by get_metrics().
+
+    The *_time fields are in microseconds (CURLINFO_*_TIME_T), the sizes in
+    bytes and the speeds in bytes/second. Values the linked libcurl does not
+    provide (e.g. queue_time and posttransfer_time before 8.6.0 and 8.10.0)
+    are 0; conn_id is -1 if there was no connection.
+    """
+
+    _fields = tuple(name for name, _ in _off_t_infos + _long_infos)
+
+    __slots__ = _fields
+
+    def __init__(self, queue_time=0, namelookup_time=0, connect_time=0,
+                 appconnect_time=0, pretransfer_time=0, posttransfer_time=0,
+                 starttransfer_time=0, total_time=0, redirect_time=0,
+                 size_upload=0, size_download=0, speed_upload=0, speed_download=0,
+                 conn_id=-1, response_code=0, header_size=0, request_size=0,
+                 num_connects=0, redirect_count=0):
+        self.queue_time         = queue_time
+        self.namelookup_time    = namelookup_time
+        self.connect_time       = connect_time
+        self.appconnect_time    = appconnect_time
+        self.pretransfer_time   = pretransfer_time
+        self.posttransfer_time  = posttransfer_time
+        self.starttransfer_time = starttransfer_time
+        self.total_time         = total_time
+        self.redirect_time      = redirect_time
+        self.size_upload        = size_upload
+        self.size_download      = size_download
+        self.speed_upload       = speed_upload
+        self.speed_download     = speed_download
+        self.conn_id            = conn_id
+        self.response_code      = response_code
+        self.header_size        = header_size
+        self.request_size       = request_size
+        self.num_connects       = num_connects
+        self.redirect_count     = redirect_count
+
+    def astuple(self) -> tuple:
+        return tuple(getattr(self, name) for name in self._fields)
+
+    def asdict(self) -> dict:
+        return {name: getattr(self, name) for name in self._fields}
+
+    def __eq__(self, other):
+        if not isinstance(other, Metrics): return NotImplemented
+        return self.astuple() == other.astuple()
+
+    def __repr__(self):
+        return "Metrics(%s)" % ", ".join(f"{name}={getattr(self, name)}"
+                                         for name in self._fields)
+
+
+# curl_easy_getinfo() taking the value address as a plain integer.
+_getinfo = CFUNC(CURLcode,
+    ct.POINTER(CURL),
+    CURLINFO,
+    ct.c_void_p)(
+    ("curl_easy_getinfo", dll))
+
+
+class _Buffers(threading.local):
+    # Per-thread arrays receiving the values and their addresses.
+
+    def __init__(self):
+        self.off_t_values = (off_t * len(_off_t_infos))()
+        self.long_values  = (ct.c_long * len(_long_infos))()
+        address = ct.addressof(self.off_t_values)
+        self.calls = tuple((info, address + i * ct.sizeof(off_t))
+                           for i, (_, info) in enumerate(_off_t_infos))
+        address = ct.addressof(self.long_values)
+        self.calls += tuple((info, address + i * ct.sizeof(ct.c_long))
+                            for i, (_, info) in enumerate(_long_infos))
+        # Where to put the default of a value libcurl failed to provide.
+        defaults = Metrics()
+        self.defaults = {info: (values, i, getattr(defaults, name))
+                         for values, infos in ((self.off_t_values, _off_t_infos),
+                                               (self.long_values,  _long_infos))
+                         for i, (name, info) in enumerate(infos)}
+
+
+_buffers = _Buffers()
+
+
+def get_metrics(curl: ct.POINTER(CURL)) -> Metrics:
+    """Metrics of the (last) transfer of the easy handle."""
+    return Metrics(*_read_metrics(curl))
+
+
+def _read_metrics(curl: ct.POINTER(CURL)) -> list:
+    # The values of the Metrics fields, in order.
+    buffers = _buffers
+    for info, address in buffers.calls:
+        if _getinfo(curl, info, address) != CURLE_OK:
+            values, index, default = buffers.defaults[info]
+            values[index] = default
+    return buffers.off_t_values[:] + buffers.long_values[:]
+
+
+class MetricsStore:
+    """Columnar store of the metrics of completed transfers.
+
+        store = MetricsStore()
+        for done in multi_as_completed(multi):
+            store.record(done.curl, done.result, host)
+        store.summary()       # {phase: {50: usec, 95: usec, 99: usec}}
+        store.summary(by_host=True)
+        store.to_numpy()      # {column: numpy array}
+
+    Every Metrics field is a column, plus "result" (the CURLcode) and "host"
+    (an index into hosts, -1 for none). The phases are durations in
+    microseconds derived from the cumulative CURLINFO_*_TIME_T timings:
+    queue, namelookup, connect, tls (appconnect), wait (from the start of
+    the request to the first response byte), transfer (of the response) and
+    total.
+    """
+
+    # phase -> (end timing, start timings); phase = end - max(starts) >= 0
+    phases = {
+        "queue":      ("queue_time",         ()),
+        "namelookup": ("namelookup_time",    ()),
+        "connect":    ("connect_time",       ("namelookup_time",)),
+        "tls":        ("appconnect_time",    ("connect_time",)),
+        "wait":       ("starttransfer_time", ("pretransfer_time",)),
+        "transfer":   ("total_time",         ("starttransfer_time",)),
+        "total":      ("total_time",         ()),
+    }
+
+    def __init__(self):
+        self.hosts = []  # host id -> host
+        self._host_ids = {}
+        self.columns = {name: array.array("q") for name in Metrics._fields}
+        self.columns["result"] = array.array("i")
+        self.columns["host"]   = array.array("l")
+        self._metric_columns = [self.columns[name] for name in Metrics._fields]
+
+    def __len__(self):
+        return len(self.columns["result"])
+
+    def record(self, curl: ct.POINTER(CURL), result=CURLE_OK, host=None):
+        """Append the metrics of the (last) transfer of the easy handle."""
+        for column, value in zip(self._metric_columns, _read_metrics(curl)):
+            column.append(value)
+        self._append_tail(result, host)
+
+    def append(self, metrics: Metrics, result=CURLE_OK, host=None):
+        """Append a Metrics record."""
+        for column, value in zip(self._metric_columns, metrics.astuple()):
+            column.append(value)
+        self._append_tail(result, host)
+
+    def clear(self):
+        """Remove all the records and the host table."""
+        for column in self.columns.values():
+            del column[:]
+        self.hosts.clear()
+        self._host_ids.clear()
+
+    def host_id(self, host) -> int:
+        """The id of host (-1 for None)."""
+        if host is None: return -1
+        host_id = self._host_ids.get(host)
+        if host_id is None:
+            host_id = self._host_ids[host] = len(self.hosts)
+            self.hosts.append(host)
+        return host_id
+
+    def phase(self, name, host=None) -> list:
+        """Durations (microseconds) of a phase (or values of a column) of the
+        transfers, optionally of one host only."""
+        rows = None if host is None else self._rows(host)
+        column = self._column
+        if name not in self.phases:
+            return list(column(name, rows))
+        end, starts = self.phases[name]
+        end = column(end, rows)
+        if not starts:
+            return list(end)
+        start = [max(values) for values in zip(*(column(start, rows) for start in starts))]
+        return [max(0, e - s) if e else 0 for e, s in zip(end, start)]
+
+    def percentiles(self, name, q=(50, 95, 99), host=None) -> dict:
+        """{percentile: value} of a phase or column (linear interpolation,
+        None if there are no values)."""
+        np = _numpy()
+        if np is not None:
+            values = self._np_phase(np, name, host)
+            if not len(values):
+                return dict.fromkeys(q)
+            return dict(zip(q, (float(v) for v in np.percentile(values, q))))
+        values = sorted(self.phase(name, host))
+        if not values:
+            return dict.fromkeys(q)
+        result = {}
+        last = len(values) - 1
+        for percent in q:
+            pos = last * percent / 100
+            low = int(pos)
+            high = min(low + 1, last)
+            result[percent] = values[low] + (values[high] - values[low]) * (pos - low)
+        return result
+
+    def summary(self, q=(50, 95, 99), by_host=False) -> dict:
+        """{phase: {percentile: microseconds}} of all the phases, or
+        {host: {phase: {percentile: microseconds}}} with by_host true."""
+        if by_host:
+            return {host: {name: self.percentiles(name, q, host) for name in self.phases}
+                    for host in self.hosts}
+        return {name: self.percentiles(name, q) for name in self.phases}
+
+    def to_numpy(self) -> dict:
+        """{column: numpy array} copies of the columns (requires NumPy)."""
+        import numpy as np
+        return {name: np.array(column, dtype=column.typecode)
+                for name, column in self.columns.items()}
+
+    # Internals
+
+    def _append_tail(self, result, host):
+        self.columns["result"].append(result)
+        self.columns["host"].append(self.host_id(host))
+
+    def _rows(self, host):
+        host_id = self._host_ids.get(host, -2)
+        return [row for row, value in enumerate(self.columns["host"]) if value == host_id]
+
+    def _column(self, name, rows):
+        column = self.columns[name]
+        return column if rows is None else [column[row] for row in rows]
+
+    def _np_phase(self, np, name, host):
+        columns = self.columns
+        mask = None
+        if host is not None:
+            mask = np.frombuffer(columns["host"], dtype=columns["host"].typecode)
+            mask = mask == self._host_ids.get(host, -2)
+
+        def column(name):
+            values = np.frombuffer(columns[name], dtype=columns[name].typecode)
+            return values if mask is None else values[mask]
+
+        if name not in self.phases:
+            return column(name)
+        end, starts = self.phases[name]
+        end = column(end)
+        if not starts:
+            return end
+        start = np.maximum.reduce([column(start) for start in starts])
+        return np.where(end != 0, np.maximum(end - start, 0), 0)
+
+
+def _numpy():
+    # NumPy if installed (imported on first use), else None.
+    global _np
+    if _np is False:
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        _np = numpy
+    return _np
+
+
+_np = False
+
+# eof
@@ -52,10 +52,11 @@
 
 import ctypes as ct
 import time as _time
+import selectors as _selectors
 from select import select as _py_select
 
 from ._platform import CFUNC, defined, is_windows
-from ._platform import FD_ISSET as _FD_ISSET, select as _select
+from ._platform import select as _select
 from ._dll      import dll
 from ._curl     import timeval
 from ._curl     import CURL, CURLcode, socket_t, fd_set, CURL_SOCKET_BAD
@@ -654,16 +655,100 @@ def py_select(nfds, readfds, writefds, exceptfds, timeout):
         return -1
     return len(infd) + len(outfd) + len(errfd)
 
+# Name:    py_selector_select()
+#
+# Desc:    A drop-in replacement of select() which waits by the means of the
+#          selectors module (poll(2) where available) instead of select(2).
+#          The cost of a call scales with the number of sockets actually set
+#          in the fd_sets rather than with FD_SETSIZE. Like select(2), on
+#          return the fd_sets are modified in place to indicate which sockets
+#          are ready. Exceptional conditions are not reported (exceptfds is
+#          always returned empty).
+#
+# Returns: The number of ready sockets, 0 if the timeout expired or -1 on
+#          error.
+#
+@CFUNC(ct.c_int, ct.c_int,
+       ct.POINTER(fd_set), ct.POINTER(fd_set), ct.POINTER(fd_set),
+       ct.POINTER(timeval))
+def py_selector_select(nfds, readfds, writefds, exceptfds, timeout):
+
+    if nfds < 0:
+        # SET_SOCKERRNO(SOCKEINVAL) # !!!
+        return -1
+
+    if not timeout:
+        timeout = None
+    else:
+        timeout = timeout.contents
+        timeout = timeout.tv_sec + timeout.tv_usec / 1_000_000
+
+    events = dict.fromkeys(_extract_sockets_from_fd_set(readfds), _selectors.EVENT_READ)
+    for sock in _extract_sockets_from_fd_set(writefds):
+        events[sock] = events.get(sock, 0) | _selectors.EVENT_WRITE
+
+    if not events:
+        _time.sleep(timeout or 0)
+        _store_sockets_to_fd_set(readfds,   ())
+        _store_sockets_to_fd_set(writefds,  ())
+        _store_sockets_to_fd_set(exceptfds, ())
+        return 0
+
+    try:
+        with _Selector() as selector:
+            for sock, mask in events.items():
+                selector.register(sock, mask)
+            ready = selector.select(timeout)
+    except (OSError, ValueError):
+        return -1
+
+    infd  = [key.fd for key, mask in ready if mask & _selectors.EVENT_READ]
+    outfd = [key.fd for key, mask in ready if mask & _selectors.EVENT_WRITE]
+    _store_sockets_to_fd_set(readfds,   infd)
+    _store_sockets_to_fd_set(writefds,  outfd)
+    _store_sockets_to_fd_set(exceptfds, ())
+    return len(infd) + len(outfd)
+
+# For a one-shot wait poll(2) is cheaper than epoll/kqueue (no extra syscalls
+# to create and populate the kernel object).
+_Selector = getattr(_selectors, "PollSelector", _selectors.DefaultSelector)
+
 if is_windows:
     def _extract_sockets_from_fd_set(fdsetp):
         if not fdsetp: return []
         fdset = fdsetp.contents
-        return [fdset.fd_array[i] for i in range(fdset.fd_count)]
+        return fdset.fd_array[:fdset.fd_count]
+
+    def _store_sockets_to_fd_set(fdsetp, sockets):
+        if not fdsetp: return
+        fdset = fdsetp.contents
+        fdset.fd_count = len(sockets)
+        fdset.fd_array[:len(sockets)] = sockets
 else:
+    _fd_mask = dict(fd_set._fields_)["fds_bits"]._type_
+    _NFDBITS = 8 * ct.sizeof(_fd_mask)
+    _NFDMASK = (1 << _NFDBITS) - 1
+
     def _extract_sockets_from_fd_set(fdsetp):
         if not fdsetp: return []
-        fdset = fdsetp.contents
-        max_fd = ct.sizeof(fdset.fds_bits) * 8
-        return [fd for fd in range(max_fd) if _FD_ISSET(fd, fdsetp)]
+        # Read all the fds_bits words at once and walk only the set bits.
+        sockets = []
+        for base, word in enumerate(fdsetp.contents.fds_bits[:]):
+            if not word: continue
+            word &= _NFDMASK
+            base *= _NFDBITS
+            while word:
+                lowest = word & -word
+                sockets.append(base + lowest.bit_length() - 1)
+                word ^= lowest
+        return sockets
+
+    def _store_sockets_to_fd_set(fdsetp, sockets):
+        if not fdsetp: return
+        fds_bits = fdsetp.contents.fds_bits
+        words = [0] * len(fds_bits)
+        for sock in sockets:
+            words[sock // _NFDBITS] |= 1 << (sock % _NFDBITS)
+        fds_bits[:] = words
 
 # eof
@@ -0,0 +1,113 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+# Native (C runtime) stdio transfer callbacks.
+#
+# libcurl's own defaults for CURLOPT_WRITEFUNCTION and CURLOPT_READFUNCTION
+# are fwrite() and fread(). Installing them explicitly, together with a FILE*
+# obtained from the very same C runtime, lets bulk transfers to and from disk
+# run entirely in C without re-entering the interpreter (and taking the GIL)
+# for every chunk. Using the C runtime's fwrite()/fread() rather than relying
+# on libcurl's defaults keeps the FILE* and the functions using it in one C
+# runtime, which matters on Windows where libcurl may be linked to another.
+
+import os
+import ctypes as ct
+
+from ._platform import is_windows
+from ._curl     import (write_callback, read_callback, CURLE_OK,
+                        CURLOPT_WRITEFUNCTION, CURLOPT_WRITEDATA,
+                        CURLOPT_READFUNCTION, CURLOPT_READDATA)
+from ._easy     import easy_setopt
+
+__all__ = ('FILE', 'fopen', 'fdopen', 'fclose', 'fflush',
+           'write_to_native_file', 'read_from_native_file', 'NativeFile')
+
+if is_windows:  # pragma: no cover
+    _libc = ct.CDLL("msvcrt", use_errno=True)
+    _fdopen = _libc._fdopen
+else:
+    _libc = ct.CDLL(None, use_errno=True)
+    _fdopen = _libc.fdopen
+
+class FILE(ct.Structure): pass
+
+
+fopen = _libc.fopen
+fopen.restype  = ct.POINTER(FILE)
+fopen.argtypes = [ct.c_char_p, ct.c_char_p]
+
+fdopen = _fdopen
+fdopen.restype  = ct.POINTER(FILE)
+fdopen.argtypes = [ct.c_int, ct.c_char_p]
+
+fclose = _libc.fclose
+fclose.restype  = ct.c_int
+fclose.argtypes = [ct.POINTER(FILE)]
+
+fflush = _libc.fflush
+fflush.restype  = ct.c_int
+fflush.argtypes = [ct.POINTER(FILE)]
+
+# fwrite()/fread() have exactly the write/read callbacks' signatures.
+write_to_native_file = ct.cast(_libc.fwrite, write_callback)
+read_from_native_file = ct.cast(_libc.fread, read_callback)
+
+del _fdopen
+
+
+class NativeFile:
+    """A C runtime FILE* used as a GIL-free transfer sink or source.
+
+    file is a path or an open file descriptor (which is duplicated, so the
+    caller keeps ownership of it). setopt() installs the native fwrite()
+    (or fread() for a file opened for reading only) as the transfer
+    callback with this FILE* as its data:
+
+        with NativeFile("download.bin", "wb") as nfile:
+            nfile.setopt(curl)
+            res = libcurl.easy_perform(curl)
+    """
+
+    def __init__(self, file, mode="wb"):
+        self.mode = mode
+        bmode = mode.encode("ascii")
+        if isinstance(file, int):
+            fd = os.dup(file)
+            self.fp = fdopen(fd, bmode)
+            if not self.fp: os.close(fd)
+        else:
+            self.fp = fopen(os.fsencode(file), bmode)
+        if not self.fp:
+            errno = ct.get_errno()
+            raise OSError(errno, os.strerror(errno), file)
+
+    @property
+    def readable(self):
+        return self.mode.startswith("r") and "+" not in self.mode
+
+    def setopt(self, curl) -> int:
+        if self.readable:
+            res = easy_setopt(curl, CURLOPT_READFUNCTION, read_from_native_file)
+            if res != CURLE_OK: return res
+            return easy_setopt(curl, CURLOPT_READDATA, self.fp)
+        else:
+            res = easy_setopt(curl, CURLOPT_WRITEFUNCTION, write_to_native_file)
+            if res != CURLE_OK: return res
+            return easy_setopt(curl, CURLOPT_WRITEDATA, self.fp)
+
+    def flush(self):
+        if self.fp: fflush(self.fp)
+
+    def close(self):
+        if self.fp:
+            fclose(self.fp)
+            self.fp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, exc_tb):
+        self.close()
+
+# eof
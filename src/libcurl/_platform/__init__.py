@@ -32,13 +32,15 @@ elif is_linux:  # pragma: no cover
                            SOCKET, INVALID_SOCKET, sockaddr,
                            in_addr, sockaddr_in,
                            in6_addr, sockaddr_in6,
-                           FD_SETSIZE, fd_set, FD_ZERO, FD_ISSET, FD_SET, FD_CLR)
+                           FD_SETSIZE, fd_set, FD_ZERO, FD_ISSET, FD_SET, FD_CLR,
+                           select)
 elif is_macos:  # pragma: no cover
     from ._macos   import (DLL_PATH, DLL, dlclose, CFUNC,
                            time_t, timeval,
                            SOCKET, INVALID_SOCKET, sockaddr,
                            in_addr, sockaddr_in,
                            in6_addr, sockaddr_in6,
-                           FD_SETSIZE, fd_set, FD_ZERO, FD_ISSET, FD_SET, FD_CLR)
+                           FD_SETSIZE, fd_set, FD_ZERO, FD_ISSET, FD_SET, FD_CLR,
+                           select)
 else:  # pragma: no cover
     raise ImportError("unsupported platform")
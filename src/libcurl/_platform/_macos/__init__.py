@@ -147,7 +147,7 @@ def FD_ZERO(fdsetp):
 @CFUNC(ct.c_int, ct.c_int, ct.POINTER(fd_set))
 def FD_ISSET(fd, fdsetp):
     fdset = fdsetp.contents
-    return int(fdset.fds_bits[fd // NFDBITS] & (1 << (fd % NFDBITS)))
+    return bool(fdset.fds_bits[fd // NFDBITS] & (1 << (fd % NFDBITS)))
 
 @CFUNC(None, ct.c_int, ct.POINTER(fd_set))
 def FD_SET(fd, fdsetp):
@@ -158,3 +158,9 @@ def FD_SET(fd, fdsetp):
 def FD_CLR(fd, fdsetp):
     fdset = fdsetp.contents
     fdset.fds_bits[fd // NFDBITS] &= ~(1 << (fd % NFDBITS))
+
+select = ct.CDLL(None, use_errno=True).select
+select.restype  = ct.c_int
+select.argtypes = [ct.c_int,
+                   ct.POINTER(fd_set), ct.POINTER(fd_set), ct.POINTER(fd_set),
+                   ct.POINTER(timeval)]
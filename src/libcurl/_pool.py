@@ -0,0 +1,152 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+# Easy handle pool.
+#
+# Handles are recycled with curl_easy_reset() instead of being cleaned up
+# and created anew, so a handle keeps its live connections, Session ID
+# cache, DNS cache and cookies as well as its allocated buffers.
+
+import time
+import threading
+import collections
+import contextlib
+import ctypes as ct
+
+from ._curl import CURL, CURLE_OK, easy_strerror
+from ._easy import easy_init, easy_cleanup, easy_reset
+from ._dispatch import callback_release
+
+__all__ = ('EasyPool',)
+
+
+class EasyPool:
+    """A thread-safe pool of recycled easy handles.
+
+    At most maxsize handles (None for no limit) exist at a time; acquire()
+    waits for a released one when all of them are in use. Idle handles are
+    handed out most recently used first and cleaned up once they have been
+    idle for more than idle_timeout seconds (None for never). If a template
+    (OptionTemplate) is given, it is applied to every handle handed out.
+
+        pool = EasyPool(maxsize=10)
+        with pool.handle() as curl:
+            easy_setopt(curl, CURLOPT_URL, url)
+            res = easy_perform(curl)
+    """
+
+    def __init__(self, maxsize=None, idle_timeout=60.0, template=None):
+        self.maxsize      = maxsize
+        self.idle_timeout = idle_timeout
+        self.template     = template
+        self._idle  = collections.deque()  # [(release time, handle), ...]
+        self._size  = 0                    # number of live handles
+        self._cond  = threading.Condition(threading.Lock())
+        self._closed = False
+
+    def __len__(self):
+        """Number of idle handles in the pool."""
+        return len(self._idle)
+
+    @property
+    def size(self):
+        """Number of live handles (idle and in use)."""
+        return self._size
+
+    def acquire(self, timeout=None) -> ct.POINTER(CURL):
+        """Get an idle handle or a new one if the pool is not full.
+
+        Raises TimeoutError if no handle became available within timeout.
+        """
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("EasyPool is closed")
+            self._evict(time.monotonic())
+            if not self._idle and self.maxsize is not None and self._size >= self.maxsize:
+                if not self._cond.wait_for(lambda: self._idle or self._size < self.maxsize
+                                           or self._closed, timeout):
+                    raise TimeoutError("No easy handle available in the pool")
+                if self._closed:
+                    raise RuntimeError("EasyPool is closed")
+            if self._idle:
+                _, curl = self._idle.pop()
+            else:
+                curl = None
+                self._size += 1
+        if curl is None:
+            curl = easy_init()
+            if not curl:
+                self._discarded()
+                raise RuntimeError("libcurl.easy_init() failed")
+        if self.template is not None:
+            res = self.template.apply(curl)
+            if res != CURLE_OK:
+                self.discard(curl)
+                raise RuntimeError("libcurl.easy_setopt() failed (code %d): %s" %
+                                   (res, easy_strerror(res).decode("utf-8")))
+        return curl
+
+    def release(self, curl: ct.POINTER(CURL)):
+        """Reset the handle and return it to the pool."""
+        callback_release(curl)
+        easy_reset(curl)
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+            else:
+                now = time.monotonic()
+                self._idle.append((now, curl))
+                self._evict(now)
+                self._cond.notify()
+                return
+        easy_cleanup(curl)
+
+    def discard(self, curl: ct.POINTER(CURL)):
+        """Clean up a handle acquired from the pool instead of returning it."""
+        callback_release(curl)
+        easy_cleanup(curl)
+        self._discarded()
+
+    @contextlib.contextmanager
+    def handle(self, timeout=None):
+        """Context manager acquiring a handle and releasing it on exit."""
+        curl = self.acquire(timeout)
+        try:
+            yield curl
+        finally:
+            self.release(curl)
+
+    def close(self):
+        """Clean up the idle handles; handles in use are cleaned up on release."""
+        with self._cond:
+            self._closed = True
+            idle = [curl for _, curl in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for curl in idle:
+            easy_cleanup(curl)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, exc_tb):
+        self.close()
+
+    # Internals
+
+    def _evict(self, now):
+        # Called with the lock held; the oldest idle handles are on the left.
+        if self.idle_timeout is None: return
+        idle = self._idle
+        while idle and now - idle[0][0] > self.idle_timeout:
+            _, curl = idle.popleft()
+            self._size -= 1
+            easy_cleanup(curl)
+
+    def _discarded(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+# eof
@@ -0,0 +1,430 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+# Adaptive transfer scheduler for a multi handle.
+#
+# Instead of a hand-tuned number of parallel transfers, Scheduler admits the
+# queued easy handles into its multi handle up to a limit which is adjusted
+# by an AIMDController from the measured latency and throughput: the limit
+# is raised by one per round while the latency stays close to the lowest one
+# seen and more transfers still bring more throughput, and it is halved when
+# the latency grows or transfers fail with signs of overload (timeouts,
+# refused connections, HTTP 429/503). The per-host and total connection caps
+# are left to libcurl (CURLMOPT_MAX_HOST_CONNECTIONS and
+# CURLMOPT_MAX_TOTAL_CONNECTIONS).
+#
+# Queued transfers are admitted in the order of their priorities. Bulk
+# transfers (priorities from bulk_priority on) are paused with easy_pause()
+# to make room for waiting latency-sensitive ones and are resumed when no
+# such transfer is left. Within a priority, the hosts of the transfers take
+# turns (weighted round-robin) and each host is admitted a limited number of
+# transfers in flight, so that a host with a long queue cannot starve the
+# others.
+
+import time
+import collections
+import ctypes as ct
+
+from ._curl  import (CURL, CURLE_OK, CURLE_COULDNT_CONNECT, CURLE_OPERATION_TIMEDOUT,
+                     CURLE_SEND_ERROR, CURLE_RECV_ERROR, CURLE_GOT_NOTHING,
+                     CURLINFO_RESPONSE_CODE, CURLINFO_TOTAL_TIME_T,
+                     CURLINFO_SIZE_DOWNLOAD_T, CURLPAUSE_ALL, CURLPAUSE_CONT,
+                     CURLOPT_URL, off_t, easy_pause, easy_strerror, free)
+from ._easy  import easy_setopt, easy_getinfo
+from ._multi import (CURLM, CURLMOPT_MAX_HOST_CONNECTIONS, CURLMOPT_MAX_TOTAL_CONNECTIONS,
+                     multi_init, multi_cleanup, multi_setopt,
+                     multi_add_handle, multi_perform, multi_poll)
+from ._urlapi import (CURLUE_OK, CURLUPART_URL, CURLUPART_HOST, CURLU_NON_SUPPORT_SCHEME,
+                      url as url_init, url_set, url_get, url_cleanup)
+from ._completion import multi_completed
+from ._session    import _check_multi
+
+__all__ = ('AIMDController', 'Scheduler')
+
+# Transfer results taken as a sign of an overloaded link or upstream.
+_overload_results = frozenset((CURLE_COULDNT_CONNECT, CURLE_OPERATION_TIMEDOUT,
+                               CURLE_SEND_ERROR, CURLE_RECV_ERROR, CURLE_GOT_NOTHING))
+_overload_statuses = frozenset((429, 503))
+
+
+class AIMDController:
+    """Additive increase/multiplicative decrease concurrency limit.
+
+    Completed transfers are accounted in rounds of limit transfers (after a
+    decrease: of the previous limit, as many are still in flight). At the
+    end of a round the limit is decreased by the decrease factor if any
+    transfer of the round was overloaded or the mean latency of the round
+    exceeded tolerance times the lowest round latency seen; otherwise it is
+    increased by increase if the round's throughput (bytes or transfers per
+    second) was higher than the previous round's. The lowest latency drifts
+    up by drift per round, so that the controller recovers after a lucky
+    measurement.
+    """
+
+    def __init__(self, initial=10, minimum=1, maximum=256, increase=1,
+                 decrease=0.5, tolerance=2.0, drift=0.01):
+        if not 1 <= minimum <= maximum:
+            raise ValueError("limits must satisfy 1 <= minimum <= maximum")
+        if not 0.0 < decrease < 1.0:
+            raise ValueError("decrease must be between 0 and 1")
+        self.minimum   = minimum
+        self.maximum   = maximum
+        self.increase  = increase
+        self.decrease  = decrease
+        self.tolerance = tolerance
+        self.drift     = drift
+        self._limit    = float(min(max(initial, minimum), maximum))
+        self._round    = self.limit  # number of transfers of the current round
+        self.base_latency = None  # lowest round latency (seconds)
+        self.throughput   = 0.0   # bytes/second of the last round
+        self.rate         = 0.0   # transfers/second of the last round
+        self._start_round(time.perf_counter())
+
+    @property
+    def limit(self) -> int:
+        """Current number of transfers allowed in flight."""
+        return int(self._limit)
+
+    def update(self, latency: float, nbytes: int, overloaded: bool = False) -> int:
+        """Account a completed transfer; returns the (new) limit."""
+        self._count   += 1
+        self._latency += latency
+        self._bytes   += nbytes
+        self._overloaded = self._overloaded or overloaded
+        if self._count >= self._round:
+            self._end_round()
+        return self.limit
+
+    def _start_round(self, now):
+        self._started = now
+        self._count   = 0
+        self._latency = 0.0
+        self._bytes   = 0
+        self._overloaded = False
+
+    def _end_round(self):
+        now = time.perf_counter()
+        latency = self._latency / self._count
+        elapsed = now - self._started
+        if elapsed <= 0: elapsed = 1e-9
+        throughput = self._bytes / elapsed
+        rate = self._count / elapsed
+        base = self.base_latency
+        base = latency if base is None else min(latency, base * (1.0 + self.drift))
+        self.base_latency = base
+        # The transfers completing right after a decrease were started under
+        # the previous limit, so the next round spans as many of them.
+        self._round = self.limit
+        if self._overloaded or latency > base * self.tolerance:
+            self._limit = max(self.minimum, self._limit * self.decrease)
+        elif throughput > self.throughput or rate > self.rate:
+            self._limit = min(self.maximum, self._limit + self.increase)
+        self.throughput = throughput
+        self.rate = rate
+        self._round = max(self._round, self.limit)
+        self._start_round(now)
+
+
+class _Level:
+    # Queued transfers of one priority: a FIFO of easy handles per host, the
+    # hosts under their budget in round-robin order and those at it aside.
+
+    __slots__ = ('ready', 'blocked', 'credit')
+
+    def __init__(self):
+        self.ready   = collections.OrderedDict()  # host -> deque of easy handles
+        self.blocked = {}  # host -> deque of easy handles
+        self.credit  = 0   # admissions of the first ready host in its turn
+
+
+class Scheduler:
+    """Run queued easy handles on a multi handle with an adaptive limit of
+    transfers in flight.
+
+        with Scheduler(max_host_connections=6, bulk_priority=10) as scheduler:
+            for url in downloads:
+                scheduler.add(easy_init(), priority=10, url=url)
+            scheduler.add(make_handle(api_url))  # priority 0
+            for done in scheduler.perform():
+                ...  # done is a Completion; done.curl may be reused or cleaned up
+
+    Transfers with lower priority values are admitted first. Within a
+    priority the hosts take turns, each admitting weights[host] (default 1)
+    transfers per turn in the order they were added, so that a host with
+    many queued transfers does not hold up the others. The host of a
+    transfer is taken from the url passed to add() (which is also set as
+    CURLOPT_URL) or given explicitly; transfers without a host share one
+    queue which is not subject to host_limit. A host with host_limit
+    (default: max_host_connections) transfers in flight is skipped until one
+    of them completes.
+
+    If bulk_priority is given, running transfers with a priority of at least
+    bulk_priority are paused (the least important first) while transfers of
+    a lower priority are waiting for admission, and are resumed once no
+    such transfer is queued or running. Paused transfers do not count
+    against the limit and their latencies are not fed to the controller.
+
+    controller defaults to an AIMDController capped at max_total_connections
+    (if given). If no multi handle is given, the scheduler creates one and
+    cleans it up on close().
+    """
+
+    def __init__(self, multi: ct.POINTER(CURLM) = None, controller=None,
+                 max_host_connections=None, max_total_connections=None,
+                 bulk_priority=None, host_limit=None, weights=None):
+        self._own_multi = not multi
+        if self._own_multi:
+            multi = multi_init()
+            if not multi:
+                raise RuntimeError("libcurl.multi_init() failed")
+        self._multi = multi
+        if max_host_connections is not None:
+            _check_multi(multi_setopt(multi, CURLMOPT_MAX_HOST_CONNECTIONS,
+                                      max_host_connections), "multi_setopt")
+        if max_total_connections is not None:
+            _check_multi(multi_setopt(multi, CURLMOPT_MAX_TOTAL_CONNECTIONS,
+                                      max_total_connections), "multi_setopt")
+        if controller is None:
+            controller = AIMDController(maximum=max_total_connections or 256)
+        self.controller = controller
+        self.bulk_priority = bulk_priority
+        self.host_limit = max_host_connections if host_limit is None else host_limit
+        self.weights = {} if weights is None else weights
+        self._levels  = {}  # priority -> _Level
+        self._npending = 0
+        self._running = {}  # easy handle address -> (priority, host)
+        self._host_running = collections.Counter()  # host -> transfers in flight
+        self._paused  = {}  # easy handle address -> easy handle
+        self._delayed = set()  # addresses of the handles paused at any time
+        self._urgent  = 0  # number of running transfers below bulk_priority
+        self._urlp    = None  # CURLU handle for parsing the hosts
+
+    @property
+    def multi(self):
+        """The underlying CURLM handle."""
+        return self._multi
+
+    @property
+    def limit(self) -> int:
+        return self.controller.limit
+
+    @property
+    def pending(self) -> int:
+        """Number of queued transfers not yet admitted."""
+        return self._npending
+
+    @property
+    def running(self) -> int:
+        """Number of admitted transfers not yet completed."""
+        return len(self._running)
+
+    @property
+    def paused(self) -> int:
+        """Number of admitted transfers currently paused."""
+        return len(self._paused)
+
+    def host_running(self, host) -> int:
+        """Number of admitted transfers of host not yet completed."""
+        return self._host_running[host]
+
+    def __len__(self):
+        return self._npending + len(self._running)
+
+    def add(self, curl: ct.POINTER(CURL), priority=0, url=None, host=None):
+        """Queue an easy handle for transfer.
+
+        If url is given, it is set as the handle's CURLOPT_URL and, unless
+        host is given, the transfer's host is taken from it.
+        """
+        if url is not None:
+            if isinstance(url, str): url = url.encode("utf-8")
+            res = easy_setopt(curl, CURLOPT_URL, url)
+            if res != CURLE_OK:
+                raise RuntimeError("libcurl.easy_setopt() failed (code %d): %s" %
+                                   (res, easy_strerror(res).decode("utf-8")))
+            if host is None:
+                host = self._host_of(url)
+        level = self._levels.get(priority)
+        if level is None:
+            level = self._levels[priority] = _Level()
+        queues = level.blocked if self._at_budget(host) else level.ready
+        queue = queues.get(host)
+        if queue is None:
+            queue = queues[host] = collections.deque()
+        queue.append(curl)
+        self._npending += 1
+
+    def perform(self, timeout_ms=1000):
+        """Drive the queued transfers, yielding a Completion for each one as
+        it finishes, until none is left.
+
+        Handles added while iterating are driven as well. timeout_ms is the
+        longest single multi_poll() wait.
+        """
+        multi = self._multi
+        running = ct.c_int(0)
+        while self._npending or self._running:
+            self._admit()
+            _check_multi(multi_perform(multi, ct.byref(running)), "multi_perform")
+            done = multi_completed(multi, private=False)
+            for completion in done:
+                self._complete(completion)
+            yield from done
+            if not done and self._running:
+                _check_multi(multi_poll(multi, None, 0, timeout_ms, None), "multi_poll")
+
+    def close(self):
+        if self._urlp is not None:
+            url_cleanup(self._urlp)
+            self._urlp = None
+        if self._own_multi and self._multi:
+            multi_cleanup(self._multi)
+        self._multi = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, exc_tb):
+        self.close()
+
+    # Internals
+
+    def _host_of(self, url: bytes):
+        if self._urlp is None:
+            self._urlp = url_init()
+            if not self._urlp:
+                raise RuntimeError("libcurl.url() failed")
+        url_set(self._urlp, CURLUPART_URL, None, 0)  # else url is relative to the last one
+        if url_set(self._urlp, CURLUPART_URL, url, CURLU_NON_SUPPORT_SCHEME) != CURLUE_OK:
+            return None
+        host = ct.c_char_p()
+        if url_get(self._urlp, CURLUPART_HOST, ct.byref(host), 0) != CURLUE_OK:
+            return None
+        try:
+            return host.value.decode("utf-8").lower()
+        finally:
+            free(host)
+
+    def _at_budget(self, host) -> bool:
+        return (host is not None and self.host_limit is not None
+                and self._host_running[host] >= self.host_limit)
+
+    def _top_priority(self):
+        # The most important priority with an admissible transfer (or None).
+        return min((priority for priority, level in self._levels.items() if level.ready),
+                   default=None)
+
+    def _pop(self, priority):
+        # Dequeues the next transfer of the priority in host round-robin order.
+        level = self._levels[priority]
+        ready = level.ready
+        host, queue = next(iter(ready.items()))
+        curl = queue.popleft()
+        self._npending -= 1
+        level.credit += 1
+        if not queue:
+            del ready[host]
+            level.credit = 0
+        elif level.credit >= self.weights.get(host, 1):
+            ready.move_to_end(host)
+            level.credit = 0
+        if not ready and not level.blocked:
+            del self._levels[priority]
+        return host, curl
+
+    def _admit(self):
+        limit = self.controller.limit
+        bulk = self.bulk_priority
+        while len(self._running) - len(self._paused) < limit:
+            priority = self._top_priority()
+            if priority is None: break
+            if self._paused and priority >= bulk:
+                break  # the paused bulk transfers are resumed first
+            self._start(priority, *self._pop(priority))
+        if bulk is None: return
+        unpausable = set()
+        while True:
+            priority = self._top_priority()
+            if priority is None or priority >= bulk or not self._pause_bulk(unpausable):
+                break
+            self._start(priority, *self._pop(priority))
+        if self._paused and not self._urgent:
+            priority = self._top_priority()
+            if priority is None or priority >= bulk:
+                for curl in self._paused.values():
+                    self._resume(curl)
+                self._paused.clear()
+
+    def _start(self, priority, host, curl):
+        _check_multi(multi_add_handle(self._multi, curl), "multi_add_handle")
+        self._running[ct.cast(curl, ct.c_void_p).value] = (priority, host)
+        if self.bulk_priority is not None and priority < self.bulk_priority:
+            self._urgent += 1
+        if host is not None:
+            self._host_running[host] += 1
+            if self._at_budget(host):
+                for level in self._levels.values():
+                    if host not in level.ready: continue
+                    if next(iter(level.ready)) == host:
+                        level.credit = 0
+                    level.blocked[host] = level.ready.pop(host)
+
+    def _pause_bulk(self, unpausable) -> bool:
+        # Pauses the least important running bulk transfer (if any). A transfer
+        # which fails to pause (e.g. one without a connection yet) is added to
+        # unpausable and keeps running (and counting against the limit).
+        paused = self._paused
+        candidates = sorted(((priority, address)
+                             for address, (priority, _) in self._running.items()
+                             if priority >= self.bulk_priority
+                             and address not in paused and address not in unpausable),
+                            reverse=True)
+        for _, address in candidates:
+            curl = ct.c_void_p(address)
+            if easy_pause(curl, CURLPAUSE_ALL) != CURLE_OK:
+                unpausable.add(address)
+                continue
+            paused[address] = curl
+            self._delayed.add(address)
+            return True
+        return False
+
+    @staticmethod
+    def _resume(curl):
+        res = easy_pause(curl, CURLPAUSE_CONT)
+        if res != CURLE_OK:
+            raise RuntimeError("libcurl.easy_pause() failed (code %d): %s" %
+                               (res, easy_strerror(res).decode("utf-8")))
+
+    def _complete(self, completion):
+        curl = completion.curl
+        address = ct.cast(curl, ct.c_void_p).value
+        priority, host = self._running.pop(address)
+        if self.bulk_priority is not None and priority < self.bulk_priority:
+            self._urgent -= 1
+        if host is not None:
+            at_budget = self._at_budget(host)
+            self._host_running[host] -= 1
+            if not self._host_running[host]:
+                del self._host_running[host]
+            if at_budget and not self._at_budget(host):
+                for level in self._levels.values():
+                    queue = level.blocked.pop(host, None)
+                    if queue is not None:
+                        level.ready[host] = queue
+        self._paused.pop(address, None)
+        if address in self._delayed:
+            self._delayed.discard(address)
+            return
+        total_time = off_t(0)
+        easy_getinfo(curl, CURLINFO_TOTAL_TIME_T, ct.byref(total_time))
+        nbytes = off_t(0)
+        easy_getinfo(curl, CURLINFO_SIZE_DOWNLOAD_T, ct.byref(nbytes))
+        overloaded = completion.result in _overload_results
+        if completion.result == CURLE_OK:
+            status = ct.c_long(0)
+            easy_getinfo(curl, CURLINFO_RESPONSE_CODE, ct.byref(status))
+            overloaded = status.value in _overload_statuses
+        self.controller.update(total_time.value / 1_000_000, nbytes.value, overloaded)
+
+# eof
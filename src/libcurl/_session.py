@@ -0,0 +1,307 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+# High-level session.
+#
+# A Session bundles what a program needs for connection reuse across
+# requests: a share handle (cookies, DNS cache, TLS sessions and the
+# connection cache), a pool of recycled easy handles configured with the
+# share handle and the session's default options, and get()/post()/stream()
+# calls built on them.
+
+import collections
+import ctypes as ct
+
+from ._curl      import (CURL, CURLE_OK, CURLSHE_OK, CURLSHOPT_SHARE,
+                         CURL_LOCK_DATA_COOKIE, CURL_LOCK_DATA_DNS,
+                         CURL_LOCK_DATA_SSL_SESSION, CURL_LOCK_DATA_CONNECT,
+                         CURLOPT_SHARE, CURLOPT_COOKIEFILE, CURLOPT_URL,
+                         CURLOPT_HTTPGET, CURLOPT_NOBODY,
+                         CURLOPT_POSTFIELDS, CURLOPT_POSTFIELDSIZE_LARGE,
+                         CURLOPT_CUSTOMREQUEST, CURLOPT_HTTPHEADER,
+                         CURLOPT_WRITEFUNCTION, CURLOPT_HEADERFUNCTION,
+                         CURLINFO_RESPONSE_CODE, CURLINFO_EFFECTIVE_URL,
+                         share_init, share_setopt, share_cleanup, share_strerror,
+                         easy_strerror)
+from ._easy      import easy_setopt, easy_perform, easy_getinfo
+from ._multi     import (CURLM_OK, multi_init, multi_cleanup,
+                         multi_add_handle, multi_remove_handle, multi_perform,
+                         multi_poll, multi_strerror)
+from ._template  import OptionTemplate
+from ._pool      import EasyPool
+from ._dispatch  import callback_setopt
+from ._sharelock import ShareLock
+from ._completion import multi_completed
+
+__all__ = ('Session', 'Response')
+
+
+class Response:
+    """Result of a Session request.
+
+    code is the transfer's CURLcode, status the HTTP response code, url the
+    effective URL, headers the (name, value) pairs of the final response and
+    content its body.
+    """
+
+    def __init__(self):
+        self.code    = CURLE_OK
+        self.status  = 0
+        self.url     = None
+        self.content = b""
+        self._header_lines = []  # raw header lines as received
+        self._headers = None
+
+    @property
+    def headers(self):
+        if self._headers is None:
+            headers = []
+            for line in self._header_lines:
+                line = line.decode("iso-8859-1").rstrip("\r\n")
+                if line.startswith("HTTP/"):
+                    headers.clear()  # a new response (e.g. after a redirect)
+                elif ":" in line:
+                    name, _, value = line.partition(":")
+                    headers.append((name.strip(), value.strip()))
+            self._headers = headers
+        return self._headers
+
+    @property
+    def ok(self):
+        return self.code == CURLE_OK
+
+    @property
+    def error(self):
+        """The libcurl error message of a failed transfer or None."""
+        return None if self.code == CURLE_OK else easy_strerror(self.code).decode("utf-8")
+
+    def header(self, name, default=None):
+        """Value of the first header with the given name (case-insensitive)."""
+        name = name.lower()
+        for hname, value in self.headers:
+            if hname.lower() == name: return value
+        return default
+
+    def __repr__(self):
+        return f"<Response [{self.status}] code={self.code}>"
+
+
+class Session:
+    """Connection-reusing HTTP session.
+
+    options are default easy handle options (see OptionTemplate) of every
+    request; further options can be passed to each call as keywords named
+    like the CURLOPT_* options without the prefix:
+
+        with Session({"FOLLOWLOCATION": 1}) as session:
+            resp = session.get(url, timeout=10)
+            resp = session.post(url, b"data", headers=["Content-Type: text/plain"])
+            for chunk in session.stream(url):
+                ...
+
+    With lock true (the default) a ShareLock is installed on the share
+    handle and the session can be used from several threads at once.
+    """
+
+    share_data = (CURL_LOCK_DATA_COOKIE, CURL_LOCK_DATA_DNS,
+                  CURL_LOCK_DATA_SSL_SESSION, CURL_LOCK_DATA_CONNECT)
+
+    def __init__(self, options=None, maxsize=None, idle_timeout=60.0, lock=True):
+        self._share = share_init()
+        if not self._share:
+            raise RuntimeError("libcurl.share_init() failed")
+        self._lock = None
+        if lock:
+            self._lock = ShareLock()
+            self._check_share(self._lock.install(self._share))
+        for data in self.share_data:
+            self._check_share(share_setopt(self._share, CURLSHOPT_SHARE, data))
+        defaults = {CURLOPT_COOKIEFILE: b""}  # enable the cookie engine
+        defaults.update(options or {})
+        defaults[CURLOPT_SHARE] = self._share
+        self._template = OptionTemplate(defaults)
+        self._pool = EasyPool(maxsize=maxsize, idle_timeout=idle_timeout,
+                              template=self._template)
+
+    @property
+    def share(self):
+        """The underlying CURLSH handle."""
+        return self._share
+
+    @property
+    def lock(self):
+        """The session's ShareLock (or None)."""
+        return self._lock
+
+    @property
+    def pool(self):
+        """The session's EasyPool."""
+        return self._pool
+
+    def request(self, method, url, data=None, headers=None, **options) -> Response:
+        """Perform a request; a failed transfer is reported by Response.code."""
+        response = Response()
+        body = []
+        curl = self._pool.acquire()
+        try:
+            tmpl = _prepare_request(curl, method, url, data, headers, options,
+                                    response, body)
+            try:
+                _finish_request(curl, response, easy_perform(curl))
+            finally:
+                if tmpl is not None: tmpl.close()
+        finally:
+            self._pool.release(curl)
+        response.content = b"".join(body)
+        return response
+
+    def get(self, url, **options) -> Response:
+        return self.request("GET", url, **options)
+
+    def head(self, url, **options) -> Response:
+        return self.request("HEAD", url, **options)
+
+    def post(self, url, data=b"", **options) -> Response:
+        return self.request("POST", url, data, **options)
+
+    def put(self, url, data=b"", **options) -> Response:
+        return self.request("PUT", url, data, **options)
+
+    def delete(self, url, **options) -> Response:
+        return self.request("DELETE", url, **options)
+
+    def stream(self, url, method="GET", data=None, headers=None, **options):
+        """Iterate over the response body chunks as they arrive.
+
+        The transfer only progresses while the iterator is consumed.
+        Raises RuntimeError if the transfer fails.
+        """
+        response = Response()
+        chunks = collections.deque()
+        curl = self._pool.acquire()
+        multi = None
+        tmpl = None
+        try:
+            tmpl = _prepare_request(curl, method, url, data, headers, options,
+                                    response, chunks)
+            multi = multi_init()
+            if not multi:
+                raise RuntimeError("libcurl.multi_init() failed")
+            _check_multi(multi_add_handle(multi, curl), "multi_add_handle")
+            running = ct.c_int(1)
+            while running.value:
+                _check_multi(multi_perform(multi, ct.byref(running)), "multi_perform")
+                while chunks: yield chunks.popleft()
+                if running.value:
+                    _check_multi(multi_poll(multi, None, 0, 1000, None), "multi_poll")
+            while chunks: yield chunks.popleft()
+            for done in multi_completed(multi, remove=False, private=False):
+                response.code = done.result
+            if response.code != CURLE_OK:
+                raise RuntimeError("libcurl transfer failed (code %d): %s" %
+                                   (response.code, response.error))
+        finally:
+            if multi:
+                multi_remove_handle(multi, curl)
+                multi_cleanup(multi)
+            if tmpl is not None: tmpl.close()
+            self._pool.release(curl)
+
+    def close(self):
+        """Release the pooled handles and the share handle.
+
+        Must not be called while requests of the session are in progress.
+        """
+        self._pool.close()
+        if self._share is not None:
+            res = share_cleanup(self._share)
+            if res != CURLSHE_OK:
+                raise RuntimeError("libcurl.share_cleanup() failed (code %d): %s" %
+                                   (res, share_strerror(res).decode("utf-8")))
+            self._share = None
+            self._template.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, exc_tb):
+        self.close()
+
+    # Internals
+
+    @staticmethod
+    def _check_share(res):
+        if res != CURLSHE_OK:
+            raise RuntimeError("libcurl.share_setopt() failed (code %d): %s" %
+                               (res, share_strerror(res).decode("utf-8")))
+
+
+def _prepare_request(curl: ct.POINTER(CURL), method, url, data, headers, options,
+                     response, body):
+    # Sets up curl for a request whose response body chunks are appended to
+    # body. Returns the OptionTemplate of the per-request options (or None),
+    # which has to be kept open until the transfer is done.
+    if isinstance(url, str): url = url.encode("utf-8")
+    easy_setopt(curl, CURLOPT_URL, url)
+    method = method.upper()
+    if method == "GET":
+        easy_setopt(curl, CURLOPT_HTTPGET, 1)
+    elif method == "HEAD":
+        easy_setopt(curl, CURLOPT_NOBODY, 1)
+    else:
+        if method == "POST" and data is None:
+            data = b""
+        if method != "POST":
+            easy_setopt(curl, CURLOPT_CUSTOMREQUEST, method.encode("ascii"))
+    if data is not None:  # CURLOPT_POSTFIELDS implies CURLOPT_POST
+        if isinstance(data, str): data = data.encode("utf-8")
+        options[CURLOPT_POSTFIELDSIZE_LARGE] = len(data)
+        options[CURLOPT_POSTFIELDS] = data
+    if headers:
+        if isinstance(headers, dict):
+            headers = [f"{name}: {value}" for name, value in headers.items()]
+        options[CURLOPT_HTTPHEADER] = list(headers)
+    callback_setopt(curl, CURLOPT_WRITEFUNCTION, _Collector(body))
+    callback_setopt(curl, CURLOPT_HEADERFUNCTION, _Collector(response._header_lines))
+    if not options:
+        return None
+    tmpl = OptionTemplate(options)
+    res = tmpl.apply(curl)
+    if res != CURLE_OK:
+        tmpl.close()
+        raise RuntimeError("libcurl.easy_setopt() failed (code %d): %s" %
+                           (res, easy_strerror(res).decode("utf-8")))
+    return tmpl
+
+
+def _finish_request(curl: ct.POINTER(CURL), response, result):
+    response.code = result
+    status = ct.c_long(0)
+    easy_getinfo(curl, CURLINFO_RESPONSE_CODE, ct.byref(status))
+    response.status = status.value
+    url = ct.c_char_p()
+    easy_getinfo(curl, CURLINFO_EFFECTIVE_URL, ct.byref(url))
+    if url.value is not None:
+        response.url = url.value.decode("utf-8")
+
+
+def _check_multi(res, func):
+    if res != CURLM_OK:
+        raise RuntimeError("libcurl.%s() failed (code %d): %s" %
+                           (func, res, multi_strerror(res).decode("utf-8")))
+
+
+class _Collector:
+    # Write/header handler appending the received chunks to a list or deque.
+
+    __slots__ = ('chunks',)
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __call__(self, buffer, size, nitems):
+        nbytes = size * nitems
+        self.chunks.append(ct.string_at(buffer, nbytes))
+        return nbytes
+
+# eof
@@ -0,0 +1,149 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+# Share handle lock provider.
+#
+# Data shared between easy handles used from several threads has to be
+# protected by lock/unlock callbacks set on the share handle. ShareLock
+# provides them with one reader/writer lock per CURL_LOCK_DATA_* category:
+# CURL_LOCK_ACCESS_SHARED requests are granted concurrently and only
+# CURL_LOCK_ACCESS_SINGLE ones are exclusive, so e.g. DNS cache lookups of
+# many threads do not serialise on one mutex, nor wait for connection cache
+# accesses. Acquisitions that had to wait are counted per category.
+
+import time
+import threading
+import ctypes as ct
+
+from ._curl import (CURLSH, CURLSHE_OK, CURLSHOPT_LOCKFUNC, CURLSHOPT_UNLOCKFUNC,
+                    CURL_LOCK_DATA_NONE, CURL_LOCK_DATA_SHARE, CURL_LOCK_DATA_COOKIE,
+                    CURL_LOCK_DATA_DNS, CURL_LOCK_DATA_SSL_SESSION,
+                    CURL_LOCK_DATA_CONNECT, CURL_LOCK_DATA_PSL, CURL_LOCK_DATA_HSTS,
+                    CURL_LOCK_DATA_LAST, CURL_LOCK_ACCESS_SHARED,
+                    lock_function, unlock_function, share_setopt)
+
+__all__ = ('ShareLock',)
+
+_lock_data_names = {
+    CURL_LOCK_DATA_NONE:        "none",
+    CURL_LOCK_DATA_SHARE:       "share",
+    CURL_LOCK_DATA_COOKIE:      "cookie",
+    CURL_LOCK_DATA_DNS:         "dns",
+    CURL_LOCK_DATA_SSL_SESSION: "ssl_session",
+    CURL_LOCK_DATA_CONNECT:     "connect",
+    CURL_LOCK_DATA_PSL:         "psl",
+    CURL_LOCK_DATA_HSTS:        "hsts",
+}
+
+
+class _RWLock:
+    # Reader/writer lock preferring writers. The unlock callback does not
+    # tell the kind of access, so the writer's thread is remembered.
+
+    __slots__ = ('_cond', '_readers', '_writer', '_writers_waiting',
+                 'acquired', 'contended', 'wait_time')
+
+    def __init__(self):
+        self._cond    = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer  = None  # ident of the thread holding the lock exclusively
+        self._writers_waiting = 0
+        self.acquired  = 0
+        self.contended = 0
+        self.wait_time = 0.0
+
+    def acquire(self, shared):
+        with self._cond:
+            self.acquired += 1
+            if shared:
+                if self._writer is None and not self._writers_waiting:
+                    self._readers += 1
+                    return
+                self._wait(lambda: self._writer is None and not self._writers_waiting)
+                self._readers += 1
+            else:
+                if self._writer is None and not self._readers:
+                    self._writer = threading.get_ident()
+                    return
+                self._writers_waiting += 1
+                try:
+                    self._wait(lambda: self._writer is None and not self._readers)
+                finally:
+                    self._writers_waiting -= 1
+                self._writer = threading.get_ident()
+
+    def release(self):
+        with self._cond:
+            if self._writer is not None and self._writer == threading.get_ident():
+                self._writer = None
+                self._cond.notify_all()
+            elif self._readers:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    def _wait(self, predicate):
+        self.contended += 1
+        start = time.perf_counter()
+        self._cond.wait_for(predicate)
+        self.wait_time += time.perf_counter() - start
+
+
+class ShareLock:
+    """Reader/writer lock callbacks for a share handle.
+
+        lock = ShareLock()
+        share = share_init()
+        share_setopt(share, CURLSHOPT_SHARE, CURL_LOCK_DATA_DNS)
+        lock.install(share)
+        ...
+        print(lock.stats())
+
+    The ShareLock must be kept alive for as long as the share handle.
+    """
+
+    def __init__(self):
+        self._locks = tuple(_RWLock() for _ in range(CURL_LOCK_DATA_LAST))
+        self._lock_cb   = lock_function(self._lock)
+        self._unlock_cb = unlock_function(self._unlock)
+
+    @property
+    def lock_callback(self):
+        """The CURLSHOPT_LOCKFUNC callback."""
+        return self._lock_cb
+
+    @property
+    def unlock_callback(self):
+        """The CURLSHOPT_UNLOCKFUNC callback."""
+        return self._unlock_cb
+
+    def install(self, share: ct.POINTER(CURLSH)) -> int:
+        """Set the lock callbacks on share; returns a CURLSHcode."""
+        res = share_setopt(share, CURLSHOPT_LOCKFUNC, self._lock_cb)
+        if res != CURLSHE_OK: return res
+        return share_setopt(share, CURLSHOPT_UNLOCKFUNC, self._unlock_cb)
+
+    def contention(self, data: int) -> int:
+        """Number of acquisitions of the data's lock that had to wait."""
+        return self._locks[data].contended
+
+    def stats(self) -> dict:
+        """{category name: (acquisitions, contended, seconds waited)} of the
+        used categories."""
+        return {_lock_data_names.get(data, str(data)):
+                (lock.acquired, lock.contended, lock.wait_time)
+                for data, lock in enumerate(self._locks) if lock.acquired}
+
+    def reset_stats(self):
+        for lock in self._locks:
+            lock.acquired  = 0
+            lock.contended = 0
+            lock.wait_time = 0.0
+
+    def _lock(self, handle, data, locktype, userptr):
+        self._locks[data].acquire(locktype == CURL_LOCK_ACCESS_SHARED)
+
+    def _unlock(self, handle, data, userptr):
+        self._locks[data].release()
+
+# eof
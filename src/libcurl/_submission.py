@@ -0,0 +1,108 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+# Cross-thread submission queue for a multi handle.
+#
+# The thread driving a multi handle spends most of its time in multi_poll().
+# Work submitted from other threads is put on a SubmissionQueue, which wakes
+# the poll up with multi_wakeup(), and the driving thread drains the queue in
+# batches between polls (e.g. to multi_add_handle() the transfers).
+# multi_wakeup() is only called when the queue turns non-empty: until it is
+# drained, the wakeup already issued is still pending. Wakeups are issued
+# under the queue's lock, and the driving thread detach()es the queue under
+# the same lock before it cleans up the multi handle.
+
+import threading
+import collections
+import ctypes as ct
+
+from ._multi import CURLM, CURLM_OK, multi_wakeup, multi_strerror
+
+__all__ = ('SubmissionQueue',)
+
+
+class SubmissionQueue:
+    """Thread-safe queue of work items for the thread driving a multi handle.
+
+        queue = SubmissionQueue(multi)
+        # producer threads:
+        queue.put(spec)
+        # driving thread:
+        while not (queue.closed and done):
+            for spec in queue.drain(): ... multi_add_handle(multi, curl)
+            multi_perform(multi, ...)
+            multi_poll(multi, ...)
+        queue.detach()
+        multi_cleanup(multi)
+    """
+
+    def __init__(self, multi: ct.POINTER(CURLM)):
+        self._multi  = multi
+        self._items  = collections.deque()
+        self._lock   = threading.Lock()
+        self._closed = False
+
+    def __len__(self):
+        return len(self._items)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def put(self, item):
+        """Enqueue item and wake up the driving thread."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("SubmissionQueue is closed")
+            if not self._items: self._wakeup()
+            self._items.append(item)
+
+    def put_many(self, items):
+        """Enqueue items with a single wakeup."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("SubmissionQueue is closed")
+            wakeup = not self._items
+            self._items.extend(items)
+            if wakeup and self._items: self._wakeup()
+
+    def drain(self, limit=None) -> list:
+        """Dequeue up to limit (default all) items, oldest first."""
+        with self._lock:
+            items = self._items
+            if not items:
+                return []
+            if limit is None or len(items) <= limit:
+                batch = list(items)
+                items.clear()
+                return batch
+            batch = [items.popleft() for _ in range(limit)]
+            self._wakeup()  # the rest is still waiting
+            return batch
+
+    def close(self):
+        """Refuse further items and wake up the driving thread."""
+        with self._lock:
+            if self._closed: return
+            self._closed = True
+            self._wakeup()
+
+    def detach(self):
+        """Close the queue and drop the multi handle.
+
+        To be called by the driving thread before multi_cleanup(): no
+        wakeup reaches the multi handle afterwards.
+        """
+        with self._lock:
+            self._closed = True
+            self._multi  = None
+
+    def _wakeup(self):
+        # Called with the lock held, so that detach() waits for it.
+        if self._multi is None: return
+        res = multi_wakeup(self._multi)
+        if res != CURLM_OK:
+            raise RuntimeError("libcurl.multi_wakeup() failed (code %d): %s" %
+                               (res, multi_strerror(res).decode("utf-8")))
+
+# eof
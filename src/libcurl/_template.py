@@ -0,0 +1,172 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+# Compiled option templates.
+#
+# An OptionTemplate validates a set of CURLOPT_* options against libcurl's
+# option table and converts every value to its C representation once, up
+# front. The C type is chosen from the option's CURLOPTTYPE_* band:
+#
+#   CURLOPTTYPE_LONG          -> long
+#   CURLOPTTYPE_OBJECTPOINT   -> char* / curl_slist* / void*
+#   CURLOPTTYPE_FUNCTIONPOINT -> callback function pointer
+#   CURLOPTTYPE_OFF_T         -> curl_off_t
+#   CURLOPTTYPE_BLOB          -> struct curl_blob*
+#
+# Applying the template to an easy handle is then a tight loop of
+# curl_easy_setopt() calls through the setopt_* prototypes of the matching
+# C type, with no per-call argument conversion. Alternatively new_handle() clones a
+# handle configured with the template by curl_easy_duphandle().
+
+import ctypes as ct
+
+from ._curl     import (CURL, CURLE_OK, off_t,
+                        slist_append, slist_free_all, easy_strerror)
+from ._easy     import (easy_init, easy_cleanup, easy_duphandle,
+                        blob, CURL_BLOB_COPY, setopt_prototype,
+                        setopt_long, setopt_off_t, setopt_ptr, setopt_func,
+                        setopt_blob)
+from ._options  import easy_option_by_id, easy_option_by_name
+
+__all__ = ('OptionTemplate',)
+
+class OptionTemplate:
+    """A precompiled set of easy handle options.
+
+    options maps CURLOPT_* values (or option names such as "FOLLOWLOCATION")
+    to Python values: ints for long and curl_off_t options, str/bytes for
+    strings, a list of str/bytes for slist options, callback function
+    objects, bytes for blob options (copied by libcurl) and None to reset
+    an option:
+
+        tmpl = OptionTemplate({CURLOPT_FOLLOWLOCATION: 1,
+                               CURLOPT_HTTPHEADER: ["Accept: */*"]})
+        res = tmpl.apply(curl)
+        curl2 = tmpl.new_handle()
+
+    libcurl does not copy slists, so the template must stay open for as
+    long as any handle it was applied to (or cloned into) is in use.
+    """
+
+    def __init__(self, options=None):
+        self._compiled = []   # [(setopt, option, C value), ...]
+        self._slists   = []
+        self._keep     = []   # Python objects the C values point into
+        self._proto    = None
+        if options:
+            self.update(options)
+
+    def __len__(self):
+        return len(self._compiled)
+
+    def update(self, options):
+        """Compile further options; later values override earlier ones."""
+        compiled = {entry[1]: entry for entry in self._compiled}
+        for option, value in dict(options).items():
+            option = self._option_id(option)
+            compiled[option] = self._compile(option, value)
+        self._compiled = list(compiled.values())
+        self._drop_prototype()
+
+    def apply(self, curl: ct.POINTER(CURL)) -> int:
+        """Set all options on curl; returns the first failing CURLcode."""
+        for setopt, option, value in self._compiled:
+            res = setopt(curl, option, value)
+            if res != CURLE_OK: return res
+        return CURLE_OK
+
+    def new_handle(self) -> ct.POINTER(CURL):
+        """Return a new easy handle with the template's options set."""
+        if self._proto is None:
+            proto = easy_init()
+            if not proto:
+                raise RuntimeError("libcurl.easy_init() failed")
+            res = self.apply(proto)
+            if res != CURLE_OK:
+                easy_cleanup(proto)
+                raise RuntimeError("libcurl.easy_setopt() failed (code %d): %s" %
+                                   (res, easy_strerror(res).decode("utf-8")))
+            self._proto = proto
+        curl = easy_duphandle(self._proto)
+        if not curl:
+            raise RuntimeError("libcurl.easy_duphandle() failed")
+        return curl
+
+    def close(self):
+        """Release the prototype handle and the template's slists."""
+        self._drop_prototype()
+        for slist in self._slists:
+            slist_free_all(slist)
+        self._slists.clear()
+        self._keep.clear()
+        self._compiled.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, exc_tb):
+        self.close()
+
+    # Internals
+
+    def _drop_prototype(self):
+        if self._proto is not None:
+            easy_cleanup(self._proto)
+            self._proto = None
+
+    @staticmethod
+    def _option_id(option) -> int:
+        if isinstance(option, str):
+            option = option.encode("utf-8")
+        if isinstance(option, bytes):
+            name = option[8:] if option.startswith(b"CURLOPT_") else option
+            opt = easy_option_by_name(name)
+        else:
+            opt = easy_option_by_id(int(option))
+        if not opt:
+            raise ValueError(f"Unknown easy option: {option!r}")
+        return opt.contents.id
+
+    def _compile(self, option: int, value):
+        setopt = setopt_prototype(option)
+        if setopt is setopt_long:
+            value = ct.c_long(int(value or 0))
+        elif setopt is setopt_off_t:
+            value = off_t(int(value or 0))
+        elif setopt is setopt_blob:
+            if value is None:
+                value = ct.POINTER(blob)()
+            elif isinstance(value, blob):
+                value = ct.pointer(value)
+            else:
+                data = bytes(value)
+                self._keep.append(data)
+                value = ct.pointer(blob(ct.cast(ct.c_char_p(data), ct.c_void_p),
+                                        len(data), CURL_BLOB_COPY))
+        elif setopt is setopt_func:
+            if value is not None and not isinstance(value, ct._CFuncPtr):
+                raise TypeError(f"Option {option} requires a callback function "
+                                f"object, got {type(value).__name__}")
+        elif isinstance(value, (list, tuple)):  # slist option
+            slist = None
+            for item in value:
+                if isinstance(item, str): item = item.encode("utf-8")
+                temp = slist_append(slist, item)
+                if not temp:
+                    if slist: slist_free_all(slist)
+                    raise MemoryError("libcurl.slist_append() failed")
+                slist = temp
+            if slist: self._slists.append(slist)
+            setopt, value = setopt_ptr, ct.cast(slist, ct.c_void_p)
+        else:  # string (setopt_str) or any other pointer (setopt_ptr)
+            if isinstance(value, str):
+                value = value.encode("utf-8")
+            if isinstance(value, bytes):
+                value = ct.c_char_p(value)
+            elif value is None or isinstance(value, int):
+                value = ct.c_void_p(value)
+                setopt = setopt_ptr
+        if value is not None: self._keep.append(value)
+        return setopt, option, value
+
+# eof
@@ -0,0 +1,246 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+# Low-overhead structured tracing.
+#
+# Tracer is a CURLOPT_DEBUGFUNCTION recording the debug events of transfers
+# as fixed-size binary records (time, transfer id, connection id, infotype,
+# length and the first bytes of the payload) into a preallocated ring
+# buffer, overwriting the oldest records. Nothing is formatted while
+# tracing: the payload is copied straight from libcurl's buffer into the
+# ring. snapshot() takes the records out as bytes, which decode_trace() and
+# format_trace() turn into events or text/JSON lines, later and elsewhere.
+# curl_global_trace() selects the libcurl components whose (CURLINFO_TEXT)
+# trace output is produced.
+
+import time
+import json
+import struct
+import threading
+import datetime
+import ctypes as ct
+
+from ._platform import CFUNC
+from ._curl     import (CURL, CURLE_OK, CURLINFO_TEXT, CURLINFO_HEADER_IN,
+                        CURLINFO_HEADER_OUT, CURLINFO_DATA_IN, CURLINFO_DATA_OUT,
+                        CURLINFO_SSL_DATA_IN, CURLINFO_SSL_DATA_OUT, CURLINFO_END,
+                        CURLINFO_XFER_ID, CURLINFO_CONN_ID, CURLOPT_VERBOSE,
+                        CURLOPT_DEBUGFUNCTION, off_t, infotype)
+from ._easy     import easy_setopt
+from ._metrics  import _getinfo
+
+__all__ = ('Tracer', 'TraceEvent', 'decode_trace', 'format_trace')
+
+# time (ns), transfer id, connection id, infotype, length, stored length
+_record = struct.Struct("<qqqBIH")
+# magic, record size, payload size, number of records
+_header = struct.Struct("<8sIIQ")
+_magic  = b"LCTRACE1"
+
+_infotype_names = {
+    CURLINFO_TEXT:         "TEXT",
+    CURLINFO_HEADER_IN:    "HEADER_IN",
+    CURLINFO_HEADER_OUT:   "HEADER_OUT",
+    CURLINFO_DATA_IN:      "DATA_IN",
+    CURLINFO_DATA_OUT:     "DATA_OUT",
+    CURLINFO_SSL_DATA_IN:  "SSL_DATA_IN",
+    CURLINFO_SSL_DATA_OUT: "SSL_DATA_OUT",
+}
+_text_infotypes = (CURLINFO_TEXT, CURLINFO_HEADER_IN, CURLINFO_HEADER_OUT)
+
+# debug_callback taking the data as an address (no POINTER object per call).
+_debug_callback = CFUNC(ct.c_int,
+    ct.c_void_p,  # handle
+    infotype,     # type
+    ct.c_void_p,  # data
+    ct.c_size_t,  # size
+    ct.c_void_p)  # userptr
+
+
+class Tracer:
+    """Ring buffer of the debug events of the transfers it is installed on.
+
+        tracer = Tracer(capacity=65536, components=b"all")
+        tracer.install(curl)
+        ...
+        tracer.save("incident.trace")
+        # later, anywhere:
+        print(format_trace(open("incident.trace", "rb").read()))
+
+    capacity is the number of records kept. Up to payload bytes of text and
+    header events and up to data_payload bytes of (SSL) data events are kept
+    per record. infotypes restricts the recorded CURLINFO_* types.
+    components, if given, is passed to curl_global_trace() (e.g.
+    b"all,-ssl"); it requires libcurl >= 8.3.0.
+    """
+
+    def __init__(self, capacity=16384, payload=64, data_payload=0, infotypes=None,
+                 components=None):
+        if capacity <= 0:
+            raise ValueError("capacity must be greater than 0")
+        if not 0 <= payload <= 0xFFFF or not 0 <= data_payload <= 0xFFFF:
+            raise ValueError("payload sizes must be between 0 and 65535")
+        if components is not None:
+            from ._curl import global_trace  # libcurl >= 8.3.0
+            if isinstance(components, str): components = components.encode("ascii")
+            res = global_trace(components)
+            if res != CURLE_OK:
+                raise RuntimeError("libcurl.global_trace() failed (code %d)" % res)
+        self.capacity = capacity
+        self.payload  = max(payload, data_payload)
+        self._limits  = [payload if infotype in _text_infotypes else data_payload
+                         for infotype in range(CURLINFO_END)]
+        if infotypes is not None:
+            self._limits = [limit if infotype in infotypes else None
+                            for infotype, limit in enumerate(self._limits)]
+        self._record_size = _record.size + self.payload
+        self._buffer  = bytearray(capacity * self._record_size)
+        self._address = ct.addressof((ct.c_char * len(self._buffer)).from_buffer(self._buffer))
+        self._ids     = (off_t * 2)()  # transfer and connection id
+        self._ids_address = ct.addressof(self._ids)
+        self._next    = 0  # number of records written
+        self._lock    = threading.Lock()
+        self._callback = _debug_callback(self._debug)
+
+    @property
+    def callback(self):
+        """The CURLOPT_DEBUGFUNCTION callback."""
+        return self._callback
+
+    @property
+    def total(self) -> int:
+        """Number of events recorded (including the overwritten ones)."""
+        return self._next
+
+    @property
+    def dropped(self) -> int:
+        """Number of records overwritten."""
+        return max(0, self._next - self.capacity)
+
+    def __len__(self):
+        return min(self._next, self.capacity)
+
+    def install(self, curl: ct.POINTER(CURL)) -> int:
+        """Set the callback (and CURLOPT_VERBOSE) on curl; returns a CURLcode."""
+        res = easy_setopt(curl, CURLOPT_DEBUGFUNCTION, self._callback)
+        if res != CURLE_OK: return res
+        return easy_setopt(curl, CURLOPT_VERBOSE, 1)
+
+    def uninstall(self, curl: ct.POINTER(CURL)) -> int:
+        res = easy_setopt(curl, CURLOPT_VERBOSE, 0)
+        if res != CURLE_OK: return res
+        return easy_setopt(curl, CURLOPT_DEBUGFUNCTION, None)
+
+    def clear(self):
+        with self._lock:
+            self._next = 0
+
+    def snapshot(self) -> bytes:
+        """The retained records, oldest first, for decode_trace()."""
+        with self._lock:
+            count = min(self._next, self.capacity)
+            split = (self._next % self.capacity) * self._record_size
+            if self._next >= self.capacity:
+                records = self._buffer[split:] + self._buffer[:split]
+            else:
+                records = bytes(self._buffer[:split])
+        return _header.pack(_magic, self._record_size, self.payload, count) + records
+
+    def save(self, path):
+        """Write snapshot() to a file."""
+        with open(path, "wb") as file:
+            file.write(self.snapshot())
+
+    def _debug(self, handle, infotype, data, size, userptr):
+        try:
+            limit = self._limits[infotype]
+        except IndexError:
+            return 0
+        if limit is None: return 0
+        stored = min(size, limit)
+        ids = self._ids
+        with self._lock:
+            if _getinfo(handle, CURLINFO_XFER_ID, self._ids_address) != CURLE_OK:
+                ids[0] = -1
+            if _getinfo(handle, CURLINFO_CONN_ID, self._ids_address + 8) != CURLE_OK:
+                ids[1] = -1
+            offset = (self._next % self.capacity) * self._record_size
+            self._next += 1
+            _record.pack_into(self._buffer, offset, time.time_ns(),
+                              ids[0], ids[1], infotype, size, stored)
+            if stored:
+                ct.memmove(self._address + offset + _record.size, data, stored)
+        return 0
+
+
+class TraceEvent:
+    """A decoded trace record. timestamp is in nanoseconds since the epoch,
+    length the size of the event's data of which payload holds the first
+    bytes."""
+
+    __slots__ = ('timestamp', 'xfer_id', 'conn_id', 'infotype', 'length', 'payload')
+
+    def __init__(self, timestamp, xfer_id, conn_id, infotype, length, payload):
+        self.timestamp = timestamp
+        self.xfer_id   = xfer_id
+        self.conn_id   = conn_id
+        self.infotype  = infotype
+        self.length    = length
+        self.payload   = payload
+
+    @property
+    def infotype_name(self) -> str:
+        return _infotype_names.get(self.infotype, str(self.infotype))
+
+    def asdict(self) -> dict:
+        text = self.infotype in _text_infotypes
+        return {"time":    self.timestamp,
+                "xfer_id": self.xfer_id,
+                "conn_id": self.conn_id,
+                "type":    self.infotype_name,
+                "length":  self.length,
+                ("text" if text else "hex"): (self.payload.decode("iso-8859-1") if text
+                                              else self.payload.hex())}
+
+    def __str__(self):
+        when = datetime.datetime.fromtimestamp(self.timestamp / 1e9, datetime.timezone.utc)
+        if self.infotype in _text_infotypes:
+            data = self.payload.decode("iso-8859-1").rstrip("\r\n")
+            data = data.replace("\r", "\\r").replace("\n", "\\n")
+        else:
+            data = self.payload.hex(" ")
+        if len(self.payload) < self.length:
+            data += " [+%d bytes]" % (self.length - len(self.payload))
+        return "%s [%d-%d] %s %d: %s" % (when.strftime("%H:%M:%S.%f"), self.xfer_id,
+                                          self.conn_id, self.infotype_name,
+                                          self.length, data)
+
+    def __repr__(self):
+        return (f"<TraceEvent {self.infotype_name} xfer={self.xfer_id} "
+                f"conn={self.conn_id} length={self.length}>")
+
+
+def decode_trace(data: bytes):
+    """Iterate over the TraceEvents of a Tracer snapshot."""
+    magic, record_size, _, count = _header.unpack_from(data)
+    if magic != _magic:
+        raise ValueError("not a libcurl trace")
+    view = memoryview(data)
+    offset = _header.size
+    for _ in range(count):
+        timestamp, xfer_id, conn_id, infotype, length, stored = _record.unpack_from(view, offset)
+        start = offset + _record.size
+        yield TraceEvent(timestamp, xfer_id, conn_id, infotype, length,
+                         bytes(view[start:start + stored]))
+        offset += record_size
+
+
+def format_trace(data: bytes, format="text") -> str:
+    """A Tracer snapshot as text lines or (format="json") JSON lines."""
+    if format == "json":
+        return "".join(json.dumps(event.asdict()) + "\n" for event in decode_trace(data))
+    if format == "text":
+        return "".join(str(event) + "\n" for event in decode_trace(data))
+    raise ValueError("format must be 'text' or 'json'")
+
+# eof
@@ -0,0 +1,109 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+# Local HTTP/1.1 server for the tests:
+#
+#   GET  /<n>            -> n bytes of b"x"
+#   GET  /status/<code>  -> empty response with the status code
+#   GET  /slow/<ms>      -> b"slow" after ms milliseconds
+#   GET  /cookie         -> Set-Cookie: name=value
+#   GET  /headers        -> the request headers
+#   GET  /redirect/<n>   -> 302 to /<n>
+#   POST /echo           -> the request body (also PUT)
+#
+# HEAD requests get the headers of the GET response.
+
+import sys
+import socket
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+__all__ = ('HTTPServer', 'closed_port')
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        path = self.path.split("?")[0].strip("/")
+        headers = {}
+        status = 200
+        if path.isdigit():
+            body = b"x" * int(path)
+        elif path.startswith("status/"):
+            status, body = int(path.split("/")[1]), b""
+        elif path.startswith("slow/"):
+            time.sleep(int(path.split("/")[1]) / 1000)
+            body = b"slow"
+        elif path == "cookie":
+            headers["Set-Cookie"] = "name=value"
+            body = b"cookie"
+        elif path == "headers":
+            body = bytes(self.headers)
+        elif path.startswith("redirect/"):
+            status, body = 302, b""
+            headers["Location"] = "/" + path.split("/", 1)[1]
+        else:
+            status, body = 404, b""
+        self._respond(status, body, headers)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._respond(200, body)
+
+    do_HEAD = do_GET
+    do_PUT  = do_POST
+
+    def _respond(self, status, body, headers={}):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):  # aborted transfers
+            super().handle_error(request, client_address)
+
+
+class HTTPServer:
+    """The test server on a daemon thread (url: "http://127.0.0.1:port")."""
+
+    def __init__(self, host="127.0.0.1"):
+        self._server = _Server((host, 0), _Handler)
+        self.host = host
+        self.port = self._server.server_address[1]
+        self.url  = "http://%s:%d" % (host, self.port)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def closed_port():
+    """A local port nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# eof
@@ -0,0 +1,212 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+# Startup-time benchmark.
+#
+# Measures, each in a fresh interpreter and as the median of --samples runs:
+#
+#   import      - wall time of 'import libcurl'
+#   dll_load    - time spent in libcurl._dll (loading the shared library)
+#   modules     - per-submodule import cost (from python -X importtime)
+#   first_perform - time from interpreter start to the end of the first
+#                 easy_perform() against a local HTTP server, and of the
+#                 easy_perform() call alone
+#
+# Every run is appended as a JSON line to the results file, so that the
+# cold-start path can be tracked across releases. With --max-regression
+# the run fails if 'import libcurl' got slower by more than the given
+# percentage compared with the last recorded run of another release.
+#
+#   python -m tests.bench_startup [--samples N] [--max-regression PCT]
+
+import sys
+import os
+import subprocess
+import argparse
+import json
+import platform
+import statistics
+import threading
+import datetime
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+from . import test_dir
+
+results_file = test_dir/"log_dir"/"bench_startup.jsonl"
+
+_import_script = """
+import time
+t0 = time.perf_counter()
+import libcurl
+t1 = time.perf_counter()
+print((t1 - t0) * 1000)
+"""
+
+_perform_script = """
+import time, sys
+t0 = time.perf_counter()
+import libcurl as lcurl
+curl = lcurl.easy_init()
+lcurl.easy_setopt(curl, lcurl.CURLOPT_URL, sys.argv[1].encode("utf-8"))
+lcurl.easy_setopt(curl, lcurl.CURLOPT_WRITEFUNCTION, lcurl.write_skipped)
+t1 = time.perf_counter()
+res = lcurl.easy_perform(curl)
+t2 = time.perf_counter()
+lcurl.easy_cleanup(curl)
+print(res, (t2 - t0) * 1000, (t2 - t1) * 1000)
+"""
+
+_version_script = """
+import libcurl as lcurl
+print(lcurl.__version__)
+print(lcurl.version().decode("utf-8"))
+"""
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        body = b"x" * 1024
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_python(*args, script):
+    output = subprocess.run([sys.executable, *args], input=script,
+                            capture_output=True, text=True, check=True)
+    return output
+
+
+def bench_import(samples):
+    times = [float(run_python("-", script=_import_script).stdout)
+             for _ in range(samples)]
+    return statistics.median(times)
+
+
+def bench_modules(samples):
+    # python -X importtime reports: self [us] | cumulative [us] | module
+    runs = {}
+    for _ in range(samples):
+        output = run_python("-X", "importtime", "-c", "import libcurl", script="")
+        for line in output.stderr.splitlines():
+            if not line.startswith("import time:"): continue
+            fields = line[len("import time:"):].split("|")
+            if len(fields) != 3 or not fields[0].strip().isdigit(): continue
+            module = fields[2].strip()
+            if module != "libcurl" and not module.startswith("libcurl."): continue
+            runs.setdefault(module, []).append((int(fields[0]), int(fields[1])))
+    return {module: {"self":       statistics.median(t[0] for t in times) / 1000,
+                     "cumulative": statistics.median(t[1] for t in times) / 1000}
+            for module, times in runs.items()}
+
+
+def bench_first_perform(samples):
+    server = HTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = "http://127.0.0.1:%d/" % server.server_address[1]
+        totals, performs = [], []
+        for _ in range(samples):
+            output = run_python("-", url, script=_perform_script)
+            res, total, perform = output.stdout.split()
+            if int(res) != 0:
+                raise RuntimeError(f"easy_perform() failed (code {res})")
+            totals.append(float(total))
+            performs.append(float(perform))
+        return {"total":   statistics.median(totals),
+                "perform": statistics.median(performs)}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def run(samples):
+    version, curl_version = run_python("-", script=_version_script).stdout.splitlines()
+    modules = bench_modules(samples)
+    return {
+        "date":          datetime.datetime.now().isoformat(timespec="seconds"),
+        "version":       version,
+        "curl_version":  curl_version,
+        "python":        platform.python_version(),
+        "platform":      platform.platform(),
+        "samples":       samples,
+        "import":        bench_import(samples),
+        "dll_load":      modules.get("libcurl._dll", {}).get("self"),
+        "first_perform": bench_first_perform(samples),
+        "modules":       modules,
+    }
+
+
+def load_results(path):
+    if not os.path.exists(path): return []
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def save_result(path, result):
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(json.dumps(result) + "\n")
+
+
+def print_result(result, baseline=None):
+    def ms(value, base=None):
+        text = "%8.2f ms" % value
+        if base: text += "  (%+.1f%%)" % ((value - base) / base * 100)
+        return text
+    base = baseline or {}
+    print(f"libcurl {result['version']} ({result['curl_version']}), "
+          f"Python {result['python']}, {result['platform']}")
+    if baseline:
+        print(f"compared with {baseline['version']} of {baseline['date']}")
+    print("import libcurl      ", ms(result["import"], base.get("import")))
+    if result["dll_load"] is not None:
+        print("DLL load            ", ms(result["dll_load"], base.get("dll_load")))
+    first, base_first = result["first_perform"], base.get("first_perform", {})
+    print("first easy_perform  ", ms(first["total"], base_first.get("total")))
+    print("  easy_perform alone", ms(first["perform"], base_first.get("perform")))
+    print("modules (self / cumulative):")
+    for module, times in sorted(result["modules"].items(),
+                                key=lambda item: -item[1]["cumulative"]):
+        print("  %-28s %8.2f ms %8.2f ms" % (module, times["self"],
+                                             times["cumulative"]))
+
+
+def main(argv=sys.argv[1:]):
+    parser = argparse.ArgumentParser(prog="bench_startup",
+                                     description="libcurl startup-time benchmark")
+    parser.add_argument("--samples", type=int, default=10, metavar="N",
+                        help="runs per measurement, the median is taken (default: 10)")
+    parser.add_argument("--output", default=str(results_file), metavar="FILE",
+                        help="JSON lines file the results are appended to")
+    parser.add_argument("--no-save", action="store_true",
+                        help="do not append the results to the output file")
+    parser.add_argument("--max-regression", type=float, default=None, metavar="PCT",
+                        help="fail if 'import libcurl' is more than PCT percent "
+                             "slower than in the last run of another release")
+    args = parser.parse_args(argv)
+
+    result = run(args.samples)
+    previous = [item for item in load_results(args.output)
+                if item["version"] != result["version"]]
+    baseline = previous[-1] if previous else None
+    print_result(result, baseline)
+    if not args.no_save:
+        save_result(args.output, result)
+
+    if args.max_regression is not None and baseline is not None:
+        regression = (result["import"] - baseline["import"]) / baseline["import"] * 100
+        if regression > args.max_regression:
+            print(f"import time regressed by {regression:.1f}% "
+                  f"(limit {args.max_regression}%)", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__.rpartition(".")[-1] == "__main__":
+    sys.exit(main())
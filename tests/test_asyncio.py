@@ -0,0 +1,96 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+import asyncio
+import ctypes as ct
+
+import libcurl as lcurl
+from ._httpd import HTTPServer, closed_port
+
+
+class AsyncMultiTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def setUp(self):
+        self.handles = []
+
+    def tearDown(self):
+        for curl in self.handles:
+            lcurl.easy_cleanup(curl)
+
+    def easy(self, url):
+        curl = lcurl.easy_init()
+        self.handles.append(curl)
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_URL, url.encode())
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_WRITEFUNCTION, lcurl.write_skipped)
+        return curl
+
+    @staticmethod
+    def size_download(curl):
+        size = lcurl.off_t()
+        lcurl.easy_getinfo(curl, lcurl.CURLINFO_SIZE_DOWNLOAD_T, ct.byref(size))
+        return size.value
+
+    def test_concurrent_transfers(self):
+        sizes = [0, 1, 1000, 100_000, 1_000_000] * 4
+        curls = [self.easy(f"{self.server.url}/{size}") for size in sizes]
+
+        async def main():
+            async with lcurl.AsyncMulti() as amulti:
+                results = await asyncio.gather(*(amulti.perform(curl) for curl in curls))
+                self.assertEqual(len(amulti), 0)
+                return results
+
+        self.assertEqual(asyncio.run(main()), [lcurl.CURLE_OK] * len(sizes))
+        self.assertEqual([self.size_download(curl) for curl in curls], sizes)
+
+    def test_failed_transfer(self):
+        curl = self.easy(f"http://127.0.0.1:{closed_port()}/")
+
+        async def main():
+            async with lcurl.AsyncMulti() as amulti:
+                return await amulti.perform(curl)
+
+        self.assertEqual(asyncio.run(main()), lcurl.CURLE_COULDNT_CONNECT)
+
+    def test_cancel(self):
+        slow = self.easy(f"{self.server.url}/slow/2000")
+        fast = self.easy(f"{self.server.url}/10")
+
+        async def main():
+            async with lcurl.AsyncMulti() as amulti:
+                task = asyncio.ensure_future(amulti.perform(slow))
+                self.assertEqual(await amulti.perform(fast), lcurl.CURLE_OK)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+                await asyncio.sleep(0)
+                self.assertEqual(len(amulti), 0)
+                # the handle was removed from the multi handle: it can be reused
+                lcurl.easy_setopt(slow, lcurl.CURLOPT_URL, f"{self.server.url}/5".encode())
+                return await amulti.perform(slow)
+
+        self.assertEqual(asyncio.run(main()), lcurl.CURLE_OK)
+        self.assertEqual(self.size_download(slow), 5)
+
+    def test_close_cancels_pending(self):
+        curl = self.easy(f"{self.server.url}/slow/2000")
+
+        async def main():
+            amulti = lcurl.AsyncMulti()
+            future = amulti.add_handle(curl)
+            await asyncio.sleep(0.1)
+            amulti.close()
+            self.assertTrue(future.cancelled())
+            self.assertIsNone(amulti.multi)
+            amulti.close()  # idempotent
+
+        asyncio.run(main())
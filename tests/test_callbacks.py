@@ -0,0 +1,172 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+import io
+import os
+import socket
+import tempfile
+import threading
+
+import libcurl as lcurl
+from ._httpd import HTTPServer
+
+SIZE = 1_000_000
+
+
+class CallbacksTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def setUp(self):
+        self.curl = lcurl.easy_init()
+
+    def tearDown(self):
+        lcurl.easy_cleanup(self.curl)
+
+    def download(self, write_function, stream, size=SIZE):
+        curl = self.curl
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_URL, f"{self.server.url}/{size}".encode())
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_WRITEFUNCTION, write_function)
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_WRITEDATA, stream)
+        return lcurl.easy_perform(curl)
+
+    def test_write_to_file(self):
+        for name in ("write_to_file", "write_view_to_file"):
+            write_function = getattr(lcurl, name)
+            with self.subTest(write_function=name):
+                file = io.BytesIO()
+                self.assertEqual(self.download(write_function, id(file)), lcurl.CURLE_OK)
+                self.assertEqual(file.getvalue(), b"x" * SIZE)
+
+    def test_write_to_disk_file(self):
+        with tempfile.TemporaryFile() as file:
+            self.assertEqual(self.download(lcurl.write_view_to_file, id(file)),
+                             lcurl.CURLE_OK)
+            file.seek(0)
+            self.assertEqual(file.read(), b"x" * SIZE)
+
+    def test_write_to_fd(self):
+        for name in ("write_to_fd", "write_view_to_fd"):
+            write_function = getattr(lcurl, name)
+            with self.subTest(write_function=name), \
+                 tempfile.TemporaryFile() as file:
+                self.assertEqual(self.download(write_function, file.fileno()),
+                                 lcurl.CURLE_OK)
+                file.seek(0)
+                self.assertEqual(file.read(), b"x" * SIZE)
+
+    def test_write_view_to_pipe(self):
+        # The pipe's buffer is smaller than the data: writes wait for the reader.
+        rfd, wfd = os.pipe()
+        received = bytearray()
+
+        def reader():
+            while chunk := os.read(rfd, 1000):
+                received.extend(chunk)
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        try:
+            self.assertEqual(self.download(lcurl.write_view_to_fd, wfd), lcurl.CURLE_OK)
+        finally:
+            os.close(wfd)
+            thread.join()
+            os.close(rfd)
+        self.assertEqual(bytes(received), b"x" * SIZE)
+
+    def test_write_to_socket(self):
+        for name in ("write_to_socket", "write_view_to_socket"):
+            write_function = getattr(lcurl, name)
+            with self.subTest(write_function=name):
+                a, b = socket.socketpair()
+                received = bytearray()
+
+                def reader():
+                    while chunk := b.recv(65536):
+                        received.extend(chunk)
+
+                thread = threading.Thread(target=reader)
+                thread.start()
+                try:
+                    self.assertEqual(self.download(write_function, id(a)), lcurl.CURLE_OK)
+                finally:
+                    a.shutdown(socket.SHUT_WR)
+                    thread.join()
+                    a.close()
+                    b.close()
+                self.assertEqual(bytes(received), b"x" * SIZE)
+
+    def test_write_empty(self):
+        file = io.BytesIO()
+        self.assertEqual(self.download(lcurl.write_view_to_file, id(file), 0), lcurl.CURLE_OK)
+        self.assertEqual(file.getvalue(), b"")
+
+    def upload(self, read_function, stream, size):
+        curl = self.curl
+        received = io.BytesIO()
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_URL, f"{self.server.url}/echo".encode())
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_POST, 1)
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_POSTFIELDSIZE_LARGE, size)
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_READFUNCTION, read_function)
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_READDATA, stream)
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_WRITEFUNCTION, lcurl.write_to_file)
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_WRITEDATA, id(received))
+        self.assertEqual(lcurl.easy_perform(curl), lcurl.CURLE_OK)
+        return received.getvalue()
+
+    def test_read_from_file(self):
+        data = bytes(range(256)) * 4000
+        file = io.BytesIO(data)
+        self.assertEqual(self.upload(lcurl.read_from_file, id(file), len(data)), data)
+
+    def test_read_from_file_without_readinto(self):
+
+        class Reader:
+            def __init__(self, data):
+                self.file = io.BytesIO(data)
+
+            def read(self, size):
+                return self.file.read(size)
+
+        data = bytes(range(256)) * 4000
+        reader = Reader(data)
+        self.assertFalse(hasattr(reader, "readinto"))
+        self.assertEqual(self.upload(lcurl.read_from_file, id(reader), len(data)), data)
+
+    def test_read_from_fd(self):
+        data = bytes(range(256)) * 4000
+        with tempfile.TemporaryFile() as file:
+            file.write(data)
+            file.seek(0)
+            self.assertEqual(self.upload(lcurl.read_from_fd, file.fileno(), len(data)), data)
+
+    def test_mapped_file_reader(self):
+        data = bytes(range(256)) * 4000
+        with tempfile.TemporaryFile() as file:
+            file.write(data)
+            file.flush()
+            with lcurl.MappedFileReader(file.fileno()) as reader:
+                self.assertEqual(len(reader), len(data))
+                self.assertEqual(self.upload(lcurl.read_from_file, id(reader), len(data)),
+                                 data)
+                self.assertEqual(reader.tell(), len(data))
+                reader.seek(-10, os.SEEK_END)
+                self.assertEqual(reader.read(), data[-10:])
+                reader.seek(5)
+                self.assertEqual(reader.read(3), data[5:8])
+
+    def test_mapped_file_reader_empty(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "empty")
+            open(path, "wb").close()
+            with lcurl.MappedFileReader(path) as reader:
+                self.assertEqual(len(reader), 0)
+                self.assertEqual(reader.read(), b"")
+                self.assertEqual(self.upload(lcurl.read_from_file, id(reader), 0), b"")
@@ -0,0 +1,151 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+import io
+import time
+import contextlib
+import ctypes as ct
+
+import libcurl as lcurl
+from ._httpd import HTTPServer, closed_port
+
+
+def address(curl):
+    return ct.cast(curl, ct.c_void_p).value
+
+
+class CompletionTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def setUp(self):
+        self.multi = lcurl.multi_init()
+        self.handles = []
+
+    def tearDown(self):
+        for curl in self.handles:
+            lcurl.multi_remove_handle(self.multi, curl)
+            lcurl.easy_cleanup(curl)
+        lcurl.multi_cleanup(self.multi)
+
+    def easy(self, url, private=None):
+        curl = lcurl.easy_init()
+        self.handles.append(curl)
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_URL, url.encode())
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_WRITEFUNCTION, lcurl.write_skipped)
+        if private is not None:
+            lcurl.easy_setopt(curl, lcurl.CURLOPT_PRIVATE, ct.c_void_p(private))
+        lcurl.multi_add_handle(self.multi, curl)
+        return curl
+
+    def run_all(self):
+        # Runs the transfers to the end without reading their messages.
+        running = ct.c_int(1)
+        deadline = time.monotonic() + 10
+        while running.value and time.monotonic() < deadline:
+            lcurl.multi_perform(self.multi, ct.byref(running))
+            if running.value:
+                lcurl.multi_poll(self.multi, None, 0, 100, None)
+        self.assertEqual(running.value, 0)
+
+    def test_drain(self):
+        curls = [self.easy(f"{self.server.url}/{size}") for size in range(0, 10000, 1000)]
+        self.run_all()
+        done = lcurl.multi_completed(self.multi)
+        self.assertEqual(sorted(address(completion.curl) for completion in done),
+                         sorted(address(curl) for curl in curls))
+        self.assertTrue(all(completion.ok for completion in done))
+        self.assertEqual(lcurl.multi_completed(self.multi), [])
+        # the handles were removed: they can be added again
+        for curl in curls:
+            self.assertEqual(lcurl.multi_add_handle(self.multi, curl), lcurl.CURLM_OK)
+
+    def test_no_remove(self):
+        curl = self.easy(f"{self.server.url}/10")
+        self.run_all()
+        done = lcurl.multi_completed(self.multi, remove=False)
+        self.assertEqual(len(done), 1)
+        self.assertEqual(lcurl.multi_add_handle(self.multi, curl), lcurl.CURLM_ADDED_ALREADY)
+
+    def test_private(self):
+        self.easy(f"{self.server.url}/10", private=1234)
+        self.easy(f"{self.server.url}/20")
+        self.run_all()
+        done = lcurl.multi_completed(self.multi, remove=False)
+        self.assertEqual(sorted(completion.private or 0 for completion in done), [0, 1234])
+        for completion in lcurl.multi_completed(self.multi, private=False):
+            self.assertIsNone(completion.private)
+
+    def test_failure(self):
+        self.easy(f"http://127.0.0.1:{closed_port()}/")
+        self.run_all()
+        completion, = lcurl.multi_completed(self.multi)
+        self.assertFalse(completion.ok)
+        self.assertEqual(completion.result, lcurl.CURLE_COULDNT_CONNECT)
+        self.assertIsInstance(completion.error, str)
+        self.assertIn(f"result={lcurl.CURLE_COULDNT_CONNECT}>", repr(completion))
+
+    def test_as_completed(self):
+        self.easy(f"{self.server.url}/slow/200", private=1)
+        self.easy(f"{self.server.url}/10", private=2)
+        order = []
+        for completion in lcurl.multi_as_completed(self.multi, timeout_ms=100):
+            self.assertTrue(completion.ok)
+            order.append(completion.private)
+            if completion.private == 2:
+                # handles added while iterating are driven as well
+                self.easy(f"{self.server.url}/slow/400", private=3)
+        self.assertEqual(order, [2, 1, 3])
+
+    def test_as_completed_nothing(self):
+        self.assertEqual(list(lcurl.multi_as_completed(self.multi)), [])
+
+    def test_hooks(self):
+        batches = []
+        hook = batches.append
+        lcurl.add_completion_hook(hook)
+        try:
+            self.easy(f"{self.server.url}/10")
+            self.easy(f"{self.server.url}/20")
+            self.run_all()
+            done = lcurl.multi_completed(self.multi)
+            self.assertEqual(lcurl.multi_completed(self.multi), [])
+        finally:
+            lcurl.remove_completion_hook(hook)
+        self.assertEqual(batches, [done])  # not called with empty batches
+        self.easy(f"{self.server.url}/10")
+        self.run_all()
+        lcurl.multi_completed(self.multi)
+        self.assertEqual(len(batches), 1)
+        with self.assertRaises(ValueError):
+            lcurl.remove_completion_hook(hook)
+
+    def test_raising_hook(self):
+        batches = []
+        hook = batches.append
+
+        def failing(completions):
+            raise ValueError("hook failure")
+
+        lcurl.add_completion_hook(failing)
+        lcurl.add_completion_hook(hook)
+        try:
+            curl = self.easy(f"{self.server.url}/10")
+            self.run_all()
+            stderr = io.StringIO()
+            with contextlib.redirect_stderr(stderr):
+                done = lcurl.multi_completed(self.multi)
+        finally:
+            lcurl.remove_completion_hook(failing)
+            lcurl.remove_completion_hook(hook)
+        # the completions are returned and the other hooks are called
+        self.assertEqual([address(completion.curl) for completion in done], [address(curl)])
+        self.assertEqual(batches, [done])
+        self.assertIn("ValueError: hook failure", stderr.getvalue())
@@ -0,0 +1,119 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+import ctypes as ct
+
+import libcurl as lcurl
+from ._httpd import HTTPServer
+
+
+class DispatchTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def setUp(self):
+        self.handles = []
+
+    def tearDown(self):
+        for curl in self.handles:
+            lcurl.callback_release(curl)
+            lcurl.easy_cleanup(curl)
+
+    def easy(self, url):
+        curl = lcurl.easy_init()
+        self.handles.append(curl)
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_URL, url.encode())
+        return curl
+
+    @staticmethod
+    def collector(received):
+        def handler(buffer, size, nitems):
+            received.extend(buffer[:size * nitems])
+            return size * nitems
+        return handler
+
+    def test_register(self):
+        handler = lambda *args: 0  # noqa: E731
+        key = lcurl.callback_register(handler)
+        self.assertNotEqual(key, 0)
+        self.assertIs(lcurl.callback_handler(key), handler)
+        self.assertNotEqual(lcurl.callback_register(handler), key)
+        lcurl.callback_unregister(key)
+        self.assertIsNone(lcurl.callback_handler(key))
+        lcurl.callback_unregister(key)  # no-op
+
+    def test_write(self):
+        curl = self.easy(f"{self.server.url}/100000")
+        received = bytearray()
+        key = lcurl.callback_setopt(curl, lcurl.CURLOPT_WRITEFUNCTION,
+                                    self.collector(received))
+        self.assertIsNotNone(lcurl.callback_handler(key))
+        self.assertEqual(lcurl.easy_perform(curl), lcurl.CURLE_OK)
+        self.assertEqual(bytes(received), b"x" * 100000)
+
+    def test_shared_trampoline(self):
+        # Two handles share dispatch_write() but each reaches its own handler.
+        sizes = (1000, 50000)
+        curls = [self.easy(f"{self.server.url}/{size}") for size in sizes]
+        received = [bytearray() for _ in sizes]
+        multi = lcurl.multi_init()
+        try:
+            for curl, buffer in zip(curls, received):
+                lcurl.callback_setopt(curl, lcurl.CURLOPT_WRITEFUNCTION,
+                                      self.collector(buffer))
+                lcurl.multi_add_handle(multi, curl)
+            done = []
+            while len(done) < len(curls):
+                lcurl.multi_perform(multi, ct.byref(ct.c_int()))
+                done.extend(lcurl.multi_completed(multi))
+                lcurl.multi_poll(multi, None, 0, 100, None)
+            self.assertEqual([completion.result for completion in done],
+                             [lcurl.CURLE_OK] * len(curls))
+        finally:
+            lcurl.multi_cleanup(multi)
+        self.assertEqual([bytes(buffer) for buffer in received],
+                         [b"x" * size for size in sizes])
+
+    def test_xferinfo(self):
+        curl = self.easy(f"{self.server.url}/100000")
+        calls = []
+
+        def xferinfo(dltotal, dlnow, ultotal, ulnow):
+            calls.append(dlnow)
+            return 0
+
+        lcurl.callback_setopt(curl, lcurl.CURLOPT_WRITEFUNCTION, self.collector(bytearray()))
+        lcurl.callback_setopt(curl, lcurl.CURLOPT_XFERINFOFUNCTION, xferinfo)
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_NOPROGRESS, 0)
+        self.assertEqual(lcurl.easy_perform(curl), lcurl.CURLE_OK)
+        self.assertTrue(calls)
+        self.assertEqual(calls[-1], 100000)
+
+    def test_xferinfo_abort(self):
+        curl = self.easy(f"{self.server.url}/100000")
+        lcurl.callback_setopt(curl, lcurl.CURLOPT_WRITEFUNCTION, self.collector(bytearray()))
+        lcurl.callback_setopt(curl, lcurl.CURLOPT_XFERINFOFUNCTION, lambda *args: 1)
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_NOPROGRESS, 0)
+        self.assertEqual(lcurl.easy_perform(curl), lcurl.CURLE_ABORTED_BY_CALLBACK)
+
+    def test_release(self):
+        curl = self.easy(f"{self.server.url}/10")
+        keys = [lcurl.callback_setopt(curl, lcurl.CURLOPT_WRITEFUNCTION,
+                                      self.collector(bytearray())),
+                lcurl.callback_setopt(curl, lcurl.CURLOPT_HEADERFUNCTION,
+                                      self.collector(bytearray()))]
+        lcurl.callback_release(curl)
+        self.assertEqual([lcurl.callback_handler(key) for key in keys], [None, None])
+        lcurl.callback_release(curl)  # no-op
+
+    def test_unsupported_option(self):
+        curl = self.easy(f"{self.server.url}/10")
+        with self.assertRaises(ValueError):
+            lcurl.callback_setopt(curl, lcurl.CURLOPT_URL, lambda: 0)
@@ -0,0 +1,103 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+import time
+from concurrent.futures import as_completed
+
+import libcurl as lcurl
+from ._httpd import HTTPServer, closed_port
+
+
+class MultiEngineTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer()
+        cls.other  = HTTPServer()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+        cls.other.close()
+
+    def test_submit(self):
+        with lcurl.MultiEngine(threads=2) as engine:
+            futures = {engine.submit(f"{server.url}/{size}"): size
+                       for size in range(0, 50000, 1000)
+                       for server in (self.server, self.other)}
+            for future in as_completed(futures, timeout=30):
+                resp = future.result()
+                self.assertEqual(resp.status, 200)
+                self.assertEqual(resp.content, b"x" * futures[future])
+            resp = engine.submit(f"{self.server.url}/echo", "POST", b"data").result(10)
+            self.assertEqual(resp.content, b"data")
+            self.assertEqual(len(engine), 0)
+            self.assertEqual(engine.loads, [0, 0])
+
+    def test_options(self):
+        with lcurl.MultiEngine(threads=1, options={"USERAGENT": "engine"}) as engine:
+            resp = engine.submit(f"{self.server.url}/headers").result(10)
+            self.assertIn(b"User-Agent: engine\n", resp.content)
+            resp = engine.submit(f"{self.server.url}/headers", USERAGENT="other").result(10)
+            self.assertIn(b"User-Agent: other\n", resp.content)
+
+    def test_host_sharding(self):
+        with lcurl.MultiEngine(threads=2) as engine:
+            futures = [engine.submit(f"{self.server.url}/slow/300") for _ in range(3)]
+            # all transfers to one host go to the same shard
+            self.assertEqual(sorted(engine.loads), [0, 3])
+            futures.append(engine.submit(f"{self.other.url}/slow/300"))
+            self.assertEqual(sorted(engine.loads), [1, 3])
+            self.assertEqual(len(engine), 4)
+            for future in futures:
+                self.assertEqual(future.result(10).content, b"slow")
+
+    def test_rebalance(self):
+        with lcurl.MultiEngine(threads=2, rebalance=1) as engine:
+            futures = [engine.submit(f"{self.server.url}/slow/300") for _ in range(4)]
+            # a host moves to the least loaded shard when its shard is overloaded
+            self.assertEqual(engine.loads, [2, 2])
+            for future in futures:
+                self.assertEqual(future.result(10).content, b"slow")
+
+    def test_max_host_connections(self):
+        with lcurl.MultiEngine(threads=1, max_host_connections=1) as engine:
+            start = time.monotonic()
+            futures = [engine.submit(f"{self.server.url}/slow/200") for _ in range(3)]
+            for future in futures:
+                self.assertEqual(future.result(10).content, b"slow")
+            self.assertGreaterEqual(time.monotonic() - start, 0.55)
+
+    def test_errors(self):
+        with lcurl.MultiEngine(threads=1) as engine:
+            resp = engine.submit(f"http://127.0.0.1:{closed_port()}/").result(10)
+            self.assertEqual(resp.code, lcurl.CURLE_COULDNT_CONNECT)
+            future = engine.submit(f"{self.server.url}/10", HTTP_VERSION=999)
+            with self.assertRaises(RuntimeError):
+                future.result(10)
+            # the shard keeps running
+            self.assertEqual(engine.submit(f"{self.server.url}/10").result(10).content,
+                             b"x" * 10)
+        with self.assertRaises(ValueError):
+            lcurl.MultiEngine(threads=0)
+
+    def test_close(self):
+        engine = lcurl.MultiEngine(threads=2)
+        futures = [engine.submit(f"{self.server.url}/slow/200") for _ in range(2)]
+        engine.close()
+        # close() waits for the transfers in flight
+        self.assertTrue(all(future.done() for future in futures))
+        self.assertEqual([future.result().content for future in futures], [b"slow"] * 2)
+        with self.assertRaises(RuntimeError):
+            engine.submit(f"{self.server.url}/10")
+        engine.close()  # idempotent
+
+    def test_close_twice(self):
+        for _ in range(20):
+            with lcurl.MultiEngine(threads=2) as engine:
+                future = engine.submit(f"{self.server.url}/10")
+                engine.close(wait=False)
+                engine.close(wait=False)
+                engine.close()
+            self.assertEqual(future.result().content, b"x" * 10)
@@ -0,0 +1,80 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+import time
+from concurrent.futures import as_completed
+
+import libcurl as lcurl
+from ._httpd import HTTPServer, closed_port
+
+
+class CurlExecutorTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def test_submit(self):
+        with lcurl.CurlExecutor(max_workers=4) as executor:
+            futures = {executor.submit(f"{self.server.url}/{size}"): size
+                       for size in range(0, 20000, 1000)}
+            for future in as_completed(futures):
+                resp = future.result()
+                self.assertEqual(resp.status, 200)
+                self.assertEqual(resp.content, b"x" * futures[future])
+            resp = executor.submit(f"{self.server.url}/echo", "POST", b"data").result()
+            self.assertEqual(resp.content, b"data")
+            self.assertLessEqual(executor.session.pool.size, 4)
+
+    def test_map(self):
+        sizes = [5, 0, 300, 1, 20] * 4
+        with lcurl.CurlExecutor(max_workers=3, options={"USERAGENT": "executor"}) as executor:
+            responses = list(executor.map(f"{self.server.url}/{size}" for size in sizes))
+            self.assertEqual([resp.content for resp in responses],
+                             [b"x" * size for size in sizes])
+            resp = next(executor.map([f"{self.server.url}/headers"], USERAGENT="map"))
+            self.assertIn(b"User-Agent: map\n", resp.content)
+            resp = executor.submit(f"{self.server.url}/headers").result()
+            self.assertIn(b"User-Agent: executor\n", resp.content)
+
+    def test_parallel(self):
+        with lcurl.CurlExecutor(max_workers=4) as executor:
+            start = time.monotonic()
+            futures = [executor.submit(f"{self.server.url}/slow/300") for _ in range(4)]
+            self.assertEqual([future.result().content for future in futures], [b"slow"] * 4)
+            self.assertLess(time.monotonic() - start, 1.0)
+
+    def test_failed_transfer(self):
+        with lcurl.CurlExecutor(max_workers=1) as executor:
+            resp = executor.submit(f"http://127.0.0.1:{closed_port()}/").result()
+            self.assertEqual(resp.code, lcurl.CURLE_COULDNT_CONNECT)
+
+    def test_max_workers(self):
+        with self.assertRaises(ValueError):
+            lcurl.CurlExecutor(max_workers=0)
+        with lcurl.CurlExecutor() as executor:
+            self.assertGreater(executor.max_workers, 0)
+
+    def test_shutdown(self):
+        executor = lcurl.CurlExecutor(max_workers=2)
+        executor.submit(f"{self.server.url}/10").result()
+        executor.shutdown()
+        self.assertIsNone(executor.session.share)
+        executor.shutdown()  # idempotent
+        with self.assertRaises(RuntimeError):
+            executor.submit(f"{self.server.url}/10")
+
+    def test_external_session(self):
+        with lcurl.Session() as session:
+            with lcurl.CurlExecutor(max_workers=2, session=session) as executor:
+                self.assertIs(executor.session, session)
+                self.assertEqual(executor.submit(f"{self.server.url}/3").result().content,
+                                 b"xxx")
+            # not closed by the executor
+            self.assertIsNotNone(session.share)
+            self.assertEqual(session.get(f"{self.server.url}/3").content, b"xxx")
@@ -0,0 +1,73 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+import io
+import ctypes as ct
+
+import libcurl as lcurl
+
+# Expected outputs are those of dump() of curl's docs/examples/debug.c.
+
+
+class HexdumpTestCase(unittest.TestCase):
+
+    def test_hex(self):
+        data = b"HTTP/1.1 200 OK\r\n"
+        self.assertEqual(lcurl.hexdump(data),
+            "0000: 48 54 54 50 2f 31 2e 31 20 32 30 30 20 4f 4b 0d HTTP/1.1 200 OK.\n"
+            "0010: 0a                                              .\n")
+
+    def test_hex_non_printable(self):
+        data = bytes(range(0x1e, 0x22)) + bytes((0x7e, 0x7f, 0x80, 0xff))
+        self.assertEqual(lcurl.hexdump(data),
+            "0000: 1e 1f 20 21 7e 7f 80 ff                         .. !~\x7f..\n")
+
+    def test_hex_rows(self):
+        data = bytes(range(256)) * 300  # more than one formatting block
+        lines = lcurl.hexdump(data).splitlines()
+        self.assertEqual(len(lines), len(data) // 16)
+        self.assertEqual(lines[0x1234],
+            "12340: 40 41 42 43 44 45 46 47 48 49 4a 4b 4c 4d 4e 4f @ABCDEFGHIJKLMNO")
+        self.assertEqual(lines[-1],
+            "12bf0: f0 f1 f2 f3 f4 f5 f6 f7 f8 f9 fa fb fc fd fe ff ................")
+
+    def test_no_hex_breaks_rows_at_crlf(self):
+        data = b"GET / HTTP/1.1\r\nHost: x\r\n\r\n"
+        self.assertEqual(lcurl.hexdump(data, no_hex=True),
+            "0000: GET / HTTP/1.1\n"
+            "0010: Host: x\n"
+            "0019: \n")
+
+    def test_no_hex_wraps_at_64(self):
+        data = b"a" * 64 + b"\r\n" + b"b" * 70 + b"\r\nc"
+        self.assertEqual(lcurl.hexdump(data, no_hex=True),
+            "0000: " + "a" * 64 + "\n"
+            "0042: " + "b" * 64 + "\n"
+            "0082: " + "b" * 6 + "\n"
+            "008a: c\n")
+
+    def test_no_hex_lone_cr_lf(self):
+        data = b"a\rb\nc\r"
+        self.assertEqual(lcurl.hexdump(data, no_hex=True), "0000: a.b.c.\n")
+
+    def test_empty(self):
+        self.assertEqual(lcurl.hexdump(b""), "")
+        self.assertEqual(lcurl.hexdump(b"\r\n", no_hex=True), "0000: \n")
+
+    def test_debug_dump(self):
+        data = b"Host: x\r\n"
+        buffer = (ct.c_ubyte * len(data)).from_buffer_copy(data)
+        for pointer in (ct.cast(buffer, ct.POINTER(ct.c_ubyte)), ct.addressof(buffer)):
+            stream = io.StringIO()
+            lcurl.debug_dump(stream, "=> Send header", pointer, len(data), True)
+            self.assertEqual(stream.getvalue(),
+                             "=> Send header, 9 bytes (0x9)\n"
+                             "0000: Host: x\n")
+        stream = io.StringIO()
+        lcurl.debug_dump(stream, "<= Recv data", memoryview(data), num=3)
+        self.assertEqual(stream.getvalue(),
+                         "3 <= Recv data, 9 bytes (0x9)\n"
+                         "0000: 48 6f 73 74 3a 20 78 0d 0a                      Host: x..\n")
+        with self.assertRaises(ValueError):
+            lcurl.hexdump(ct.addressof(buffer))
@@ -0,0 +1,227 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+import random
+import io
+import ctypes as ct
+
+import libcurl as lcurl
+from ._httpd import HTTPServer
+
+
+def histogram(values, precision=5):
+    hist = lcurl.LatencyHistogram(precision)
+    for value in values:
+        hist.record(value)
+    return hist
+
+
+class LatencyHistogramTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.random = random.Random(1234)
+
+    def values(self, n=5000, top=3_600_000_000):
+        return [int(self.random.lognormvariate(8, 3)) % top for _ in range(n)]
+
+    def test_linear_range_is_exact(self):
+        hist = histogram(range(32))
+        self.assertEqual([hist.percentile(q) for q in (0, 25, 50, 100)], [0, 7, 15, 31])
+        self.assertEqual(list(hist.buckets()), [(v, v, 1) for v in range(32)])
+
+    def test_buckets(self):
+        # the buckets are contiguous and each one is within the error bound
+        for precision in (2, 3, 5, 8):
+            hist = lcurl.LatencyHistogram(precision)
+            bound = 2 ** -(precision - 1)
+            expected_low = 0
+            for index in range(2000):
+                low, high = hist._bucket_bounds(index)
+                self.assertEqual(low, expected_low)
+                self.assertLessEqual(high - low, low * bound)
+                self.assertEqual((hist._index(low), hist._index(high)), (index, index))
+                expected_low = high + 1
+
+    def test_error_bound(self):
+        values = self.values()
+        exact = sorted(values)
+        for precision in (2, 3, 5, 8):
+            hist = histogram(values, precision)
+            bound = 2 ** -(precision - 1)
+            for q in (0, 1, 10, 50, 90, 99, 99.9, 100):
+                with self.subTest(precision=precision, q=q):
+                    rank = max(1, -(-len(exact) * q // 100))
+                    value = exact[int(rank) - 1]
+                    result = hist.percentile(q)
+                    self.assertGreaterEqual(result, value)
+                    self.assertLessEqual(result, value + value * bound)
+            self.assertEqual(hist.percentile(100), max(values))
+            self.assertEqual((hist.count, hist.sum, hist.min, hist.max),
+                             (len(values), sum(values), min(values), max(values)))
+
+    def test_record(self):
+        hist = lcurl.LatencyHistogram()
+        self.assertEqual(len(hist), 0)
+        self.assertIsNone(hist.percentile(50))
+        hist.record(-5)
+        hist.record(1000, count=3)
+        self.assertEqual((len(hist), hist.sum, hist.min, hist.max), (4, 3000, 0, 1000))
+        self.assertEqual(hist.percentile(25), 0)
+        self.assertEqual(hist.percentile(50), 1000)
+        self.assertIn("count=4", repr(hist))
+        for precision in (1, 17):
+            with self.assertRaises(ValueError):
+                lcurl.LatencyHistogram(precision)
+
+    def test_cumulative(self):
+        values = self.values()
+        hist = histogram(values)
+        bounds = [(1 << bits) - 1 for bits in range(33)]
+        self.assertEqual(hist.cumulative(bounds),
+                         [sum(1 for value in values if value <= bound) for bound in bounds])
+        self.assertEqual(lcurl.LatencyHistogram().cumulative([0, 10]), [0, 0])
+
+    def test_merge(self):
+        values = self.values()
+        merged = histogram(values[:1000])
+        merged.merge(histogram(values[1000:]))
+        merged.merge(lcurl.LatencyHistogram())
+        self.assertEqual(merged.to_bytes(), histogram(values).to_bytes())
+        empty = lcurl.LatencyHistogram()
+        empty.merge(histogram([7]))
+        self.assertEqual((empty.min, empty.max, empty.count), (7, 7, 1))
+        with self.assertRaises(ValueError):
+            merged.merge(lcurl.LatencyHistogram(6))
+
+    def test_bytes(self):
+        hist = histogram(self.values())
+        data = hist.to_bytes()
+        copy = lcurl.LatencyHistogram.from_bytes(data)
+        self.assertEqual((copy.precision, copy.count, copy.sum, copy.min, copy.max),
+                         (hist.precision, hist.count, hist.sum, hist.min, hist.max))
+        self.assertEqual(list(copy.buckets()), list(hist.buckets()))
+        self.assertEqual(copy.to_bytes(), data)
+        self.assertEqual(lcurl.LatencyHistogram.from_bytes(memoryview(data)).to_bytes(), data)
+        empty = lcurl.LatencyHistogram.from_bytes(lcurl.LatencyHistogram(3).to_bytes())
+        self.assertEqual((empty.precision, empty.count, empty.min, empty.max), (3, 0, None, None))
+
+
+class LatencyRecorderTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def setUp(self):
+        self.curl = lcurl.easy_init()
+        lcurl.easy_setopt(self.curl, lcurl.CURLOPT_WRITEFUNCTION, lcurl.write_skipped)
+
+    def tearDown(self):
+        lcurl.easy_cleanup(self.curl)
+
+    def perform(self, path="10"):
+        lcurl.easy_setopt(self.curl, lcurl.CURLOPT_URL, f"{self.server.url}/{path}".encode())
+        self.assertEqual(lcurl.easy_perform(self.curl), lcurl.CURLE_OK)
+
+    def test_record(self):
+        recorder = lcurl.LatencyRecorder()
+        for _ in range(3):
+            self.perform()
+            recorder.record(self.curl)
+        recorder.record(self.curl, host="other", protocol="https")
+        total = recorder.histogram("127.0.0.1", "http", "total")
+        self.assertEqual(total.count, 3)
+        self.assertGreater(total.max, 0)
+        self.assertEqual(recorder.histogram("other", "https", "total").count, 1)
+        self.assertIsNone(recorder.histogram("127.0.0.1", "https", "total"))
+        self.assertEqual({phase for _, _, phase in recorder.histograms()},
+                         set(lcurl.MetricsStore.phases))
+        recorder.clear()
+        self.assertEqual(recorder.histograms(), {})
+
+    def test_attach(self):
+        recorder = lcurl.LatencyRecorder(phases=("total",))
+        recorder.attach()
+        multi = lcurl.multi_init()
+        try:
+            lcurl.easy_setopt(self.curl, lcurl.CURLOPT_URL, f"{self.server.url}/10".encode())
+            lcurl.multi_add_handle(multi, self.curl)
+            self.assertEqual(len(list(lcurl.multi_as_completed(multi))), 1)
+        finally:
+            recorder.detach()
+            lcurl.multi_cleanup(multi)
+        self.assertEqual(list(recorder.histograms()), [("127.0.0.1", "http", "total")])
+        recorder.detach()  # idempotent
+
+    def test_bytes_and_merge(self):
+        recorder = lcurl.LatencyRecorder()
+        self.perform()
+        recorder.record(self.curl)
+        copy = lcurl.LatencyRecorder.from_bytes(recorder.to_bytes())
+        self.assertEqual(copy.precision, recorder.precision)
+        self.assertEqual({key: hist.to_bytes() for key, hist in copy.histograms().items()},
+                         {key: hist.to_bytes() for key, hist in recorder.histograms().items()})
+        copy.merge(recorder)
+        self.assertEqual(copy.histogram("127.0.0.1", "http", "total").count, 2)
+        self.assertEqual(lcurl.LatencyRecorder.from_bytes(b"").histograms(), {})
+
+    def test_bytes_precision(self):
+        recorder = lcurl.LatencyRecorder(precision=9)
+        self.perform()
+        recorder.record(self.curl)
+        copy = lcurl.LatencyRecorder.from_bytes(recorder.to_bytes())
+        self.assertEqual(copy.precision, 9)
+        copy.record(self.curl, host="other")
+        self.assertEqual(copy.histogram("other", "http", "total").precision, 9)
+
+    def test_openmetrics(self):
+        recorder = lcurl.LatencyRecorder(phases=("total",))
+        self.perform()
+        recorder.record(self.curl, host='a"b', protocol="http")
+        text = recorder.openmetrics()
+        lines = text.splitlines()
+        self.assertEqual(lines[0], "# TYPE libcurl_transfer_phase_seconds histogram")
+        self.assertEqual(lines[-1], "# EOF")
+        labels = 'host="a\\"b",protocol="http",phase="total"'
+        self.assertIn(f'libcurl_transfer_phase_seconds_bucket{{{labels},le="+Inf"}} 1', lines)
+        self.assertIn(f"libcurl_transfer_phase_seconds_count{{{labels}}} 1", lines)
+        self.assertIn(f'libcurl_transfer_phase_seconds_bucket{{{labels},le="0.0"}} 0', lines)
+
+    def test_openmetrics_precision(self):
+        recorder = lcurl.LatencyRecorder(phases=("total",))
+        self.perform()
+        recorder.record(self.curl, host="a", protocol="http")
+        histogram = recorder.histogram("a", "http", "total")
+        histogram.record(123456789)
+        lines = recorder.openmetrics().splitlines()
+        labels = 'host="a",protocol="http",phase="total"'
+        self.assertIn(f"libcurl_transfer_phase_seconds_sum{{{labels}}} "
+                      f"{histogram.sum / 1e6!r}", lines)
+        self.assertIn(f'libcurl_transfer_phase_seconds_bucket{{{labels},le="134.217727"}} 2',
+                      lines)
+
+    def test_serve_openmetrics(self):
+        recorder = lcurl.LatencyRecorder()
+        server = lcurl.serve_openmetrics(recorder)
+        try:
+            port = server.server_address[1]
+            for path, status in (("metrics", 200), ("other", 404)):
+                body = io.BytesIO()
+                lcurl.easy_setopt(self.curl, lcurl.CURLOPT_URL,
+                                  f"http://127.0.0.1:{port}/{path}".encode())
+                lcurl.easy_setopt(self.curl, lcurl.CURLOPT_WRITEFUNCTION, lcurl.write_to_file)
+                lcurl.easy_setopt(self.curl, lcurl.CURLOPT_WRITEDATA, id(body))
+                self.assertEqual(lcurl.easy_perform(self.curl), lcurl.CURLE_OK)
+                code = ct.c_long()
+                lcurl.easy_getinfo(self.curl, lcurl.CURLINFO_RESPONSE_CODE, ct.byref(code))
+                self.assertEqual(code.value, status)
+                if status == 200:
+                    self.assertEqual(body.getvalue().decode(), recorder.openmetrics())
+        finally:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,62 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+import sys
+import subprocess
+import textwrap
+
+import libcurl as lcurl
+
+
+class LazyImportTestCase(unittest.TestCase):
+
+    def run_python(self, code):
+        # In a fresh interpreter: nothing imported lazily yet.
+        result = subprocess.run([sys.executable, "-c", textwrap.dedent(code)],
+                                capture_output=True, text=True, timeout=60)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return result.stdout.split()
+
+    def test_lazy_areas_not_imported(self):
+        loaded = self.run_python("""
+            import sys
+            import libcurl as lcurl
+            curl = lcurl.easy_init()
+            lcurl.easy_setopt(curl, lcurl.CURLOPT_URL, b"http://localhost/")
+            lcurl.easy_setopt(curl, lcurl.CURLOPT_VERBOSE, 0)
+            lcurl.easy_cleanup(curl)
+            print(*(name for name in ("_urlapi", "_header", "_websockets", "_typecheck",
+                                      "_session", "_scheduler")
+                    if "libcurl." + name in sys.modules))
+            """)
+        self.assertEqual(loaded, [])
+
+    def test_lazy_names_resolved(self):
+        self.assertIs(lcurl.url_get, sys.modules["libcurl._urlapi"].url_get)
+        self.assertIs(lcurl.easy_header, sys.modules["libcurl._header"].easy_header)
+        self.assertTrue(callable(lcurl.ws_send))
+        self.assertTrue(callable(lcurl.check_string_option))
+        self.assertIsInstance(lcurl.CURLUPART_HOST, int)
+        self.assertIsInstance(lcurl.CURLH_HEADER, int)
+        self.assertIsInstance(lcurl.CURLWS_TEXT, int)
+        for name in ("url_get", "CURLH_HEADER", "Session", "hexdump"):
+            self.assertIn(name, dir(lcurl))
+
+    def test_star_import(self):
+        names = self.run_python("""
+            from libcurl import *
+            print(*sorted(name for name in globals() if not name.startswith("_")))
+            """)
+        for name in ("easy_init", "CURLOPT_URL", "url", "url_get", "CURLU_DEFAULT_PORT",
+                     "CURLUPART_HOST", "header", "easy_header", "CURLH_HEADER",
+                     "ws_send", "CURLWS_TEXT", "check_string_option",
+                     "Session", "Scheduler", "Tracer", "hexdump"):
+            self.assertIn(name, names)
+        self.assertEqual([name for name in names if name.startswith("_")], [])
+
+    def test_internals_not_forwarded(self):
+        for name in ("_c_buffer", "_lazy_modules", "_lazy_module", "_setopt_table",
+                     "no_such_name"):
+            with self.subTest(name=name):
+                self.assertFalse(hasattr(lcurl, name))
@@ -0,0 +1,176 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+from unittest import mock
+import threading
+import ctypes as ct
+
+import libcurl as lcurl
+from ._httpd import HTTPServer
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def metrics(total, namelookup=0, connect=0, host_offset=0):
+    return lcurl.Metrics(namelookup_time=namelookup, connect_time=connect,
+                         pretransfer_time=connect, starttransfer_time=connect + host_offset,
+                         total_time=total)
+
+
+class GetMetricsTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def setUp(self):
+        self.curl = lcurl.easy_init()
+        lcurl.easy_setopt(self.curl, lcurl.CURLOPT_WRITEFUNCTION, lcurl.write_skipped)
+
+    def tearDown(self):
+        lcurl.easy_cleanup(self.curl)
+
+    def perform(self, path, curl=None):
+        curl = curl or self.curl
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_URL, f"{self.server.url}/{path}".encode())
+        self.assertEqual(lcurl.easy_perform(curl), lcurl.CURLE_OK)
+        return lcurl.get_metrics(curl)
+
+    def test_transfer(self):
+        m = self.perform("10000")
+        self.assertEqual(m.response_code, 200)
+        self.assertEqual(m.size_download, 10000)
+        self.assertEqual(m.size_upload, 0)
+        self.assertEqual((m.num_connects, m.redirect_count), (1, 0))
+        self.assertGreaterEqual(m.conn_id, 0)
+        self.assertGreater(m.header_size, 0)
+        self.assertGreater(m.request_size, 0)
+        self.assertGreater(m.total_time, 0)
+        self.assertTrue(m.namelookup_time <= m.connect_time <= m.pretransfer_time
+                        <= m.starttransfer_time <= m.total_time)
+        # the same values as read one by one
+        for name, info, ctype in (("size_download", lcurl.CURLINFO_SIZE_DOWNLOAD_T, lcurl.off_t),
+                                  ("total_time", lcurl.CURLINFO_TOTAL_TIME_T, lcurl.off_t),
+                                  ("header_size", lcurl.CURLINFO_HEADER_SIZE, ct.c_long)):
+            value = ctype()
+            lcurl.easy_getinfo(self.curl, info, ct.byref(value))
+            self.assertEqual(getattr(m, name), value.value, name)
+
+    def test_connection_reuse(self):
+        first = self.perform("10")
+        second = self.perform("status/404")
+        self.assertEqual(second.response_code, 404)
+        self.assertEqual(second.size_download, 0)
+        self.assertEqual(second.num_connects, 0)
+        self.assertEqual(second.conn_id, first.conn_id)
+
+    def test_redirect(self):
+        lcurl.easy_setopt(self.curl, lcurl.CURLOPT_FOLLOWLOCATION, 1)
+        m = self.perform("redirect/100")
+        self.assertEqual((m.response_code, m.redirect_count), (200, 1))
+        self.assertEqual(m.size_download, 100)
+        self.assertGreater(m.redirect_time, 0)
+
+    def test_no_transfer(self):
+        m = lcurl.get_metrics(self.curl)
+        self.assertEqual(m.response_code, 0)
+        self.assertEqual(m.size_download, 0)
+        self.assertEqual(m.conn_id, -1)
+
+    def test_threads(self):
+        results = []
+
+        def worker(size):
+            curl = lcurl.easy_init()
+            try:
+                lcurl.easy_setopt(curl, lcurl.CURLOPT_WRITEFUNCTION, lcurl.write_skipped)
+                for _ in range(20):
+                    results.append((size, self.perform(size, curl).size_download))
+            finally:
+                lcurl.easy_cleanup(curl)
+
+        threads = [threading.Thread(target=worker, args=(size,)) for size in range(1, 5)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        self.assertEqual(len(results), 80)
+        for size, size_download in results:
+            self.assertEqual(size_download, size)
+
+    def test_record(self):
+        m = self.perform("100")
+        store = lcurl.MetricsStore()
+        store.record(self.curl, host="local")
+        self.assertEqual(len(store), 1)
+        self.assertEqual(store.phase("total_time"), [m.total_time])
+        self.assertEqual(store.phase("size_download", host="local"), [100])
+        self.assertEqual(store.phase("result"), [lcurl.CURLE_OK])
+
+    def test_metrics_record(self):
+        m = lcurl.Metrics(total_time=5, response_code=200)
+        self.assertEqual(m.asdict()["total_time"], 5)
+        self.assertEqual(len(m.astuple()), len(lcurl.Metrics._fields))
+        self.assertEqual(m, lcurl.Metrics(*m.astuple()))
+        self.assertNotEqual(m, lcurl.Metrics())
+        self.assertIn("response_code=200", repr(m))
+
+
+class MetricsStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.store = lcurl.MetricsStore()
+        for value in range(1, 102):  # total 1..101, connect 0..100
+            self.store.append(metrics(value, connect=value - 1),
+                              host="a" if value % 2 else "b")
+
+    def check_percentiles(self):
+        store = self.store
+        self.assertEqual(store.percentiles("total", (0, 50, 95, 99, 100)),
+                         {0: 1, 50: 51, 95: 96, 99: 100, 100: 101})
+        # interpolated between neighbours
+        self.assertAlmostEqual(store.percentiles("total", (12.5,))[12.5], 13.5)
+        # phase: total - starttransfer = 1 for every transfer
+        self.assertEqual(store.percentiles("transfer", (50, 99)), {50: 1, 99: 1})
+        # odd totals (1, 3, ..., 101) are host "a"
+        self.assertEqual(store.percentiles("total", (0, 50, 100), host="a"),
+                         {0: 1, 50: 51, 100: 101})
+        self.assertEqual(store.percentiles("total", (0, 100), host="b"), {0: 2, 100: 100})
+        self.assertEqual(store.percentiles("total", (50,), host="c"), {50: None})
+        self.assertEqual(set(store.summary(by_host=True)), {"a", "b"})
+        self.assertEqual(store.summary(q=(50,))["total"], {50: 51})
+
+    def test_percentiles(self):
+        with mock.patch("libcurl._metrics._numpy", return_value=None):
+            self.check_percentiles()
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_percentiles_numpy(self):
+        self.check_percentiles()
+        arrays = self.store.to_numpy()
+        self.assertEqual(list(arrays["total_time"]), list(range(1, 102)))
+
+    def test_empty(self):
+        store = lcurl.MetricsStore()
+        self.assertEqual(len(store), 0)
+        self.assertEqual(store.percentiles("total", (50, 99)), {50: None, 99: None})
+
+    def test_clear(self):
+        store = self.store
+        self.assertEqual(len(store), 101)
+        self.assertEqual(store.hosts, ["a", "b"])
+        store.clear()
+        self.assertEqual(len(store), 0)
+        self.assertEqual(store.hosts, [])
+        self.assertEqual(store.summary(by_host=True), {})
+        store.append(metrics(7), host="c")
+        self.assertEqual(store.hosts, ["c"])
+        self.assertEqual(store.host_id("c"), 0)
+        self.assertEqual(store.phase("total", host="c"), [7])
+        self.assertEqual(store.phase("total", host="a"), [])
@@ -0,0 +1,76 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+import io
+import os
+import tempfile
+
+import libcurl as lcurl
+from ._httpd import HTTPServer
+
+SIZE = 1_000_000
+
+
+class NativeFileTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def setUp(self):
+        self.curl = lcurl.easy_init()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "data.bin")
+
+    def tearDown(self):
+        lcurl.easy_cleanup(self.curl)
+        self.tmpdir.cleanup()
+
+    def test_download_to_path(self):
+        curl = self.curl
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_URL, f"{self.server.url}/{SIZE}".encode())
+        with lcurl.NativeFile(self.path, "wb") as nfile:
+            self.assertFalse(nfile.readable)
+            self.assertEqual(nfile.setopt(curl), lcurl.CURLE_OK)
+            self.assertEqual(lcurl.easy_perform(curl), lcurl.CURLE_OK)
+        self.assertIsNone(nfile.fp)
+        with open(self.path, "rb") as file:
+            self.assertEqual(file.read(), b"x" * SIZE)
+
+    def test_download_to_fd(self):
+        curl = self.curl
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_URL, f"{self.server.url}/1000".encode())
+        with open(self.path, "wb") as file:
+            with lcurl.NativeFile(file.fileno(), "wb") as nfile:
+                nfile.setopt(curl)
+                self.assertEqual(lcurl.easy_perform(curl), lcurl.CURLE_OK)
+            # the caller's descriptor is still open
+            os.fstat(file.fileno())
+        with open(self.path, "rb") as file:
+            self.assertEqual(file.read(), b"x" * 1000)
+
+    def test_upload_from_path(self):
+        data = bytes(range(256)) * 1000
+        with open(self.path, "wb") as file:
+            file.write(data)
+        curl = self.curl
+        received = io.BytesIO()
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_URL, f"{self.server.url}/echo".encode())
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_POST, 1)
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_POSTFIELDSIZE_LARGE, len(data))
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_WRITEFUNCTION, lcurl.write_to_file)
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_WRITEDATA, id(received))
+        with lcurl.NativeFile(self.path, "rb") as nfile:
+            self.assertTrue(nfile.readable)
+            self.assertEqual(nfile.setopt(curl), lcurl.CURLE_OK)
+            self.assertEqual(lcurl.easy_perform(curl), lcurl.CURLE_OK)
+        self.assertEqual(received.getvalue(), data)
+
+    def test_open_error(self):
+        with self.assertRaises(OSError):
+            lcurl.NativeFile(os.path.join(self.tmpdir.name, "missing", "file"), "rb")
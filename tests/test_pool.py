@@ -0,0 +1,141 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+import io
+import time
+import threading
+import ctypes as ct
+
+import libcurl as lcurl
+from ._httpd import HTTPServer
+
+
+def address(curl):
+    return ct.cast(curl, ct.c_void_p).value
+
+
+class EasyPoolTestCase(unittest.TestCase):
+
+    def test_reuse(self):
+        with lcurl.EasyPool() as pool:
+            first = pool.acquire()
+            second = pool.acquire()
+            self.assertEqual((pool.size, len(pool)), (2, 0))
+            pool.release(first)
+            pool.release(second)
+            self.assertEqual((pool.size, len(pool)), (2, 2))
+            # most recently used first
+            with pool.handle() as curl:
+                self.assertEqual(address(curl), address(second))
+                self.assertEqual(len(pool), 1)
+            self.assertEqual((pool.size, len(pool)), (2, 2))
+
+    def test_release_resets(self):
+        with lcurl.EasyPool() as pool:
+            with pool.handle() as curl:
+                lcurl.easy_setopt(curl, lcurl.CURLOPT_URL, b"http://127.0.0.1:1/")
+            with pool.handle() as curl:
+                # the URL was reset
+                self.assertEqual(lcurl.easy_perform(curl), lcurl.CURLE_URL_MALFORMAT)
+
+    def test_maxsize(self):
+        with lcurl.EasyPool(maxsize=2) as pool:
+            handles = [pool.acquire(), pool.acquire()]
+            start = time.monotonic()
+            with self.assertRaises(TimeoutError):
+                pool.acquire(timeout=0.1)
+            self.assertGreaterEqual(time.monotonic() - start, 0.09)
+            self.assertEqual(pool.size, 2)
+            timer = threading.Timer(0.1, pool.release, (handles[0],))
+            timer.start()
+            curl = pool.acquire(timeout=5)
+            timer.join()
+            self.assertEqual(address(curl), address(handles[0]))
+            # a discarded handle makes room for a new one
+            pool.discard(handles[1])
+            self.assertEqual(pool.size, 1)
+            other = pool.acquire(timeout=0)
+            self.assertEqual(pool.size, 2)
+            pool.release(curl)
+            pool.release(other)
+
+    def test_idle_timeout(self):
+        with lcurl.EasyPool(idle_timeout=0.05) as pool:
+            handles = [pool.acquire(), pool.acquire()]
+            for curl in handles:
+                pool.release(curl)
+            self.assertEqual((pool.size, len(pool)), (2, 2))
+            time.sleep(0.1)
+            curl = pool.acquire()  # both idle handles were cleaned up
+            self.assertEqual((pool.size, len(pool)), (1, 0))
+            pool.release(curl)
+
+    def test_no_idle_timeout(self):
+        with lcurl.EasyPool(idle_timeout=None) as pool:
+            handles = [pool.acquire(), pool.acquire()]
+            for curl in handles:
+                pool.release(curl)
+            curl = pool.acquire()  # idle handles are never cleaned up
+            self.assertEqual((pool.size, len(pool)), (2, 1))
+            pool.release(curl)
+            self.assertEqual((pool.size, len(pool)), (2, 2))
+
+    def test_template(self):
+        with HTTPServer() as server, \
+             lcurl.OptionTemplate({lcurl.CURLOPT_URL: f"{server.url}/100",
+                                   lcurl.CURLOPT_WRITEFUNCTION: lcurl.write_skipped}) as tmpl, \
+             lcurl.EasyPool(template=tmpl) as pool:
+            for _ in range(2):
+                with pool.handle() as curl:
+                    self.assertEqual(lcurl.easy_perform(curl), lcurl.CURLE_OK)
+            self.assertEqual(pool.size, 1)
+
+    def test_template_failure(self):
+        with lcurl.OptionTemplate({lcurl.CURLOPT_HTTP_VERSION: 999}) as tmpl, \
+             lcurl.EasyPool(template=tmpl) as pool:
+            with self.assertRaises(RuntimeError):
+                pool.acquire()
+            self.assertEqual(pool.size, 0)
+
+    def test_close(self):
+        pool = lcurl.EasyPool(maxsize=1)
+        curl = pool.acquire()
+        errors = []
+
+        def waiter():
+            try:
+                pool.acquire(timeout=5)
+            except RuntimeError as exc:
+                errors.append(exc)
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        time.sleep(0.05)
+        pool.close()
+        thread.join()
+        self.assertEqual(len(errors), 1)
+        with self.assertRaises(RuntimeError):
+            pool.acquire()
+        self.assertEqual(pool.size, 1)
+        pool.release(curl)  # cleaned up
+        self.assertEqual((pool.size, len(pool)), (0, 0))
+
+    def test_threads(self):
+        with HTTPServer() as server, lcurl.EasyPool(maxsize=3) as pool:
+            results = []
+
+            def worker():
+                for _ in range(5):
+                    file = io.BytesIO()
+                    with pool.handle(timeout=10) as curl:
+                        lcurl.easy_setopt(curl, lcurl.CURLOPT_URL, f"{server.url}/1000".encode())
+                        lcurl.easy_setopt(curl, lcurl.CURLOPT_WRITEFUNCTION, lcurl.write_to_file)
+                        lcurl.easy_setopt(curl, lcurl.CURLOPT_WRITEDATA, id(file))
+                        results.append((lcurl.easy_perform(curl), len(file.getvalue())))
+
+            threads = [threading.Thread(target=worker) for _ in range(6)]
+            for thread in threads: thread.start()
+            for thread in threads: thread.join()
+            self.assertEqual(results, [(lcurl.CURLE_OK, 1000)] * 30)
+            self.assertLessEqual(pool.size, 3)
@@ -0,0 +1,321 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+from unittest import mock
+import time
+
+import libcurl as lcurl
+from ._httpd import HTTPServer
+
+
+class FixedController:
+    """A controller whose limit is set by the test."""
+
+    def __init__(self, limit):
+        self.limit = limit
+
+    def update(self, latency, nbytes, overloaded):
+        return self.limit
+
+
+class Clock:
+    """A perf_counter() advanced by the test."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+
+class AIMDControllerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch("libcurl._scheduler.time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def round(self, controller, latency=0.125, nbytes=1000, overloaded=False, seconds=1.0):
+        # Completes a round of controller.limit transfers in seconds (not
+        # after a decrease, when the round spans the previous limit).
+        count = controller.limit
+        for i in range(count):
+            if i == count - 1:
+                self.clock.now += seconds
+            limit = controller.update(latency, nbytes, overloaded)
+        return limit
+
+    def test_limits(self):
+        self.assertEqual(lcurl.AIMDController(initial=0, minimum=2).limit, 2)
+        self.assertEqual(lcurl.AIMDController(initial=500, maximum=100).limit, 100)
+        for kwargs in ({"minimum": 0}, {"minimum": 5, "maximum": 4},
+                       {"decrease": 0.0}, {"decrease": 1.0}):
+            with self.subTest(**kwargs), self.assertRaises(ValueError):
+                lcurl.AIMDController(**kwargs)
+
+    def test_additive_increase(self):
+        controller = lcurl.AIMDController(initial=4, maximum=7)
+        limits = [self.round(controller) for _ in range(5)]
+        # more transfers per round: more throughput, so the limit grows by one
+        self.assertEqual(limits, [5, 6, 7, 7, 7])
+        self.assertEqual(controller.base_latency, 0.125)
+        self.assertEqual(controller.rate, 7.0)
+        self.assertEqual(controller.throughput, 7000.0)
+
+    def test_no_increase_without_gain(self):
+        controller = lcurl.AIMDController(initial=4)
+        self.assertEqual(self.round(controller, seconds=1.0), 5)
+        # 5 transfers in 1.25 seconds: no more than 4 in 1 second
+        self.assertEqual(self.round(controller, seconds=1.25), 5)
+
+    def test_update_within_round(self):
+        controller = lcurl.AIMDController(initial=4)
+        for _ in range(3):
+            self.assertEqual(controller.update(0.1, 1000), 4)
+        self.clock.now += 1
+        self.assertEqual(controller.update(0.1, 1000), 5)
+
+    def test_decrease_on_overload(self):
+        controller = lcurl.AIMDController(initial=16, minimum=3)
+        controller.update(0.1, 1000, overloaded=True)  # one overloaded transfer
+        for _ in range(15):
+            limit = controller.update(0.1, 1000)
+        self.assertEqual(limit, 8)
+        # the next round spans the 16 transfers started under the previous limit
+        for _ in range(15):
+            controller.update(0.1, 1000, overloaded=True)
+        self.assertEqual(controller.limit, 8)
+        self.assertEqual(controller.update(0.1, 1000, overloaded=True), 4)
+        for _ in range(8):
+            limit = controller.update(0.1, 1000, overloaded=True)
+        self.assertEqual(limit, 3)  # the minimum
+        for _ in range(4):
+            limit = controller.update(0.1, 1000, overloaded=True)
+        self.assertEqual(limit, 3)
+
+    def test_decrease_on_latency(self):
+        controller = lcurl.AIMDController(initial=10, tolerance=2.0, drift=0.0)
+        self.assertEqual(self.round(controller, latency=0.125), 11)
+        # up to tolerance times the lowest latency is fine
+        self.assertEqual(self.round(controller, latency=0.25, seconds=0.5), 12)
+        self.assertEqual(self.round(controller, latency=0.375), 6)
+        self.assertEqual(controller.base_latency, 0.125)
+
+    def test_drift(self):
+        controller = lcurl.AIMDController(initial=10, tolerance=100.0, drift=0.5)
+        self.round(controller, latency=0.125)
+        self.round(controller, latency=1.0)
+        self.assertEqual(controller.base_latency, 0.1875)
+        self.round(controller, latency=1.0)
+        self.assertEqual(controller.base_latency, 0.28125)
+        self.round(controller, latency=0.25)
+        self.assertEqual(controller.base_latency, 0.25)
+
+
+class SchedulerTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def setUp(self):
+        self.handles = []
+
+    def tearDown(self):
+        for curl in self.handles:
+            lcurl.easy_cleanup(curl)
+
+    def easy(self):
+        curl = lcurl.easy_init()
+        self.handles.append(curl)
+        lcurl.easy_setopt(curl, lcurl.CURLOPT_WRITEFUNCTION, self.discard)
+        return curl
+
+    @staticmethod
+    @lcurl.write_callback
+    def discard(buffer, size, nitems, stream):
+        return size * nitems
+
+    def test_priority_order(self):
+        with lcurl.Scheduler(controller=FixedController(1)) as scheduler:
+            labels = {}
+            for label, priority in (("c1", 2), ("a1", 0), ("b1", 1), ("c2", 2),
+                                    ("a2", 0), ("b2", 1)):
+                curl = self.easy()
+                labels[curl] = label
+                scheduler.add(curl, priority, f"{self.server.url}/10")
+            self.assertEqual((len(scheduler), scheduler.pending), (6, 6))
+            order = []
+            for completion in scheduler.perform():
+                self.assertTrue(completion.ok)
+                order.append(labels[completion.curl])
+                self.assertLessEqual(scheduler.running, 1)
+            self.assertEqual(order, ["a1", "a2", "b1", "b2", "c1", "c2"])
+            self.assertEqual(len(scheduler), 0)
+
+    def test_priority_added_while_running(self):
+        with lcurl.Scheduler(controller=FixedController(1)) as scheduler:
+            first, late, urgent = self.easy(), self.easy(), self.easy()
+            scheduler.add(first, 5, f"{self.server.url}/10")
+            scheduler.add(late, 5, f"{self.server.url}/10")
+            order = []
+            for completion in scheduler.perform():
+                order.append(completion.curl)
+                if completion.curl == first:
+                    scheduler.add(urgent, 0, f"{self.server.url}/10")
+            self.assertEqual(order, [first, urgent, late])
+
+    def test_limit(self):
+        controller = FixedController(3)
+        with lcurl.Scheduler(controller=controller) as scheduler:
+            for _ in range(10):
+                scheduler.add(self.easy(), url=f"{self.server.url}/slow/50")
+            running = []
+            for completion in scheduler.perform():
+                running.append(scheduler.running)
+                self.assertLessEqual(scheduler.running, 3)
+                if len(running) == 5:
+                    controller.limit = 1
+            self.assertEqual(len(running), 10)
+            self.assertLessEqual(max(running[5:]), 1)
+
+    def run_hosts(self, scheduler, hosts, path="10"):
+        # Queues a transfer per item of hosts; returns the hosts in the order
+        # of completion.
+        labels = {}
+        for host in hosts:
+            curl = self.easy()
+            labels[curl] = host
+            scheduler.add(curl, url=f"{self.server.url}/{path}", host=host)
+        return [labels[completion.curl] for completion in scheduler.perform()]
+
+    def test_host_round_robin(self):
+        with lcurl.Scheduler(controller=FixedController(1)) as scheduler:
+            self.assertEqual(self.run_hosts(scheduler, "aaaabbc"),
+                             list("abcabaa"))
+
+    def test_host_weights(self):
+        with lcurl.Scheduler(controller=FixedController(1), weights={"a": 2}) as scheduler:
+            self.assertEqual(self.run_hosts(scheduler, "aaaaabbb"),
+                             list("aabaabab"))
+
+    def test_host_limit(self):
+        with lcurl.Scheduler(controller=FixedController(4), host_limit=1) as scheduler:
+            curls = {}
+            for host, path in (("a", "slow/200"), ("a", "slow/200"), ("a", "slow/200"),
+                               ("b", "10"), ("b", "10")):
+                curl = self.easy()
+                curls[curl] = host
+                scheduler.add(curl, url=f"{self.server.url}/{path}", host=host)
+            order = []
+            for completion in scheduler.perform():
+                order.append(curls[completion.curl])
+                self.assertLessEqual(scheduler.host_running("a"), 1)
+                self.assertLessEqual(scheduler.host_running("b"), 1)
+            # host a cannot hold up host b
+            self.assertEqual(order, list("bbaaa"))
+
+    def test_host_from_url(self):
+        with lcurl.Scheduler(controller=FixedController(5), host_limit=2) as scheduler:
+            for _ in range(6):
+                scheduler.add(self.easy(), url=f"{self.server.url}/slow/50")
+            for completion in scheduler.perform():
+                self.assertLessEqual(scheduler.host_running("127.0.0.1"), 2)
+            self.assertEqual(scheduler.host_running("127.0.0.1"), 0)
+
+    def test_no_host(self):
+        # transfers without a host are not subject to host_limit
+        with lcurl.Scheduler(controller=FixedController(3), host_limit=1) as scheduler:
+            for _ in range(3):
+                curl = self.easy()
+                lcurl.easy_setopt(curl, lcurl.CURLOPT_URL, f"{self.server.url}/slow/200".encode())
+                scheduler.add(curl)
+            start = time.monotonic()
+            self.assertEqual(len(list(scheduler.perform())), 3)
+            self.assertLess(time.monotonic() - start, 0.55)  # in parallel
+
+    def test_bulk_pause(self):
+        calls = []
+        real_pause = lcurl.easy_pause
+
+        def easy_pause(curl, bitmask):
+            calls.append(bitmask)
+            return real_pause(curl, bitmask)
+
+        controller = FixedController(2)
+        with lcurl.Scheduler(controller=controller, bulk_priority=10) as scheduler, \
+             mock.patch("libcurl._scheduler.easy_pause", easy_pause):
+            bulk, fast, urgent = self.easy(), self.easy(), self.easy()
+            scheduler.add(bulk, 10, f"{self.server.url}/slow/300")
+            scheduler.add(fast, 10, f"{self.server.url}/0")
+            order, paused = [], []
+            for completion in scheduler.perform():
+                order.append(completion.curl)
+                paused.append(scheduler.paused)
+                if completion.curl == fast:
+                    # the running bulk transfer is paused for the urgent one
+                    controller.limit = 1
+                    scheduler.add(urgent, 0, f"{self.server.url}/1")
+            self.assertEqual(order, [fast, urgent, bulk])
+            self.assertEqual(paused, [0, 1, 0])
+            self.assertEqual(calls, [lcurl.CURLPAUSE_ALL, lcurl.CURLPAUSE_CONT])
+
+    def test_pause_failure_keeps_transfer_running(self):
+        real_pause = lcurl.easy_pause
+        calls = []
+
+        def easy_pause(curl, bitmask):
+            calls.append(bitmask)
+            if bitmask == lcurl.CURLPAUSE_ALL and len(calls) == 1:
+                return lcurl.CURLE_AGAIN
+            return real_pause(curl, bitmask)
+
+        controller = FixedController(3)
+        with lcurl.Scheduler(controller=controller, bulk_priority=10) as scheduler, \
+             mock.patch("libcurl._scheduler.easy_pause", easy_pause):
+            slow = [self.easy(), self.easy()]
+            for curl in slow:
+                scheduler.add(curl, 10, f"{self.server.url}/slow/500")
+            scheduler.add(self.easy(), 10, f"{self.server.url}/0")
+            urgent = self.easy()
+            paused = []
+            done = []
+            for completion in scheduler.perform():
+                done.append(completion)
+                if len(done) == 1:
+                    controller.limit = 2
+                    scheduler.add(urgent, 0, f"{self.server.url}/1")
+                paused.append(scheduler.paused)
+            self.assertEqual(len(done), 4)
+            self.assertTrue(all(completion.ok for completion in done))
+            # the first bulk transfer failed to pause, the second one was paused
+            self.assertEqual(calls[:2], [lcurl.CURLPAUSE_ALL, lcurl.CURLPAUSE_ALL])
+            self.assertIn(lcurl.CURLPAUSE_CONT, calls)
+            self.assertEqual(done[1].curl, urgent)
+            self.assertEqual(paused[1], 1)
+            self.assertEqual((scheduler.running, scheduler.paused, scheduler.pending), (0, 0, 0))
+
+    def test_pause_failure_of_all_bulk_transfers(self):
+        controller = FixedController(2)
+        with lcurl.Scheduler(controller=controller, bulk_priority=10) as scheduler, \
+             mock.patch("libcurl._scheduler.easy_pause", return_value=lcurl.CURLE_AGAIN):
+            scheduler.add(self.easy(), 10, f"{self.server.url}/slow/200")
+            scheduler.add(self.easy(), 10, f"{self.server.url}/0")
+            urgent = self.easy()
+            done = []
+            for completion in scheduler.perform():
+                done.append(completion)
+                if len(done) == 1:
+                    controller.limit = 1
+                    scheduler.add(urgent, 0, f"{self.server.url}/1")
+                self.assertLessEqual(scheduler.running, 2)
+                self.assertEqual(scheduler.paused, 0)
+            self.assertEqual(len(done), 3)
+            self.assertTrue(all(completion.ok for completion in done))
+            self.assertEqual(done[-1].curl, urgent)
@@ -0,0 +1,120 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+import socket
+import time
+import ctypes as ct
+
+import libcurl as lcurl
+from libcurl._platform import is_windows, FD_ZERO, FD_SET, FD_ISSET
+from libcurl._multi import _extract_sockets_from_fd_set, _store_sockets_to_fd_set
+from ._httpd import HTTPServer
+
+
+def fd_set(*sockets):
+    fdset = lcurl.fd_set()
+    FD_ZERO(ct.byref(fdset))
+    for sock in sockets:
+        FD_SET(sock, ct.byref(fdset))
+    return fdset
+
+
+def timeval(seconds):
+    return lcurl.timeval(int(seconds), int(seconds % 1 * 1_000_000))
+
+
+class FdSetTestCase(unittest.TestCase):
+
+    sockets = [3, 5, 6] if is_windows else [0, 1, 31, 32, 63, 64, 65, 500, 1022, 1023]
+
+    def test_extract(self):
+        fdset = fd_set(*self.sockets)
+        self.assertEqual(sorted(_extract_sockets_from_fd_set(ct.pointer(fdset))),
+                         self.sockets)
+        self.assertEqual(_extract_sockets_from_fd_set(ct.pointer(fd_set())), [])
+        self.assertEqual(_extract_sockets_from_fd_set(None), [])
+
+    def test_store(self):
+        fdset = fd_set(2, 7)
+        _store_sockets_to_fd_set(ct.pointer(fdset), self.sockets)
+        for sock in range(1024 if not is_windows else 8):
+            self.assertEqual(bool(FD_ISSET(sock, ct.byref(fdset))), sock in self.sockets, sock)
+        _store_sockets_to_fd_set(ct.pointer(fdset), ())
+        self.assertEqual(_extract_sockets_from_fd_set(ct.pointer(fdset)), [])
+        _store_sockets_to_fd_set(None, self.sockets)  # no-op
+
+    def test_round_trip(self):
+        fdset = fd_set(*self.sockets)
+        other = fd_set()
+        _store_sockets_to_fd_set(ct.pointer(other),
+                                 _extract_sockets_from_fd_set(ct.pointer(fdset)))
+        self.assertEqual(bytes(other), bytes(fdset))
+
+
+class SelectorSelectTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.a, self.b = socket.socketpair()
+
+    def tearDown(self):
+        self.a.close()
+        self.b.close()
+
+    def test_ready(self):
+        a, b = self.a.fileno(), self.b.fileno()
+        self.b.send(b"x")
+        readfds, writefds, exceptfds = fd_set(a, b), fd_set(a), fd_set(a, b)
+        nready = lcurl.py_selector_select(max(a, b) + 1, ct.pointer(readfds),
+                                          ct.pointer(writefds), ct.pointer(exceptfds),
+                                          ct.pointer(timeval(1)))
+        self.assertEqual(nready, 2)  # a readable and writable, b not readable
+        self.assertEqual(_extract_sockets_from_fd_set(ct.pointer(readfds)),  [a])
+        self.assertEqual(_extract_sockets_from_fd_set(ct.pointer(writefds)), [a])
+        self.assertEqual(_extract_sockets_from_fd_set(ct.pointer(exceptfds)), [])
+
+    def test_timeout(self):
+        a = self.a.fileno()
+        readfds = fd_set(a)
+        start = time.monotonic()
+        nready = lcurl.py_selector_select(a + 1, ct.pointer(readfds), None, None,
+                                          ct.pointer(timeval(0.1)))
+        self.assertEqual(nready, 0)
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+        self.assertEqual(_extract_sockets_from_fd_set(ct.pointer(readfds)), [])
+
+    def test_no_sockets(self):
+        readfds = fd_set()
+        start = time.monotonic()
+        self.assertEqual(lcurl.py_selector_select(0, ct.pointer(readfds), None, None,
+                                                  ct.pointer(timeval(0.05))), 0)
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+        self.assertEqual(lcurl.py_selector_select(-1, None, None, None, None), -1)
+
+    def test_multi_fdset_loop(self):
+        # A multi transfer driven by multi_fdset() and py_selector_select().
+        with HTTPServer() as server:
+            curl = lcurl.easy_init()
+            multi = lcurl.multi_init()
+            try:
+                lcurl.easy_setopt(curl, lcurl.CURLOPT_URL, f"{server.url}/100000".encode())
+                lcurl.easy_setopt(curl, lcurl.CURLOPT_WRITEFUNCTION, lcurl.write_skipped)
+                lcurl.multi_add_handle(multi, curl)
+                running = ct.c_int(1)
+                deadline = time.monotonic() + 10
+                while running.value and time.monotonic() < deadline:
+                    lcurl.multi_perform(multi, ct.byref(running))
+                    readfds, writefds, exceptfds = fd_set(), fd_set(), fd_set()
+                    maxfd = ct.c_int(-1)
+                    lcurl.multi_fdset(multi, ct.byref(readfds), ct.byref(writefds),
+                                      ct.byref(exceptfds), ct.byref(maxfd))
+                    self.assertNotEqual(
+                        lcurl.py_selector_select(maxfd.value + 1, ct.pointer(readfds),
+                                                 ct.pointer(writefds), ct.pointer(exceptfds),
+                                                 ct.pointer(timeval(0.1))), -1)
+                self.assertEqual(running.value, 0)
+                done = lcurl.multi_completed(multi)
+                self.assertEqual([completion.result for completion in done], [lcurl.CURLE_OK])
+            finally:
+                lcurl.multi_cleanup(multi)
+                lcurl.easy_cleanup(curl)
@@ -0,0 +1,141 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+import threading
+
+import libcurl as lcurl
+from ._httpd import HTTPServer, closed_port
+
+
+class SessionTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def setUp(self):
+        self.session = lcurl.Session()
+
+    def tearDown(self):
+        self.session.close()
+
+    def test_get(self):
+        url = f"{self.server.url}/1000"
+        resp = self.session.get(url)
+        self.assertTrue(resp.ok)
+        self.assertIsNone(resp.error)
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(resp.url, url)
+        self.assertEqual(resp.content, b"x" * 1000)
+        self.assertEqual(resp.header("content-length"), "1000")
+        self.assertIsNone(resp.header("X-Missing"))
+        self.assertEqual(repr(resp), "<Response [200] code=0>")
+
+    def test_get_status(self):
+        resp = self.session.get(f"{self.server.url}/status/404")
+        self.assertTrue(resp.ok)
+        self.assertEqual(resp.status, 404)
+        self.assertEqual(resp.content, b"")
+
+    def test_headers_and_options(self):
+        for headers in (["X-Test: 1"], {"X-Test": 1}):
+            with self.subTest(headers=headers):
+                resp = self.session.get(f"{self.server.url}/headers", headers=headers,
+                                        USERAGENT="session")
+                self.assertIn(b"X-Test: 1\n", resp.content)
+                self.assertIn(b"User-Agent: session\n", resp.content)
+        # per-request options do not stick to the pooled handle
+        resp = self.session.get(f"{self.server.url}/headers")
+        self.assertNotIn(b"X-Test", resp.content)
+        self.assertNotIn(b"User-Agent: session", resp.content)
+
+    def test_default_options(self):
+        with lcurl.Session({"FOLLOWLOCATION": 1}) as session:
+            resp = session.get(f"{self.server.url}/redirect/10")
+            self.assertEqual(resp.status, 200)
+            self.assertEqual(resp.url, f"{self.server.url}/10")
+            self.assertEqual(resp.content, b"x" * 10)
+            # the headers are those of the final response
+            self.assertEqual(resp.header("Content-Length"), "10")
+            self.assertIsNone(resp.header("Location"))
+        resp = self.session.get(f"{self.server.url}/redirect/10")
+        self.assertEqual(resp.status, 302)
+        self.assertEqual(resp.header("Location"), "/10")
+
+    def test_post_put(self):
+        data = bytes(range(256)) * 100
+        resp = self.session.post(f"{self.server.url}/echo", data)
+        self.assertEqual((resp.status, resp.content), (200, data))
+        resp = self.session.post(f"{self.server.url}/echo", "text")
+        self.assertEqual(resp.content, b"text")
+        resp = self.session.post(f"{self.server.url}/echo")
+        self.assertEqual((resp.status, resp.content), (200, b""))
+        resp = self.session.put(f"{self.server.url}/echo", b"put")
+        self.assertEqual((resp.status, resp.content), (200, b"put"))
+        # the next GET is not a POST any more
+        self.assertEqual(self.session.get(f"{self.server.url}/5").content, b"xxxxx")
+
+    def test_head(self):
+        resp = self.session.head(f"{self.server.url}/1000")
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(resp.content, b"")
+        self.assertEqual(resp.header("Content-Length"), "1000")
+
+    def test_cookies(self):
+        self.session.get(f"{self.server.url}/cookie")
+        resp = self.session.get(f"{self.server.url}/headers")
+        self.assertIn(b"Cookie: name=value\n", resp.content)
+        with lcurl.Session() as other:
+            resp = other.get(f"{self.server.url}/headers")
+            self.assertNotIn(b"Cookie:", resp.content)
+
+    def test_error(self):
+        resp = self.session.get(f"http://127.0.0.1:{closed_port()}/")
+        self.assertFalse(resp.ok)
+        self.assertEqual(resp.code, lcurl.CURLE_COULDNT_CONNECT)
+        self.assertIsInstance(resp.error, str)
+        self.assertEqual(resp.status, 0)
+        # the handle went back to the pool
+        self.assertEqual(self.session.pool.size, len(self.session.pool))
+        with self.assertRaises(RuntimeError):
+            self.session.get(f"{self.server.url}/10", HTTP_VERSION=999)
+        self.assertEqual(self.session.pool.size, len(self.session.pool))
+
+    def test_stream(self):
+        chunks = list(self.session.stream(f"{self.server.url}/1000000"))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b"".join(chunks), b"x" * 1000000)
+        chunks = list(self.session.stream(f"{self.server.url}/echo", method="POST",
+                                          data=b"streamed"))
+        self.assertEqual(b"".join(chunks), b"streamed")
+
+    def test_stream_error(self):
+        with self.assertRaises(RuntimeError):
+            list(self.session.stream(f"http://127.0.0.1:{closed_port()}/"))
+        self.assertEqual(self.session.pool.size, len(self.session.pool))
+
+    def test_stream_abandoned(self):
+        stream = self.session.stream(f"{self.server.url}/1000000")
+        self.assertTrue(next(stream))
+        stream.close()
+        self.assertEqual(self.session.pool.size, len(self.session.pool))
+        self.assertEqual(self.session.get(f"{self.server.url}/10").content, b"x" * 10)
+
+    def test_threads(self):
+        results = []
+
+        def worker(n):
+            for size in range(n, 100, 10):
+                resp = self.session.get(f"{self.server.url}/{size}")
+                results.append(resp.content == b"x" * size)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(10)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        self.assertEqual(results, [True] * 100)
+        self.assertIsNotNone(self.session.lock)
@@ -0,0 +1,152 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+import ctypes as ct
+
+import libcurl as lcurl
+from ._httpd import HTTPServer
+
+
+class SetoptTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def setUp(self):
+        self.curl = lcurl.easy_init()
+        self.body = bytearray()
+
+        @lcurl.write_callback
+        def write(buffer, size, nitems, stream):
+            self.body += bytes(buffer[:size * nitems])
+            return size * nitems
+        self.write = write
+
+    def tearDown(self):
+        lcurl.easy_cleanup(self.curl)
+
+    def perform(self):
+        self.assertEqual(lcurl.easy_setopt(self.curl, lcurl.CURLOPT_WRITEFUNCTION,
+                                           self.write), lcurl.CURLE_OK)
+        return lcurl.easy_perform(self.curl)
+
+    def cookies(self):
+        slist = ct.POINTER(lcurl.slist)()
+        self.assertEqual(lcurl.easy_getinfo(self.curl, lcurl.CURLINFO_COOKIELIST,
+                                            ct.byref(slist)), lcurl.CURLE_OK)
+        cookies = []
+        item = slist
+        while item:
+            cookies.append(item.contents.data)
+            item = item.contents.next
+        lcurl.slist_free_all(slist)
+        return cookies
+
+    def test_prototype_by_band(self):
+        self.assertIs(lcurl.setopt_prototype(lcurl.CURLOPT_VERBOSE), lcurl.setopt_long)
+        self.assertIs(lcurl.setopt_prototype(lcurl.CURLOPT_URL), lcurl.setopt_str)
+        self.assertIs(lcurl.setopt_prototype(lcurl.CURLOPT_PRIVATE), lcurl.setopt_ptr)
+        self.assertIs(lcurl.setopt_prototype(lcurl.CURLOPT_POSTFIELDS), lcurl.setopt_ptr)
+        self.assertIs(lcurl.setopt_prototype(lcurl.CURLOPT_WRITEFUNCTION), lcurl.setopt_func)
+        self.assertIs(lcurl.setopt_prototype(lcurl.CURLOPT_MAXFILESIZE_LARGE),
+                      lcurl.setopt_off_t)
+        self.assertIs(lcurl.setopt_prototype(lcurl.CURLOPT_SSLCERT_BLOB), lcurl.setopt_blob)
+
+    def test_long(self):
+        setopt = lcurl.easy_setopt
+        self.assertEqual(setopt(self.curl, lcurl.CURLOPT_TIMEOUT, 10), lcurl.CURLE_OK)
+        self.assertEqual(setopt(self.curl, lcurl.CURLOPT_TIMEOUT, ct.c_long(10)),
+                         lcurl.CURLE_OK)
+        self.assertEqual(setopt(self.curl, lcurl.CURLOPT_TIMEOUT, True), lcurl.CURLE_OK)
+        self.assertEqual(setopt(self.curl, lcurl.CURLOPT_TIMEOUT, None), lcurl.CURLE_OK)
+        self.assertEqual(setopt(self.curl, lcurl.CURLOPT_TIMEOUT, -1),
+                         lcurl.CURLE_BAD_FUNCTION_ARGUMENT)
+
+    def test_off_t(self):
+        setopt = lcurl.easy_setopt
+        self.assertEqual(setopt(self.curl, lcurl.CURLOPT_MAXFILESIZE_LARGE, 1 << 40),
+                         lcurl.CURLE_OK)
+        self.assertEqual(setopt(self.curl, lcurl.CURLOPT_MAXFILESIZE_LARGE, None),
+                         lcurl.CURLE_OK)
+        self.assertEqual(setopt(self.curl, lcurl.CURLOPT_MAXFILESIZE_LARGE, -1),
+                         lcurl.CURLE_BAD_FUNCTION_ARGUMENT)
+        # the 64-bit value reaches libcurl unchanged
+        setopt(self.curl, lcurl.CURLOPT_URL, f"{self.server.url}/100".encode())
+        setopt(self.curl, lcurl.CURLOPT_MAXFILESIZE_LARGE, (1 << 32) + 10)
+        self.assertEqual(self.perform(), lcurl.CURLE_OK)
+        setopt(self.curl, lcurl.CURLOPT_MAXFILESIZE_LARGE, 10)
+        self.assertEqual(self.perform(), lcurl.CURLE_FILESIZE_EXCEEDED)
+
+    def test_string(self):
+        setopt = lcurl.easy_setopt
+        for url in (f"{self.server.url}/5".encode(),
+                    f"{self.server.url}/5",
+                    ct.c_char_p(f"{self.server.url}/5".encode()),
+                    ct.create_string_buffer(f"{self.server.url}/5".encode())):
+            with self.subTest(type=type(url).__name__):
+                self.body.clear()
+                self.assertEqual(setopt(self.curl, lcurl.CURLOPT_URL, url), lcurl.CURLE_OK)
+                self.assertEqual(self.perform(), lcurl.CURLE_OK)
+                self.assertEqual(self.body, b"xxxxx")
+        buffer = ct.create_string_buffer(f"{self.server.url}/3".encode())
+        self.assertEqual(setopt(self.curl, lcurl.CURLOPT_URL,
+                                ct.cast(buffer, ct.c_void_p)), lcurl.CURLE_OK)
+        self.body.clear()
+        self.assertEqual(self.perform(), lcurl.CURLE_OK)
+        self.assertEqual(self.body, b"xxx")
+        self.assertEqual(lcurl.setopt_str(self.curl, lcurl.CURLOPT_USERAGENT, "agent/1.0"),
+                         lcurl.CURLE_OK)
+        self.assertEqual(setopt(self.curl, lcurl.CURLOPT_USERAGENT, None), lcurl.CURLE_OK)
+
+    def test_str_is_utf8_encoded(self):
+        setopt = lcurl.easy_setopt
+        setopt(self.curl, lcurl.CURLOPT_COOKIEFILE, "")
+        setopt(self.curl, lcurl.CURLOPT_COOKIELIST,
+               "Set-Cookie: name=wért; domain=example.com")
+        self.assertEqual(len(self.cookies()), 1)
+        self.assertTrue(self.cookies()[0].endswith("name\twért".encode("utf-8")))
+        self.assertEqual(setopt(self.curl, lcurl.CURLOPT_COOKIELIST, "ALL"), lcurl.CURLE_OK)
+        self.assertEqual(self.cookies(), [])
+
+    def test_object_pointer(self):
+        setopt = lcurl.easy_setopt
+        private = ct.c_void_p()
+        for value, expected in ((1234, 1234), (ct.c_void_p(5678), 5678), (None, None)):
+            self.assertEqual(setopt(self.curl, lcurl.CURLOPT_PRIVATE, value), lcurl.CURLE_OK)
+            lcurl.easy_getinfo(self.curl, lcurl.CURLINFO_PRIVATE, ct.byref(private))
+            self.assertEqual(private.value, expected)
+        body = b"posted data"
+        setopt(self.curl, lcurl.CURLOPT_URL, f"{self.server.url}/echo".encode())
+        setopt(self.curl, lcurl.CURLOPT_POSTFIELDSIZE, len(body))
+        self.assertEqual(setopt(self.curl, lcurl.CURLOPT_POSTFIELDS, body), lcurl.CURLE_OK)
+        self.assertEqual(self.perform(), lcurl.CURLE_OK)
+        self.assertEqual(self.body, body)
+
+    def test_function(self):
+        setopt = lcurl.easy_setopt
+        self.assertEqual(setopt(self.curl, lcurl.CURLOPT_WRITEFUNCTION, self.write),
+                         lcurl.CURLE_OK)
+        self.assertEqual(setopt(self.curl, lcurl.CURLOPT_WRITEFUNCTION, None), lcurl.CURLE_OK)
+        self.assertEqual(setopt(self.curl, lcurl.CURLOPT_WRITEFUNCTION,
+                                ct.cast(self.write, ct.c_void_p)), lcurl.CURLE_OK)
+
+    def test_blob(self):
+        setopt = lcurl.easy_setopt
+        data = b"not a certificate"
+        cert = lcurl.blob(ct.cast(ct.c_char_p(data), ct.c_void_p), len(data),
+                          lcurl.CURL_BLOB_COPY)
+        supported = (lcurl.CURLE_OK, lcurl.CURLE_NOT_BUILT_IN, lcurl.CURLE_UNKNOWN_OPTION)
+        self.assertIn(setopt(self.curl, lcurl.CURLOPT_SSLCERT_BLOB, ct.byref(cert)), supported)
+        self.assertIn(setopt(self.curl, lcurl.CURLOPT_SSLCERT_BLOB, ct.pointer(cert)), supported)
+        self.assertIn(setopt(self.curl, lcurl.CURLOPT_SSLCERT_BLOB, None), supported)
+        self.assertIn(setopt(self.curl, lcurl.CURLOPT_SSLCERT_BLOB,
+                             ct.addressof(cert)), supported)
+
+    def test_unknown_option(self):
+        self.assertEqual(lcurl.easy_setopt(self.curl, 99999, 0), lcurl.CURLE_UNKNOWN_OPTION)
@@ -0,0 +1,118 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+import threading
+
+import libcurl as lcurl
+from ._httpd import HTTPServer
+
+SHARED = lcurl.CURL_LOCK_ACCESS_SHARED
+SINGLE = lcurl.CURL_LOCK_ACCESS_SINGLE
+DNS    = lcurl.CURL_LOCK_DATA_DNS
+COOKIE = lcurl.CURL_LOCK_DATA_COOKIE
+
+
+class ShareLockTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.lock = lcurl.ShareLock()
+        self.threads = []
+
+    def tearDown(self):
+        for thread, _ in self.threads:
+            thread.join(5)
+
+    def lock_data(self, data, access):
+        self.lock.lock_callback(None, data, access, None)
+
+    def unlock_data(self, data):
+        self.lock.unlock_callback(None, data, None)
+
+    def locker(self, data, access):
+        # Locks data on another thread, which holds the lock until released.
+        locked, release = threading.Event(), threading.Event()
+
+        def target():
+            self.lock_data(data, access)
+            locked.set()
+            release.wait(5)
+            self.unlock_data(data)
+
+        thread = threading.Thread(target=target)
+        thread.start()
+        self.threads.append((thread, release))
+        return locked, release
+
+    def test_shared_access(self):
+        lockers = [self.locker(DNS, SHARED) for _ in range(3)]
+        for locked, _ in lockers:
+            self.assertTrue(locked.wait(5))
+        self.lock_data(DNS, SHARED)
+        self.unlock_data(DNS)
+        for _, release in lockers:
+            release.set()
+        self.assertEqual(self.lock.contention(DNS), 0)
+        self.assertEqual(self.lock.stats()["dns"][:2], (4, 0))
+
+    def test_exclusive_access(self):
+        locked, release = self.locker(DNS, SINGLE)
+        self.assertTrue(locked.wait(5))
+        for access in (SHARED, SINGLE):
+            with self.subTest(access=access):
+                waiting, _ = self.locker(DNS, access)
+                self.assertFalse(waiting.wait(0.1))
+        for _, release in self.threads:
+            release.set()
+        for thread, _ in self.threads:
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+        self.assertEqual(self.lock.contention(DNS), 2)
+
+    def test_writer_preference(self):
+        reader, release_reader = self.locker(DNS, SHARED)
+        self.assertTrue(reader.wait(5))
+        writer, release_writer = self.locker(DNS, SINGLE)
+        self.assertFalse(writer.wait(0.1))
+        # a waiting writer holds back new readers
+        late_reader, release_late_reader = self.locker(DNS, SHARED)
+        self.assertFalse(late_reader.wait(0.1))
+        release_reader.set()
+        self.assertTrue(writer.wait(5))
+        self.assertFalse(late_reader.is_set())
+        release_writer.set()
+        self.assertTrue(late_reader.wait(5))
+        release_late_reader.set()
+
+    def test_categories_are_independent(self):
+        locked, release = self.locker(DNS, SINGLE)
+        self.assertTrue(locked.wait(5))
+        self.lock_data(COOKIE, SINGLE)
+        self.unlock_data(COOKIE)
+        release.set()
+        self.assertEqual(self.lock.contention(COOKIE), 0)
+
+    def test_stats(self):
+        self.assertEqual(self.lock.stats(), {})
+        self.lock_data(COOKIE, SINGLE)
+        self.unlock_data(COOKIE)
+        acquired, contended, wait_time = self.lock.stats()["cookie"]
+        self.assertEqual((acquired, contended, wait_time), (1, 0, 0.0))
+        self.lock.reset_stats()
+        self.assertEqual(self.lock.stats(), {})
+
+    def test_install(self):
+        share = lcurl.share_init()
+        curl = lcurl.easy_init()
+        try:
+            self.assertEqual(self.lock.install(share), lcurl.CURLSHE_OK)
+            lcurl.share_setopt(share, lcurl.CURLSHOPT_SHARE, DNS)
+            with HTTPServer() as server:
+                lcurl.easy_setopt(curl, lcurl.CURLOPT_SHARE, share)
+                lcurl.easy_setopt(curl, lcurl.CURLOPT_URL, f"{server.url}/10".encode())
+                lcurl.easy_setopt(curl, lcurl.CURLOPT_WRITEFUNCTION, lcurl.write_skipped)
+                self.assertEqual(lcurl.easy_perform(curl), lcurl.CURLE_OK)
+            self.assertGreater(self.lock.stats()["dns"][0], 0)
+        finally:
+            lcurl.easy_cleanup(curl)
+            lcurl.share_cleanup(share)
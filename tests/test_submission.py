@@ -0,0 +1,117 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+from unittest import mock
+import time
+import threading
+
+import libcurl as lcurl
+
+
+class SubmissionQueueTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.multi = lcurl.multi_init()
+        self.queue = lcurl.SubmissionQueue(self.multi)
+
+    def tearDown(self):
+        lcurl.multi_cleanup(self.multi)
+
+    def poll(self, timeout_ms):
+        start = time.monotonic()
+        self.assertEqual(lcurl.multi_poll(self.multi, None, 0, timeout_ms, None),
+                         lcurl.CURLM_OK)
+        return time.monotonic() - start
+
+    def test_put_drain(self):
+        queue = self.queue
+        self.assertEqual(queue.drain(), [])
+        queue.put(1)
+        queue.put_many([2, 3, 4])
+        queue.put_many([])
+        self.assertEqual(len(queue), 4)
+        self.assertEqual(queue.drain(limit=3), [1, 2, 3])
+        self.assertEqual(queue.drain(limit=3), [4])
+        self.assertEqual(len(queue), 0)
+
+    def test_wakeup(self):
+        timer = threading.Timer(0.1, self.queue.put, ("item",))
+        timer.start()
+        self.assertLess(self.poll(5000), 2.5)
+        timer.join()
+        self.assertEqual(self.queue.drain(), ["item"])
+        # no wakeup is left pending
+        self.assertGreaterEqual(self.poll(100), 0.09)
+
+    def test_wakeup_once(self):
+        with mock.patch("libcurl._submission.multi_wakeup",
+                        return_value=lcurl.CURLM_OK) as multi_wakeup:
+            self.queue.put(1)
+            self.queue.put(2)
+            self.queue.put_many([3, 4])
+            self.assertEqual(multi_wakeup.call_count, 1)
+            self.queue.put_many([])
+            self.assertEqual(multi_wakeup.call_count, 1)
+            # a partial drain leaves a wakeup for the rest
+            self.queue.drain(limit=1)
+            self.assertEqual(multi_wakeup.call_count, 2)
+            self.queue.drain()
+            self.queue.put_many([5])
+            self.assertEqual(multi_wakeup.call_count, 3)
+
+    def test_wakeup_failure(self):
+        with mock.patch("libcurl._submission.multi_wakeup",
+                        return_value=lcurl.CURLM_BAD_HANDLE):
+            with self.assertRaises(RuntimeError):
+                self.queue.put(1)
+
+    def test_close(self):
+        queue = self.queue
+        queue.put(1)
+        self.assertFalse(queue.closed)
+        queue.close()
+        self.assertTrue(queue.closed)
+        for put, item in ((queue.put, 2), (queue.put_many, [2])):
+            with self.assertRaises(RuntimeError):
+                put(item)
+        # the items queued before close() are still delivered
+        self.assertEqual(queue.drain(), [1])
+        self.assertLess(self.poll(5000), 2.5)
+
+    def test_close_twice(self):
+        with mock.patch("libcurl._submission.multi_wakeup",
+                        return_value=lcurl.CURLM_OK) as multi_wakeup:
+            self.queue.close()
+            self.queue.close()
+            self.assertEqual(multi_wakeup.call_count, 1)
+
+    def test_close_after_owner_exit(self):
+        multi = lcurl.multi_init()
+        queue = lcurl.SubmissionQueue(multi)
+        queue.put(1)
+        queue.detach()
+        lcurl.multi_cleanup(multi)
+        self.assertTrue(queue.closed)
+        with mock.patch("libcurl._submission.multi_wakeup") as multi_wakeup:
+            queue.close()
+            with self.assertRaises(RuntimeError):
+                queue.put(2)
+            self.assertEqual(queue.drain(limit=0), [])
+            self.assertFalse(multi_wakeup.called)
+
+    def test_producers(self):
+        items = set()
+
+        def producer(n):
+            for i in range(1000):
+                self.queue.put((n, i))
+
+        threads = [threading.Thread(target=producer, args=(n,)) for n in range(4)]
+        for thread in threads: thread.start()
+        deadline = time.monotonic() + 10
+        while len(items) < 4000 and time.monotonic() < deadline:
+            self.poll(100)
+            items.update(self.queue.drain(limit=500))
+        for thread in threads: thread.join()
+        self.assertEqual(items, {(n, i) for n in range(4) for i in range(1000)})
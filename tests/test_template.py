@@ -0,0 +1,124 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+import io
+import ctypes as ct
+
+import libcurl as lcurl
+from ._httpd import HTTPServer
+
+
+class OptionTemplateTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.close()
+
+    def setUp(self):
+        self.handles = []
+
+    def tearDown(self):
+        for curl in self.handles:
+            lcurl.easy_cleanup(curl)
+
+    def easy(self):
+        curl = lcurl.easy_init()
+        self.handles.append(curl)
+        return curl
+
+    def options(self, path, file, **options):
+        options.update({lcurl.CURLOPT_URL: f"{self.server.url}/{path}",
+                        lcurl.CURLOPT_WRITEFUNCTION: lcurl.write_to_file,
+                        lcurl.CURLOPT_WRITEDATA: id(file)})
+        return options
+
+    def test_apply(self):
+        file = io.BytesIO()
+        options = self.options("headers", file)
+        options[lcurl.CURLOPT_HTTPHEADER] = ["X-First: 1", b"X-Second: 2"]
+        options[lcurl.CURLOPT_USERAGENT] = "template"
+        with lcurl.OptionTemplate(options) as tmpl:
+            self.assertEqual(len(tmpl), 5)
+            curl = self.easy()
+            self.assertEqual(tmpl.apply(curl), lcurl.CURLE_OK)
+            self.assertEqual(lcurl.easy_perform(curl), lcurl.CURLE_OK)
+        headers = file.getvalue()
+        self.assertIn(b"X-First: 1\n", headers)
+        self.assertIn(b"X-Second: 2\n", headers)
+        self.assertIn(b"User-Agent: template\n", headers)
+
+    def test_option_names(self):
+        for option in (lcurl.CURLOPT_FOLLOWLOCATION, "FOLLOWLOCATION",
+                       "CURLOPT_FOLLOWLOCATION", b"FOLLOWLOCATION"):
+            with self.subTest(option=option):
+                file = io.BytesIO()
+                options = self.options("redirect/10", file)
+                options[option] = 1
+                with lcurl.OptionTemplate(options) as tmpl:
+                    curl = self.easy()
+                    tmpl.apply(curl)
+                    self.assertEqual(lcurl.easy_perform(curl), lcurl.CURLE_OK)
+                self.assertEqual(file.getvalue(), b"x" * 10)
+
+    def test_update(self):
+        file = io.BytesIO()
+        with lcurl.OptionTemplate(self.options("10", file)) as tmpl:
+            tmpl.update({lcurl.CURLOPT_URL: f"{self.server.url}/20"})
+            self.assertEqual(len(tmpl), 3)
+            curl = self.easy()
+            tmpl.apply(curl)
+            self.assertEqual(lcurl.easy_perform(curl), lcurl.CURLE_OK)
+        self.assertEqual(file.getvalue(), b"x" * 20)
+
+    def test_off_t_option(self):
+        file = io.BytesIO()
+        with lcurl.OptionTemplate(self.options("1000", file,
+                                               MAXFILESIZE_LARGE=10)) as tmpl:
+            curl = self.easy()
+            tmpl.apply(curl)
+            self.assertEqual(lcurl.easy_perform(curl), lcurl.CURLE_FILESIZE_EXCEEDED)
+
+    def test_new_handle(self):
+        file = io.BytesIO()
+        with lcurl.OptionTemplate(self.options("10", file)) as tmpl:
+            curls = [tmpl.new_handle() for _ in range(3)]
+            self.handles.extend(curls)
+            self.assertEqual(len(set(ct.cast(curl, ct.c_void_p).value
+                                     for curl in curls)), 3)
+            for curl in curls:
+                self.assertEqual(lcurl.easy_perform(curl), lcurl.CURLE_OK)
+            self.assertEqual(file.getvalue(), b"x" * 30)
+            # update() drops the prototype: new handles get the new options
+            tmpl.update({lcurl.CURLOPT_URL: f"{self.server.url}/5"})
+            curl = tmpl.new_handle()
+            self.handles.append(curl)
+            self.assertEqual(lcurl.easy_perform(curl), lcurl.CURLE_OK)
+            self.assertEqual(file.getvalue(), b"x" * 35)
+
+    def test_apply_failure(self):
+        with lcurl.OptionTemplate({lcurl.CURLOPT_HTTP_VERSION: 999}) as tmpl:
+            self.assertNotEqual(tmpl.apply(self.easy()), lcurl.CURLE_OK)
+            with self.assertRaises(RuntimeError):
+                tmpl.new_handle()
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            lcurl.OptionTemplate({"NO_SUCH_OPTION": 1})
+        with self.assertRaises(ValueError):
+            lcurl.OptionTemplate({-1: 1})
+        with self.assertRaises(TypeError):
+            lcurl.OptionTemplate({lcurl.CURLOPT_WRITEFUNCTION: print})
+
+    def test_close(self):
+        tmpl = lcurl.OptionTemplate({lcurl.CURLOPT_HTTPHEADER: ["X-A: 1"],
+                                     lcurl.CURLOPT_VERBOSE: 0})
+        self.handles.append(tmpl.new_handle())
+        tmpl.close()
+        self.assertEqual(len(tmpl), 0)
+        self.assertEqual(tmpl.apply(self.easy()), lcurl.CURLE_OK)
+        tmpl.close()  # idempotent
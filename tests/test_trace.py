@@ -0,0 +1,146 @@
+# Copyright (c) 2021 Adam Karpierz
+# SPDX-License-Identifier: MIT
+
+import unittest
+import os
+import json
+import tempfile
+import ctypes as ct
+
+import libcurl as lcurl
+from ._httpd import HTTPServer
+
+
+class TracerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.curl = lcurl.easy_init()
+
+    def tearDown(self):
+        lcurl.easy_cleanup(self.curl)
+
+    def event(self, tracer, infotype, data):
+        # Calls the debug callback the way libcurl does.
+        buffer = ct.create_string_buffer(data, len(data))
+        self.assertEqual(tracer.callback(self.curl, infotype, ct.addressof(buffer),
+                                         len(data), None), 0)
+
+    def test_ring(self):
+        tracer = lcurl.Tracer(capacity=4)
+        for i in range(3):
+            self.event(tracer, lcurl.CURLINFO_TEXT, b"msg%d" % i)
+        self.assertEqual((len(tracer), tracer.total, tracer.dropped), (3, 3, 0))
+        self.assertEqual([event.payload for event in lcurl.decode_trace(tracer.snapshot())],
+                         [b"msg0", b"msg1", b"msg2"])
+        for i in range(3, 10):
+            self.event(tracer, lcurl.CURLINFO_TEXT, b"msg%d" % i)
+        self.assertEqual((len(tracer), tracer.total, tracer.dropped), (4, 10, 6))
+        events = list(lcurl.decode_trace(tracer.snapshot()))
+        # the oldest records were overwritten
+        self.assertEqual([event.payload for event in events],
+                         [b"msg6", b"msg7", b"msg8", b"msg9"])
+        timestamps = [event.timestamp for event in events]
+        self.assertEqual(timestamps, sorted(timestamps))
+        tracer.clear()
+        self.assertEqual((len(tracer), tracer.total), (0, 0))
+        self.assertEqual(list(lcurl.decode_trace(tracer.snapshot())), [])
+
+    def test_ring_full(self):
+        tracer = lcurl.Tracer(capacity=4)
+        for i in range(4):
+            self.event(tracer, lcurl.CURLINFO_TEXT, b"%d" % i)
+        self.assertEqual((len(tracer), tracer.total, tracer.dropped), (4, 4, 0))
+        self.assertEqual([event.payload for event in lcurl.decode_trace(tracer.snapshot())],
+                         [b"0", b"1", b"2", b"3"])
+
+    def test_ring_boundary(self):
+        tracer = lcurl.Tracer(capacity=3)
+        for i in range(6):
+            self.event(tracer, lcurl.CURLINFO_TEXT, b"%d" % i)
+        self.assertEqual([event.payload for event in lcurl.decode_trace(tracer.snapshot())],
+                         [b"3", b"4", b"5"])
+
+    def test_payload_limits(self):
+        tracer = lcurl.Tracer(payload=4, data_payload=2)
+        self.event(tracer, lcurl.CURLINFO_HEADER_IN, b"abcdefgh")
+        self.event(tracer, lcurl.CURLINFO_DATA_IN, b"\x01\x02\x03")
+        self.event(tracer, lcurl.CURLINFO_TEXT, b"")
+        header, data, text = lcurl.decode_trace(tracer.snapshot())
+        self.assertEqual((header.payload, header.length), (b"abcd", 8))
+        self.assertEqual((data.payload, data.length), (b"\x01\x02", 3))
+        self.assertEqual((text.payload, text.length), (b"", 0))
+        self.assertTrue(str(header).endswith(" HEADER_IN 8: abcd [+4 bytes]"))
+        self.assertTrue(str(data).endswith(" DATA_IN 3: 01 02 [+1 bytes]"))
+        # no data payload by default
+        tracer = lcurl.Tracer()
+        self.event(tracer, lcurl.CURLINFO_DATA_OUT, b"data")
+        event, = lcurl.decode_trace(tracer.snapshot())
+        self.assertEqual((event.payload, event.length), (b"", 4))
+
+    def test_infotypes(self):
+        tracer = lcurl.Tracer(infotypes={lcurl.CURLINFO_HEADER_IN})
+        self.event(tracer, lcurl.CURLINFO_TEXT, b"text")
+        self.event(tracer, lcurl.CURLINFO_HEADER_IN, b"header")
+        self.event(tracer, lcurl.CURLINFO_END, b"bogus")
+        self.assertEqual([event.infotype_name
+                          for event in lcurl.decode_trace(tracer.snapshot())], ["HEADER_IN"])
+
+    def test_invalid_arguments(self):
+        for kwargs in ({"capacity": 0}, {"payload": -1}, {"data_payload": 0x10000}):
+            with self.subTest(**kwargs), self.assertRaises(ValueError):
+                lcurl.Tracer(**kwargs)
+        with self.assertRaises(ValueError):
+            list(lcurl.decode_trace(b"NOTATRACE" + bytes(16)))
+
+    def test_format(self):
+        tracer = lcurl.Tracer(data_payload=2)
+        self.event(tracer, lcurl.CURLINFO_HEADER_OUT, b"GET / HTTP/1.1\r\n")
+        self.event(tracer, lcurl.CURLINFO_SSL_DATA_IN, b"\x16\x03")
+        data = tracer.snapshot()
+        lines = lcurl.format_trace(data).splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].endswith(" HEADER_OUT 16: GET / HTTP/1.1"))
+        self.assertTrue(lines[1].endswith(" SSL_DATA_IN 2: 16 03"))
+        records = [json.loads(line) for line in lcurl.format_trace(data, "json").splitlines()]
+        self.assertEqual(records[0]["type"], "HEADER_OUT")
+        self.assertEqual(records[0]["text"], "GET / HTTP/1.1\r\n")
+        self.assertEqual(records[1]["hex"], "1603")
+        self.assertEqual(records[1]["length"], 2)
+        with self.assertRaises(ValueError):
+            lcurl.format_trace(data, "xml")
+
+    def test_save(self):
+        tracer = lcurl.Tracer()
+        self.event(tracer, lcurl.CURLINFO_TEXT, b"saved")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "trace")
+            tracer.save(path)
+            with open(path, "rb") as file:
+                data = file.read()
+        self.assertEqual(data, tracer.snapshot())
+        self.assertEqual([event.payload for event in lcurl.decode_trace(data)], [b"saved"])
+
+    def test_transfer(self):
+        tracer = lcurl.Tracer()
+        curl = self.curl
+        with HTTPServer() as server:
+            self.assertEqual(tracer.install(curl), lcurl.CURLE_OK)
+            lcurl.easy_setopt(curl, lcurl.CURLOPT_URL, f"{server.url}/10".encode())
+            lcurl.easy_setopt(curl, lcurl.CURLOPT_WRITEFUNCTION, lcurl.write_skipped)
+            self.assertEqual(lcurl.easy_perform(curl), lcurl.CURLE_OK)
+            events = list(lcurl.decode_trace(tracer.snapshot()))
+            headers_out = [event for event in events
+                           if event.infotype == lcurl.CURLINFO_HEADER_OUT]
+            self.assertTrue(headers_out[0].payload.startswith(b"GET /10 HTTP/1.1\r\n"))
+            self.assertTrue(any(event.payload.startswith(b"HTTP/1.1 200")
+                                for event in events
+                                if event.infotype == lcurl.CURLINFO_HEADER_IN))
+            data_in = [event for event in events if event.infotype == lcurl.CURLINFO_DATA_IN]
+            self.assertEqual(sum(event.length for event in data_in), 10)
+            self.assertGreaterEqual(headers_out[0].xfer_id, 0)
+            self.assertGreaterEqual(headers_out[0].conn_id, 0)
+            # uninstalled: nothing more is recorded
+            total = tracer.total
+            self.assertEqual(tracer.uninstall(curl), lcurl.CURLE_OK)
+            self.assertEqual(lcurl.easy_perform(curl), lcurl.CURLE_OK)
+            self.assertEqual(tracer.total, total)